@@ -0,0 +1,367 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from logger_config import logger
+from cache import normalize_text
+from constants import CLASSES
+
+# Rollup granularities and the width of their buckets in seconds
+GRANULARITIES = {"hour": 3600, "day": 86400}
+
+PROBABILITY_COLUMNS = [f"p_{label.lower()}" for label in CLASSES]
+PREDICTION_COLUMNS = [f"n_{label.lower()}" for label in CLASSES]
+
+
+def article_digest(title: str, content: str) -> int:
+    """64-bit identity of an article's normalized text, so that an article fetched again is recorded once."""
+    digest = hashlib.blake2b(normalize_text(f"{title} {content}").encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def published_time(article: Dict, default: float) -> float:
+    """Unix time of an article's NewsAPI publication time (ISO 8601), or `default` when it is missing or invalid."""
+    published = article.get("published_at")
+    if published:
+        try:
+            moment = datetime.fromisoformat(published)
+        except (TypeError, ValueError):
+            return default
+        return (moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)).timestamp()
+    return default
+
+
+def add_to_rollups(rollups: dict, outlet: str, timestamp: float, probabilities: List[float]):
+    """
+    Add one article to the rollups of its outlet in every granularity. A rollup holds the
+    article count, the sum of each class probability and the count of each predicted class.
+    """
+    predicted = max(range(len(probabilities)), key=probabilities.__getitem__)
+    for granularity, width in GRANULARITIES.items():
+        bucket = int(timestamp // width * width)
+        totals = rollups.setdefault((granularity, outlet, bucket), [0] * (1 + 2 * len(CLASSES)))
+        totals[0] += 1
+        for i, probability in enumerate(probabilities):
+            totals[1 + i] += probability
+        totals[1 + len(CLASSES) + predicted] += 1
+
+
+class RollupSeries:
+    """The rollups of one outlet in one granularity, sorted by bucket."""
+
+    __slots__ = ("buckets", "totals")
+
+    def __init__(self):
+        self.buckets = []
+        self.totals = []
+
+    def add(self, bucket: int, totals: List[float]):
+        position = bisect_left(self.buckets, bucket)
+        if position < len(self.buckets) and self.buckets[position] == bucket:
+            current = self.totals[position]
+            for i, value in enumerate(totals):
+                current[i] += value
+        else:
+            # New buckets are almost always the latest, so this is an append
+            self.buckets.insert(position, bucket)
+            self.totals.insert(position, list(totals))
+
+    def between(self, first: int, end: float) -> dict:
+        """The buckets in [first, end) as columns: bucket starts, counts, mean probabilities and predictions."""
+        low, high = bisect_left(self.buckets, first), bisect_left(self.buckets, end)
+        totals = self.totals[low:high]
+        return {
+            "buckets": self.buckets[low:high],
+            "count": [row[0] for row in totals],
+            "mean_probabilities": {label: [row[1 + i] / row[0] for row in totals] for i, label in enumerate(CLASSES)},
+            "predictions": {label: [row[1 + len(CLASSES) + i] for row in totals] for i, label in enumerate(CLASSES)},
+        }
+
+
+class AnalyticsStore:
+    """
+    Append-only history of scored outlet articles with incremental per-outlet rollups.
+
+    Recorded articles are buffered and written as Parquet segments under `directory`/articles,
+    one column each for the outlet, the time, the article digest and each class probability.
+    An article's time is its publication time, or the time it was scored when NewsAPI gave none.
+    Every article also adds to the hourly and daily rollups of its outlet as it is recorded.
+    Segments are written by a background thread, when enough articles are buffered or on a
+    timer every `flush_interval` seconds, so recording never waits on the disk.
+    The rollups are saved to SQLite with each segment and mirrored in memory, sorted by
+    bucket, so a query slices them without reading the articles or the database.
+    """
+
+    def __init__(self, directory: str, flush_rows: int = 1000, flush_interval: float = 3600, seen_size: int = 100000):
+        self.directory = Path(directory)
+        self.segments_dir = self.directory / "articles"
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.seen_size = seen_size
+        self._connection = sqlite3.connect(
+            str(self.directory / "rollups.sqlite"), timeout=5, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        columns = ", ".join(
+            [f"{column} REAL NOT NULL" for column in PROBABILITY_COLUMNS]
+            + [f"{column} INTEGER NOT NULL" for column in PREDICTION_COLUMNS]
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS rollups (granularity TEXT NOT NULL, outlet TEXT NOT NULL, "
+            f"bucket INTEGER NOT NULL, count INTEGER NOT NULL, {columns}, "
+            "PRIMARY KEY (granularity, outlet, bucket)) WITHOUT ROWID"
+        )
+        # Segments whose rows are in the rollups
+        self._connection.execute("CREATE TABLE IF NOT EXISTS segments (name TEXT PRIMARY KEY, rows INTEGER NOT NULL)")
+        self._lock = threading.Lock()
+        # Serializes segment writes, which run on the writer thread outside `_lock`
+        self._flush_lock = threading.Lock()
+        # Wakes the writer thread before its timer when `flush_rows` articles are buffered, or on close
+        self._wake = threading.Event()
+        self._closed = False
+        self._buffer = []
+        # Rollups of the buffered articles, saved with their segment
+        self._pending = {}
+        self._series: Dict[tuple, RollupSeries] = {}
+        self._seen = OrderedDict()
+        self._last_flush = time.time()
+        self._recover()
+        self._load_rollups()
+        self._load_seen()
+        self._writer = threading.Thread(target=self._write_loop, name="analytics-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, outlet: str, articles: Iterable[Dict], timestamp: Optional[float] = None) -> int:
+        """
+        Record the scored articles of an outlet, skipping unscored ones and articles recorded
+        before. Articles without a publication time are recorded at `timestamp` (default now).
+        Returns the number of articles recorded; nothing is recorded once the store is closed.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        recorded = 0
+        with self._lock:
+            if self._closed:
+                return 0
+            for article in articles:
+                probabilities = article.get("probabilities")
+                if not probabilities:
+                    continue
+                digest = article_digest(article["title"], article["content"])
+                if digest in self._seen:
+                    continue
+                self._remember(digest)
+                moment = published_time(article, timestamp)
+                self._buffer.append((outlet, moment, digest, probabilities))
+                rollups = {}
+                add_to_rollups(rollups, outlet, moment, probabilities)
+                self._add_to_series(rollups)
+                add_to_rollups(self._pending, outlet, moment, probabilities)
+                recorded += 1
+            if len(self._buffer) >= self.flush_rows:
+                self._wake.set()
+        return recorded
+
+    def _write_loop(self):
+        """Write the buffered articles when woken by record() or every `flush_interval` seconds, until closed."""
+        while True:
+            with self._lock:
+                wait = max(0.0, self._last_flush + self.flush_interval - time.time())
+            self._wake.wait(wait)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception("Failed to write an analytics segment: {}", e)
+            if self._closed:
+                return
+
+    def flush(self):
+        """
+        Write the buffered articles as a segment and move their rollups to SQLite. Articles
+        recorded meanwhile go to the next segment; on failure the articles stay buffered.
+        """
+        with self._flush_lock:
+            with self._lock:
+                self._last_flush = time.time()
+                if not self._buffer:
+                    return
+                buffer, pending = self._buffer, self._pending
+                self._buffer, self._pending = [], {}
+            try:
+                path = self._write_segment(buffer)
+            except BaseException:
+                with self._lock:
+                    self._buffer = buffer + self._buffer
+                    for key, totals in self._pending.items():
+                        current = pending.setdefault(key, [0] * len(totals))
+                        for i, value in enumerate(totals):
+                            current[i] += value
+                    self._pending = pending
+                raise
+            # Should this fail, the segment is rolled up when the store is next opened
+            self._apply(path.name, pending, len(buffer))
+            logger.info("Wrote {} articles to analytics segment {}", len(buffer), path.name)
+
+    def _write_segment(self, buffer: list) -> Path:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        outlets, timestamps, digests, probabilities = zip(*buffer)
+        columns = {
+            "outlet": pa.array(outlets, pa.string()).dictionary_encode(),
+            "time": pa.array([int(1000 * timestamp) for timestamp in timestamps], pa.timestamp("ms", tz="UTC")),
+            "digest": pa.array(digests, pa.int64()),
+        }
+        for i, column in enumerate(PROBABILITY_COLUMNS):
+            columns[column] = pa.array([row[i] for row in probabilities], pa.float32())
+        # Named by time so that the segments sort in the order they were written
+        path = self.segments_dir / f"part-{time.time_ns()}.parquet"
+        tmp = path.with_suffix(".tmp")
+        pq.write_table(pa.table(columns), tmp)
+        os.replace(tmp, path)
+        return path
+
+    def query(self, granularity: str, start: float, end: float, outlets: Optional[List[str]] = None) -> Dict[str, dict]:
+        """
+        Rollups of each outlet in the buckets of `granularity` overlapping [start, end), as
+        columns ordered oldest first: the bucket start times (Unix seconds), article counts,
+        mean probability of each class and number of articles predicted as each class.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        first = int(start // GRANULARITIES[granularity] * GRANULARITIES[granularity])
+        result = {}
+        with self._lock:
+            for (series_granularity, outlet), series in sorted(self._series.items()):
+                if series_granularity != granularity or outlets is not None and outlet not in outlets:
+                    continue
+                columns = series.between(first, end)
+                if columns["buckets"]:
+                    result[outlet] = columns
+        return result
+
+    def rebuild(self):
+        """Recompute all rollups from the segments, e.g. after the rollup layout changed."""
+        with self._flush_lock:
+            with self._lock:
+                self._connection.execute("DELETE FROM rollups")
+                self._connection.execute("DELETE FROM segments")
+            self._recover()
+            self._load_rollups()
+
+    def close(self):
+        """Stop recording, wait for the writer thread, then write the remaining buffered articles."""
+        with self._lock:
+            self._closed = True
+        self._wake.set()
+        self._writer.join()
+        self.flush()
+        self._connection.close()
+
+    def _apply(self, name: str, rollups: dict, rows: int):
+        """Add a segment's rollups in one transaction with its name, so that it is never counted twice."""
+        columns = ["count"] + PROBABILITY_COLUMNS + PREDICTION_COLUMNS
+        upsert = (
+            f"INSERT INTO rollups (granularity, outlet, bucket, {', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * (3 + len(columns)))}) "
+            "ON CONFLICT (granularity, outlet, bucket) DO UPDATE SET "
+            + ", ".join(f"{column} = {column} + excluded.{column}" for column in columns)
+        )
+        self._connection.execute("BEGIN")
+        try:
+            self._connection.executemany(upsert, [(*key, *totals) for key, totals in rollups.items()])
+            self._connection.execute("INSERT INTO segments (name, rows) VALUES (?, ?)", (name, rows))
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def _recover(self):
+        """Roll up the segments written before a crash stopped their rollups from being saved."""
+        import pyarrow.parquet as pq
+
+        for tmp in self.segments_dir.glob("*.tmp"):
+            tmp.unlink()
+        applied = {name for (name,) in self._connection.execute("SELECT name FROM segments")}
+        for path in sorted(self.segments_dir.glob("part-*.parquet")):
+            if path.name in applied:
+                continue
+            table = pq.read_table(path)
+            rollups = {}
+            outlets = table.column("outlet").to_pylist()
+            timestamps = [moment.timestamp() for moment in table.column("time").to_pylist()]
+            probabilities = zip(*(table.column(column).to_pylist() for column in PROBABILITY_COLUMNS))
+            for outlet, timestamp, row in zip(outlets, timestamps, probabilities):
+                add_to_rollups(rollups, outlet, timestamp, list(row))
+            with self._lock:
+                self._apply(path.name, rollups, table.num_rows)
+            logger.info("Rolled up analytics segment {} ({} articles)", path.name, table.num_rows)
+
+    def _add_to_series(self, rollups: dict):
+        for (granularity, outlet, bucket), totals in rollups.items():
+            self._series.setdefault((granularity, outlet), RollupSeries()).add(bucket, totals)
+
+    def _load_rollups(self):
+        """Mirror the saved rollups, and those of the buffered articles, in memory."""
+        columns = ", ".join(["count"] + PROBABILITY_COLUMNS + PREDICTION_COLUMNS)
+        with self._lock:
+            self._series = {}
+            rows = self._connection.execute(f"SELECT granularity, outlet, bucket, {columns} FROM rollups ORDER BY granularity, outlet, bucket")
+            # Rows come in primary key order, so every bucket is appended to its series
+            self._add_to_series({(granularity, outlet, bucket): totals for granularity, outlet, bucket, *totals in rows})
+            self._add_to_series(self._pending)
+
+    def _load_seen(self):
+        """Remember the digests of the latest recorded articles, so that a restart does not record them again."""
+        import pyarrow.parquet as pq
+
+        digests = []
+        for path in sorted(self.segments_dir.glob("part-*.parquet"), reverse=True):
+            digests = pq.read_table(path, columns=["digest"]).column("digest").to_pylist() + digests
+            if len(digests) >= self.seen_size:
+                break
+        for digest in digests[-self.seen_size :]:
+            self._remember(digest)
+
+    def _remember(self, digest: int):
+        self._seen[digest] = None
+        if len(self._seen) > self.seen_size:
+            self._seen.popitem(last=False)
+
+
+def create_analytics_store(config: dict) -> Optional[AnalyticsStore]:
+    """Open the analytics store as configured, or None when it is disabled or pyarrow is not installed."""
+    if not config["ANALYTICS"]:
+        return None
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.warning("pyarrow is not installed; scored outlet articles are not recorded for analytics.")
+        return None
+    return AnalyticsStore(config["ANALYTICS_DIR"], config["ANALYTICS_FLUSH_ROWS"], config["ANALYTICS_FLUSH_INTERVAL"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the outlet analytics store.")
+    parser.add_argument("directory", help="ANALYTICS_DIR of the server")
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Recompute the rollups from the article segments (with the server stopped)"
+    )
+    parser.add_argument("--granularity", default="day", choices=list(GRANULARITIES), help="Rollups to print")
+    parser.add_argument("--days", type=float, default=30, help="Print the rollups of this many past days")
+    args = parser.parse_args()
+
+    store = AnalyticsStore(args.directory)
+    if args.rebuild:
+        store.rebuild()
+    now = time.time()
+    print(json.dumps(store.query(args.granularity, now - args.days * 86400, now), indent=4))
@@ -0,0 +1,80 @@
+from pathlib import Path
+import torch
+from logger_config import logger
+
+# Inputs of the exported graphs, in positional order
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+# Suffix of each exported artifact, next to the .pt checkpoint it was built from
+ARTIFACT_SUFFIXES = {"torchscript": ".ts", "onnx": ".onnx"}
+
+
+def artifact_path(model_path: str, backend: str) -> str:
+    """Path of the exported artifact of a checkpoint for the given backend."""
+    return str(Path(model_path).with_suffix(ARTIFACT_SUFFIXES[backend]))
+
+
+class LogitsModule(torch.nn.Module):
+    """
+    Positional-argument wrapper returning only the logits, as needed for tracing and export.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids).logits
+
+
+class TorchScriptBackend:
+    """
+    Runs a traced TorchScript graph of the classifier. The graph runs on torch's process-wide
+    thread pool, shared with the eager models and sized once per process, so `num_threads` is unused.
+    """
+
+    name = "torchscript"
+
+    def __init__(self, path: str, num_threads: int = 0):
+        logger.info("Loading TorchScript graph from {}", path)
+        self.module = torch.jit.load(path, map_location="cpu")
+        self.module.eval()
+
+    def logits(self, encodings: dict) -> torch.Tensor:
+        with torch.no_grad():
+            return self.module(*(encodings[name] for name in INPUT_NAMES))
+
+
+class OnnxBackend:
+    """
+    Runs an exported ONNX graph of the classifier with onnxruntime on CPU.
+    """
+
+    name = "onnx"
+
+    def __init__(self, path: str, num_threads: int = 0):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The onnx backend requires onnxruntime: uv sync --extra onnx") from e
+
+        logger.info("Loading ONNX graph from {}", path)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def logits(self, encodings: dict) -> torch.Tensor:
+        inputs = {name: encodings[name].numpy() for name in INPUT_NAMES}
+        return torch.from_numpy(self.session.run(["logits"], inputs)[0])
+
+
+BACKENDS = {"torchscript": TorchScriptBackend, "onnx": OnnxBackend}
+
+
+def load_backend(name: str, model_path: str, num_threads: int = 0):
+    """Load the exported artifact of a checkpoint for a non-eager backend."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name}")
+    return BACKENDS[name](artifact_path(model_path, name), num_threads=num_threads)
@@ -0,0 +1,194 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logger_config import logger
+from metrics import BATCH_SIZE, QUEUE_WAIT_SECONDS
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class BatchStats:
+    """
+    Running statistics for a MicroBatcher: batch sizes and queue wait times.
+    """
+
+    def __init__(self):
+        self.batches = 0
+        self.items = 0
+        self.max_batch_size = 0
+        self.batch_size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def record(self, batch_size: int, queue_waits: list[float]):
+        """Record one executed batch and the queue wait of each of its items."""
+        self.batches += 1
+        self.items += batch_size
+        self.max_batch_size = max(self.max_batch_size, batch_size)
+        for bucket in BATCH_SIZE_BUCKETS:
+            if batch_size <= bucket:
+                self.batch_size_histogram[bucket] += 1
+                break
+        self.queue_wait_total += sum(queue_waits)
+        self.queue_wait_max = max(self.queue_wait_max, *queue_waits)
+
+    def snapshot(self) -> dict:
+        """Return the statistics as a JSON-serializable dictionary."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "batch_size_histogram": {f"le_{bucket}": count for bucket, count in self.batch_size_histogram.items()},
+            "mean_queue_wait_ms": 1000 * self.queue_wait_total / self.items if self.items else 0.0,
+            "max_queue_wait_ms": 1000 * self.queue_wait_max,
+        }
+
+
+class QueueFullError(Exception):
+    """Raised when the inference queue is at its limit and new work must be shed."""
+
+
+class InferenceExecutor:
+    """
+    Sized thread pool that runs every forward pass, with a bound on admitted work.
+
+    Work is admitted per input; once `max_pending` inputs are queued or running,
+    further submissions raise QueueFullError instead of piling up. A job larger than
+    `max_pending` (e.g. a bulk /predict/batch request) is admitted only into an empty queue.
+    """
+
+    def __init__(self, max_workers: int = 1, max_pending: int = 256):
+        self.max_pending = max_pending
+        self.pending = 0
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+
+    def admit(self, items: int = 1):
+        """Reserve room for `items` inputs, or raise QueueFullError."""
+        if self.pending and self.pending + items > self.max_pending:
+            raise QueueFullError(f"Inference queue is full ({self.pending} inputs pending).")
+        self.pending += items
+
+    def release(self, items: int = 1):
+        self.pending -= items
+
+    async def run(self, func, *args, items: int = 1):
+        """Admit `items` inputs and run `func(*args)` on the pool."""
+        self.admit(items)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+        finally:
+            self.release(items)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+
+class MicroBatcher:
+    """
+    Gathers concurrent prediction requests for one model into a single forward pass.
+
+    A batch is dispatched once it holds `max_batch_size` items or the oldest item
+    has waited `max_wait_ms`, whichever comes first.
+    """
+
+    def __init__(
+        self, model_wrapper, device, max_batch_size: int = 32, max_wait_ms: float = 5.0, executor=None
+    ):
+        self.model_wrapper = model_wrapper
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = BatchStats()
+        self._queue = None
+        self._worker = None
+        # Shared by all batchers so that forward passes of every model run on one sized pool
+        self.executor = executor if executor is not None else InferenceExecutor()
+
+    async def start(self):
+        """Start the background batching loop on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching loop."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def queue_depth(self) -> int:
+        """Number of inputs waiting to be gathered into a batch."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, text: str):
+        """
+        Queue one input and wait for its (prediction, confidence, probabilities) result.
+        Raises QueueFullError when the inference queue is at its limit.
+        """
+        self.executor.admit(1)
+        try:
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((text, future, time.perf_counter()))
+            return await future
+        finally:
+            self.executor.release(1)
+
+    async def run(self, func, *args, items: int = 1):
+        """Run `func(*args)` on the inference pool, bypassing the queue."""
+        return await self.executor.run(func, *args, items=items)
+
+    async def run_batch(self, texts: list[str], chunk_size: int = 64) -> list:
+        """Score an already-assembled batch on the inference pool, bypassing the queue."""
+        return await self.run(self.model_wrapper.predict_batch, texts, self.device, chunk_size, items=len(texts))
+
+    async def _collect(self) -> list:
+        """Wait for the first item, then gather more until the batch is full or the wait expires."""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Drop requests whose callers have gone away
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            dispatched_at = time.perf_counter()
+            texts = [text for text, _, _ in batch]
+            queue_waits = [dispatched_at - enqueued_at for _, _, enqueued_at in batch]
+            self.stats.record(len(batch), queue_waits)
+            model_name = getattr(self.model_wrapper, "name", None) or "unknown"
+            BATCH_SIZE.observe(len(batch), model=model_name)
+            for queue_wait in queue_waits:
+                QUEUE_WAIT_SECONDS.observe(queue_wait, model=model_name)
+            try:
+                # The batch's inputs were admitted by submit(), so it bypasses admission here
+                results = await loop.run_in_executor(
+                    self.executor.pool, self.model_wrapper.predict_batch, texts, self.device
+                )
+            except Exception as e:
+                logger.exception("Batched prediction failed for {} inputs: {}", len(batch), e)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -0,0 +1,290 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Iterator, List, Optional
+from logger_config import logger
+from constants import CLASSES
+
+# Written next to the part files; a resumed run must use the same input and model options
+RUN_FILE = "_run.json"
+# Articles each worker remembers for near-duplicate detection (about 350 bytes each)
+NEAR_DUPLICATE_INDEX_SIZE = 1_000_000
+
+# Set in each worker by _init_worker
+_scorer = None
+_batch_size = 64
+_near_duplicates = None
+
+
+def read_chunks(path: str, columns: List[str], chunk_rows: int = 1024) -> Iterator[List[dict]]:
+    """
+    Stream the rows of a Parquet, JSONL or CSV file in chunks of at most `chunk_rows`.
+
+    Only `columns` are read; Parquet files are read row group by row group, so memory
+    stays bounded by the chunk size rather than the file size.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pylist()
+    elif suffix in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            rows = (json.loads(line) for line in f if line.strip())
+            while chunk := [{column: row.get(column) for column in columns} for row in islice(rows, chunk_rows)]:
+                yield chunk
+    elif suffix == ".csv":
+        # Article bodies easily exceed the default field limit of 128 kB
+        csv.field_size_limit(sys.maxsize)
+        with open(path, encoding="utf-8", newline="") as f:
+            rows = csv.DictReader(f)
+            while chunk := [{column: row.get(column) for column in columns} for row in islice(rows, chunk_rows)]:
+                yield chunk
+    else:
+        raise ValueError(f"Unsupported input format: {path} (expected .parquet, .jsonl or .csv)")
+
+
+def load_scorer(model_options: dict):
+    """Load the model to score with, through the registry so that weights are memory-mapped."""
+    from registry import ModelRegistry
+
+    registry = ModelRegistry(model_options["base_model"], device="cpu")
+    lora_config = None
+    if model_options.get("lora"):
+        from peft import LoraConfig
+        from constants import LORA_SETTINGS
+
+        lora_config = LoraConfig(**LORA_SETTINGS)
+    return registry.load(
+        "bulk",
+        model_options["model_path"],
+        lora_config=lora_config,
+        quantized=model_options.get("quantized", False),
+        backend=model_options.get("backend", "eager"),
+    )
+
+
+def _init_worker(model_options: dict, batch_size: int, num_threads: int, near_duplicate_threshold: float = 0.0):
+    global _scorer, _batch_size, _near_duplicates
+    import torch
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    _scorer = load_scorer(model_options)
+    _batch_size = batch_size
+    _near_duplicates = None
+    if near_duplicate_threshold:
+        from dedup import NearDuplicateIndex
+
+        _near_duplicates = NearDuplicateIndex(near_duplicate_threshold, capacity=NEAR_DUPLICATE_INDEX_SIZE)
+
+
+def _score_chunk(index: int, texts: List[str]):
+    """Score a chunk; returns its index, the results and how many were near-duplicates of earlier texts."""
+    if _near_duplicates is None:
+        return index, _scorer.predict_batch(texts, "cpu", _batch_size), 0
+    fingerprints, results = _near_duplicates.match(texts)
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        for i, result in zip(misses, _scorer.predict_batch([texts[i] for i in misses], "cpu", _batch_size)):
+            results[i] = result
+            signature, head = fingerprints[i]
+            _near_duplicates.add(signature, result, head)
+    return index, results, len(texts) - len(misses)
+
+
+def part_path(output_dir: Path, index: int) -> Path:
+    return output_dir / f"part-{index:06d}.parquet"
+
+
+def completed_chunks(output_dir: Path) -> set:
+    """Indices of the chunks whose part file was fully written by an earlier run."""
+    return {int(path.stem.split("-")[1]) for path in output_dir.glob("part-*.parquet")}
+
+
+def write_part(output_dir: Path, index: int, rows: List[dict], results: list, id_column: Optional[str], offset: int):
+    """Write the predictions of one chunk atomically, so that a part file on disk is always complete."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = {}
+    if id_column:
+        columns[id_column] = [row[id_column] for row in rows]
+    else:
+        columns["row"] = pa.array(range(offset, offset + len(rows)), pa.int64())
+    for column in rows[0]:
+        if column not in columns:
+            columns[column] = [row[column] for row in rows]
+    columns["prediction"] = [result[0] for result in results]
+    columns["confidence"] = pa.array([result[1] for result in results], pa.float32())
+    for position, label in enumerate(CLASSES):
+        columns[f"p_{label.lower()}"] = pa.array([result[2][position] for result in results], pa.float32())
+
+    final = part_path(output_dir, index)
+    tmp = final.with_suffix(".tmp")
+    pq.write_table(pa.table(columns), tmp)
+    os.replace(tmp, final)
+
+
+def score_file(
+    input_path: str,
+    output_dir: str,
+    model_options: dict,
+    text_columns: List[str],
+    id_column: Optional[str] = None,
+    keep_columns: Optional[List[str]] = None,
+    chunk_rows: int = 1024,
+    batch_size: int = 64,
+    workers: int = 0,
+    resume: bool = True,
+    near_duplicate_threshold: float = 0.0,
+) -> dict:
+    """
+    Score every row of a file and write the predictions as Parquet part files.
+
+    Args:
+        input_path (str): Parquet, JSONL or CSV file to score.
+        output_dir (str): Directory receiving one part-NNNNNN.parquet file per input chunk.
+        model_options (dict): base_model, model_path and optionally lora, quantized and backend.
+        text_columns (List[str]): Columns joined with a space to form each model input.
+        id_column (Optional[str]): Column identifying each row; the row number is used without it.
+        keep_columns (Optional[List[str]]): Input columns copied to the output.
+        chunk_rows (int): Rows read, scored and written together.
+        batch_size (int): Inputs per forward pass.
+        workers (int): Worker processes, each loading the memory-mapped model; 0 scores in this process.
+        resume (bool): Skip chunks whose part file exists from an interrupted run.
+        near_duplicate_threshold (float): Copy the prediction of an earlier text whose word shingles
+            overlap by at least this estimated Jaccard similarity instead of scoring the text again;
+            each worker indexes the texts it scored. 0 scores every text.
+
+    Returns:
+        dict: Number of rows and chunks scored and skipped, near-duplicates copied, and the elapsed time.
+    """
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    keep_columns = keep_columns or []
+    run = {
+        "input": str(Path(input_path).resolve()),
+        "model": model_options,
+        "text_columns": text_columns,
+        "id_column": id_column,
+        "keep_columns": keep_columns,
+        "chunk_rows": chunk_rows,
+    }
+    if near_duplicate_threshold:
+        run["near_duplicate_threshold"] = near_duplicate_threshold
+    run_file = output / RUN_FILE
+    done = set()
+    if resume and run_file.exists():
+        if json.loads(run_file.read_text()) != run:
+            raise ValueError(f"{output_dir} holds a run with different options; use another directory or --no-resume")
+        done = completed_chunks(output)
+        logger.info("Resuming: {} chunks already scored", len(done))
+    else:
+        for path in output.glob("part-*.parquet"):
+            path.unlink()
+    run_file.write_text(json.dumps(run, indent=4))
+
+    passthrough = list(dict.fromkeys(([id_column] if id_column else []) + keep_columns))
+    columns = list(dict.fromkeys(passthrough + text_columns))
+    if workers:
+        # Spawned workers do not inherit torch's thread pools; split the cores between them
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_options, batch_size, max(1, (os.cpu_count() or 1) // workers), near_duplicate_threshold),
+        )
+    else:
+        executor = ThreadPoolExecutor(
+            max_workers=1, initializer=_init_worker, initargs=(model_options, batch_size, 0, near_duplicate_threshold)
+        )
+
+    started = time.perf_counter()
+    stats = {"rows": 0, "chunks": 0, "skipped_chunks": 0, "near_duplicates": 0}
+    pending = {}
+
+    def collect(futures):
+        for future in futures:
+            index, results, near_duplicates = future.result()
+            rows, offset = pending.pop(future)
+            write_part(output, index, rows, results, id_column, offset)
+            stats["rows"] += len(rows)
+            stats["near_duplicates"] += near_duplicates
+            stats["chunks"] += 1
+        elapsed = time.perf_counter() - started
+        logger.info("Scored {} rows in {:.0f}s ({:.1f} rows/s)", stats["rows"], elapsed, stats["rows"] / elapsed)
+
+    with executor:
+        offset = 0
+        for index, chunk in enumerate(read_chunks(input_path, columns, chunk_rows)):
+            if index in done:
+                stats["skipped_chunks"] += 1
+            else:
+                texts = [" ".join(str(row[column] or "") for column in text_columns) for row in chunk]
+                rows = [{column: row[column] for column in passthrough} for row in chunk]
+                pending[executor.submit(_score_chunk, index, texts)] = (rows, offset)
+                # Bound the chunks held in memory to two per worker
+                if len(pending) >= 2 * max(workers, 1):
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+            offset += len(chunk)
+        collect(list(pending))
+
+    stats["seconds"] = round(time.perf_counter() - started, 1)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a Parquet, JSONL or CSV file of articles in bulk.")
+    parser.add_argument("input", help="Input file (.parquet, .jsonl or .csv)")
+    parser.add_argument("output", help="Output directory of Parquet part files")
+    parser.add_argument("--model-path", required=True, help="Fine-tuned checkpoint (.pt or .safetensors)")
+    parser.add_argument("--base-model", default="bert-base-uncased", help="Base model configuration and tokenizer")
+    parser.add_argument("--lora", action="store_true", help="The checkpoint is a LoRA model")
+    parser.add_argument("--quantized", action="store_true", help="Score with the int8 dynamic-quantized model")
+    parser.add_argument("--backend", default="eager", choices=["eager", "torchscript", "onnx"])
+    parser.add_argument("--text-columns", default="title,content", help="Comma-separated columns forming the input")
+    parser.add_argument("--id-column", help="Column identifying each row")
+    parser.add_argument("--keep-columns", default="", help="Comma-separated input columns copied to the output")
+    parser.add_argument("--chunk-rows", type=int, default=1024, help="Rows per chunk and part file")
+    parser.add_argument("--batch-size", type=int, default=64, help="Inputs per forward pass")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (0 = score in this process)")
+    parser.add_argument("--no-resume", action="store_true", help="Start over instead of resuming")
+    parser.add_argument(
+        "--near-duplicate-threshold",
+        type=float,
+        default=0.0,
+        help="Copy the prediction of an earlier text this similar (estimated Jaccard, e.g. 0.9) instead of scoring again",
+    )
+    args = parser.parse_args()
+
+    summary = score_file(
+        args.input,
+        args.output,
+        model_options={
+            "base_model": args.base_model,
+            "model_path": args.model_path,
+            "lora": args.lora,
+            "quantized": args.quantized,
+            "backend": args.backend,
+        },
+        text_columns=args.text_columns.split(","),
+        id_column=args.id_column,
+        keep_columns=[column for column in args.keep_columns.split(",") if column],
+        chunk_rows=args.chunk_rows,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        resume=not args.no_resume,
+        near_duplicate_threshold=args.near_duplicate_threshold,
+    )
+    print(json.dumps(summary, indent=4))
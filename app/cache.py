@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+# Rows a SQLite cache may hold past its bound before the least recently used are evicted in one batch
+EVICTION_SLACK = 0.1
+
+def normalize_text(text: str) -> str:
+    """Normalize text so that trivially different copies of an article share a cache key."""
+    return " ".join(unicodedata.normalize("NFKC", text).lower().split())
+
+
+def weights_version(model_path: str) -> str:
+    """Identify the weights file by size and modification time, so replaced weights invalidate the cache."""
+    stat = os.stat(model_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def cache_key(text: str, model_name: str, version: str, mode: str = "") -> str:
+    """Hash the normalized text together with the model, its weights version and the inference mode."""
+    payload = "\x1f".join([model_name, version, mode, normalize_text(text)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """
+    In-process LRU store bounded by `max_entries`, with an optional TTL in seconds.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, created = entry
+            if self.ttl and time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """
+    On-disk LRU store that survives restarts and can be shared by workers on one host.
+
+    Its reads and writes block on disk, so async callers run them in a thread (see `blocking`).
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 100000, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # WAL lets several worker processes read while one writes
+        self._connection = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS predictions "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS predictions_accessed ON predictions (accessed)")
+        self._lock = threading.Lock()
+        self._evict_above = max_entries + max(1, int(max_entries * EVICTION_SLACK))
+        # Rows counted at the last eviction check plus this process's writes since
+        self._rows = len(self)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT value, created FROM predictions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl and now - created > self.ttl:
+                self._connection.execute("DELETE FROM predictions WHERE key = ?", (key,))
+                return None
+            self._connection.execute("UPDATE predictions SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key: str, value):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO predictions (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._rows += 1
+            if self._rows > self._evict_above:
+                self._rows = self._connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+            if self._rows > self._evict_above:
+                # Evict the least recently used rows in one batch once the table outgrows its bound and slack
+                self._connection.execute(
+                    "DELETE FROM predictions WHERE key IN "
+                    "(SELECT key FROM predictions ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                self._rows = self.max_entries
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+
+class PredictionCache:
+    """
+    Content-addressed cache of prediction results with hit/miss counters.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        # Whether lookups do disk I/O and should run off the event loop
+        self.blocking = getattr(backend, "blocking", False)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value):
+        self.backend.set(key, value)
+
+    def get_many(self, keys: list) -> list:
+        return [self.get(key) for key in keys]
+
+    def set_many(self, items: list):
+        for key, value in items:
+            self.set(key, value)
+
+    def stats(self) -> dict:
+        """Return the cache counters as a JSON-serializable dictionary."""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def create_prediction_cache(config: dict) -> Optional[PredictionCache]:
+    """Build the prediction cache selected by PREDICTION_CACHE, or None when caching is disabled."""
+    ttl = config["PREDICTION_CACHE_TTL"] or None
+    if config["PREDICTION_CACHE"] == "memory":
+        return PredictionCache(MemoryBackend(config["PREDICTION_CACHE_SIZE"], ttl))
+    if config["PREDICTION_CACHE"] == "sqlite":
+        return PredictionCache(SQLiteBackend(config["PREDICTION_CACHE_PATH"], config["PREDICTION_CACHE_SIZE"], ttl))
+    if config["PREDICTION_CACHE"] == "none":
+        return None
+    raise ValueError(f"Unknown prediction cache backend: {config['PREDICTION_CACHE']}")
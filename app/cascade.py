@@ -0,0 +1,50 @@
+from typing import Awaitable, Callable, List, Sequence
+
+# model_name of requests routed through the cascade
+CASCADE = "cascade"
+
+
+class Cascade:
+    """
+    Routes inputs through model variants from the cheapest to the most accurate.
+
+    Each stage answers the inputs whose top-class confidence reaches its threshold and
+    passes the others on to the next stage; the last stage answers everything left.
+    With `thresholds[i]` the threshold of stage i, there is one threshold per stage
+    except the last.
+    """
+
+    def __init__(self, stages: Sequence[str], thresholds: Sequence[float]):
+        if len(stages) < 2:
+            raise ValueError("A cascade needs at least two stages.")
+        if len(thresholds) == 1:
+            thresholds = list(thresholds) * (len(stages) - 1)
+        if len(thresholds) != len(stages) - 1:
+            raise ValueError(f"A cascade of {len(stages)} stages takes {len(stages) - 1} thresholds, got {len(thresholds)}.")
+        self.stages = list(stages)
+        self.thresholds = list(thresholds)
+
+    def accepts(self, stage_index: int, confidence: float) -> bool:
+        """Whether stage `stage_index` answers an input it scored with `confidence`."""
+        return stage_index == len(self.stages) - 1 or confidence >= self.thresholds[stage_index]
+
+    async def run(self, score: Callable[[str, list], Awaitable[list]], inputs: list) -> List[tuple]:
+        """
+        Score `inputs` through the stages, where `score(model_name, inputs)` returns one
+        result tuple per input with the confidence second. Returns (result, answering
+        stage) per input, in input order.
+        """
+        answers = [None] * len(inputs)
+        remaining = list(range(len(inputs)))
+        for stage_index, stage in enumerate(self.stages):
+            results = await score(stage, [inputs[i] for i in remaining])
+            escalated = []
+            for position, result in zip(remaining, results):
+                if self.accepts(stage_index, result[1]):
+                    answers[position] = (result, stage)
+                else:
+                    escalated.append(position)
+            remaining = escalated
+            if not remaining:
+                break
+        return answers
@@ -1,19 +1,111 @@
 import os
-import torch
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Runtime files (analytics history, SQLite prediction cache, profiler traces) go here, outside the source tree
+DATA_DIR = os.getenv(
+    "DATA_DIR",
+    os.path.join(os.getenv("XDG_DATA_HOME", os.path.join(os.path.expanduser("~"), ".local", "share")), "political-leaning"),
+)
+
 # Config that serves all environment
 GLOBAL_CONFIG = {
+    "DATA_DIR": DATA_DIR,
     "MODEL_PATH": os.getenv("MODEL_PATH"),
     "MODEL_PATH1": os.getenv("MODEL_PATH1"),
     "MODEL_PATH2": os.getenv("MODEL_PATH2"),
     "MLFLOW_URI": os.getenv("MLFLOW_URI"),
     "EXPERIMENT_NAME": os.getenv("EXPERIMENT_NAME"),
     "NEWS_API_KEY": os.getenv("NEWS_API_KEY"),
+    # NewsAPI "everything" endpoint used by the async fetch path (overridden by the load test's stand-in)
+    "NEWS_API_URL": os.getenv("NEWS_API_URL", "https://newsapi.org/v2/everything"),
     "HOST": os.getenv("HOST"), 
+    "BASE_MODEL_NAME": os.getenv("BASE_MODEL_NAME", "bert-base-uncased"),
+    # Model names to serve, loaded in the background at startup ("eager") or on first request ("lazy")
+    "MODELS": os.getenv("MODELS", "model,quantized_model,lora_model").split(","),
+    "LOAD_MODELS": os.getenv("LOAD_MODELS", "eager"),
+    # Inputs run through each model after loading so that the first requests are not slow (0 = no warmup)
+    "WARMUP_BATCH_SIZE": int(os.getenv("WARMUP_BATCH_SIZE", "8")),
+    # Model names served as int8 dynamic-quantized models
+    "QUANTIZED_MODELS": os.getenv("QUANTIZED_MODELS", "quantized_model").split(","),
+    # Inference backend per model name, e.g. "model=onnx,lora_model=torchscript"; others run eager PyTorch
+    "MODEL_BACKENDS": dict(
+        entry.split("=", 1) for entry in os.getenv("MODEL_BACKENDS", "").split(",") if entry
+    ),
+    # Model names served with the exit heads trained next to their checkpoint (train_exits.py); an input
+    # leaves at the first head whose "confidence" reaches, or normalized "entropy" falls to, the threshold
+    "EARLY_EXIT_MODELS": [name for name in os.getenv("EARLY_EXIT_MODELS", "").split(",") if name],
+    "EARLY_EXIT_CRITERION": os.getenv("EARLY_EXIT_CRITERION", "confidence"),
+    "EARLY_EXIT_THRESHOLD": float(os.getenv("EARLY_EXIT_THRESHOLD", "0.9")),
+    # Stages of model_name="cascade", cheapest first, and the confidence each non-final stage answers at
+    # (one value for all stages, or one per non-final stage; see tune_cascade.py)
+    "CASCADE_MODELS": [name for name in os.getenv("CASCADE_MODELS", "quantized_model,model").split(",") if name],
+    "CASCADE_THRESHOLDS": [float(value) for value in os.getenv("CASCADE_THRESHOLDS", "0.9").split(",")],
+    # Micro-batching of concurrent /predict requests
+    "MAX_BATCH_SIZE": int(os.getenv("MAX_BATCH_SIZE", "32")),
+    "MAX_BATCH_WAIT_MS": float(os.getenv("MAX_BATCH_WAIT_MS", "5")),
+    # Inference pool shared by all models: forward passes run concurrently, torch threads per pass
+    "INFERENCE_WORKERS": int(os.getenv("INFERENCE_WORKERS", "1")),
+    "TORCH_NUM_THREADS": int(os.getenv("TORCH_NUM_THREADS", "0")),
+    "TORCH_INTEROP_THREADS": int(os.getenv("TORCH_INTEROP_THREADS", "0")),
+    # Worker processes pinned to disjoint cores (0 = run inference in the API process)
+    "INFERENCE_PROCESSES": int(os.getenv("INFERENCE_PROCESSES", "0")),
+    # Inputs admitted to the inference pool before requests are shed with 503 and Retry-After
+    "MAX_INFERENCE_QUEUE": int(os.getenv("MAX_INFERENCE_QUEUE", "256")),
+    "RETRY_AFTER_SECONDS": int(os.getenv("RETRY_AFTER_SECONDS", "1")),
+    # Bulk scoring through /predict/batch
+    "MAX_BATCH_REQUEST_ITEMS": int(os.getenv("MAX_BATCH_REQUEST_ITEMS", "1024")),
+    "PREDICT_CHUNK_SIZE": int(os.getenv("PREDICT_CHUNK_SIZE", "64")),
+    # Token length limits that a padded batch may not straddle
+    "LENGTH_BUCKETS": [int(length) for length in os.getenv("LENGTH_BUCKETS", "16,32,64,128").split(",")],
+    # Input ids of recently tokenized texts kept per registry (0 = no token cache)
+    "TOKEN_CACHE_SIZE": int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    # Sliding-window inference over long documents
+    "LONG_DOC_MAX_WINDOWS": int(os.getenv("LONG_DOC_MAX_WINDOWS", "8")),
+    "LONG_DOC_TOKEN_BUDGET": int(os.getenv("LONG_DOC_TOKEN_BUDGET", "1024")),
+    "LONG_DOC_STRIDE": int(os.getenv("LONG_DOC_STRIDE", "32")),
+    # Concurrent article scraping for /outlets/{outlet}
+    "SCRAPE_MAX_WORKERS": int(os.getenv("SCRAPE_MAX_WORKERS", "8")),
+    "SCRAPE_PER_HOST_LIMIT": int(os.getenv("SCRAPE_PER_HOST_LIMIT", "2")),
+    "SCRAPE_REQUEST_DEADLINE": float(os.getenv("SCRAPE_REQUEST_DEADLINE", "10")),
+    "SCRAPE_TOTAL_DEADLINE": float(os.getenv("SCRAPE_TOTAL_DEADLINE", "15")),
+    # Connection pool of the async HTTP client, and the threads of the requests fallback without httpx
+    "HTTP_MAX_CONNECTIONS": int(os.getenv("HTTP_MAX_CONNECTIONS", "32")),
+    "IO_THREADS": int(os.getenv("IO_THREADS", "4")),
+    # Paragraph extractor ("auto" = "lxml", else "selectolax", else "html.parser") and its text limit (0 = none)
+    "HTML_EXTRACTOR": os.getenv("HTML_EXTRACTOR", "auto"),
+    "EXTRACT_MAX_CHARS": int(os.getenv("EXTRACT_MAX_CHARS", "0")),
+    # Articles fetched per outlet, and the most a streamed /outlets/{outlet}?stream=true request may ask for
+    "OUTLET_ARTICLES": int(os.getenv("OUTLET_ARTICLES", "5")),
+    "OUTLET_MAX_ARTICLES": int(os.getenv("OUTLET_MAX_ARTICLES", "100")),
+    # Pre-scored outlet news served by /outlets/{outlet}
+    "FEED_MODEL": os.getenv("FEED_MODEL", "model"),
+    "FEED_REFRESH_INTERVAL": float(os.getenv("FEED_REFRESH_INTERVAL", "600")),
+    "FEED_STALE_AFTER": float(os.getenv("FEED_STALE_AFTER", "300")),
+    "FEED_BACKGROUND_REFRESH": os.getenv("FEED_BACKGROUND_REFRESH", "true").lower() == "true",
+    # Seconds between refreshes of the model-memory gauges, read in the background rather than on each /metrics scrape
+    "MEMORY_REPORT_INTERVAL": float(os.getenv("MEMORY_REPORT_INTERVAL", "60")),
+    # Torch profiler trace of one in every N inference calls (0 = off), written to PROFILE_DIR
+    "PROFILE_EVERY_N": int(os.getenv("PROFILE_EVERY_N", "0")),
+    "PROFILE_DIR": os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles")),
+    # History of the outlet articles scored by FEED_MODEL and its hourly/daily rollups, served by /analytics/outlets;
+    # buffered articles are written every ANALYTICS_FLUSH_ROWS articles or ANALYTICS_FLUSH_INTERVAL seconds
+    "ANALYTICS": os.getenv("ANALYTICS", "true").lower() == "true",
+    "ANALYTICS_DIR": os.getenv("ANALYTICS_DIR", os.path.join(DATA_DIR, "analytics")),
+    "ANALYTICS_FLUSH_ROWS": int(os.getenv("ANALYTICS_FLUSH_ROWS", "1000")),
+    "ANALYTICS_FLUSH_INTERVAL": float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "3600")),
+    # Content-addressed prediction cache: "memory", "sqlite" or "none"
+    "PREDICTION_CACHE": os.getenv("PREDICTION_CACHE", "memory"),
+    "PREDICTION_CACHE_SIZE": int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    "PREDICTION_CACHE_TTL": float(os.getenv("PREDICTION_CACHE_TTL", "0")),
+    "PREDICTION_CACHE_PATH": os.getenv("PREDICTION_CACHE_PATH", os.path.join(DATA_DIR, "cache", "predictions.sqlite")),
+    # Reuse the prediction of an already scored article with the same opening words whose model input's word
+    # shingles overlap by at least this estimated Jaccard similarity, e.g. 0.9, from an index of the last
+    # NEAR_DUPLICATE_INDEX_SIZE articles per model (0 = off)
+    "NEAR_DUPLICATE_THRESHOLD": float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0")),
+    "NEAR_DUPLICATE_INDEX_SIZE": int(os.getenv("NEAR_DUPLICATE_INDEX_SIZE", "100000")),
 }
 
 # Environment specific config, or overwrite of GLOBAL_CONFIG
@@ -9,3 +9,9 @@ NEWS_SOURCES = {
     "CNN": "cnn",
     "BBC News": "bbc-news",
 }
+
+# Output classes of the sequence classifier, in logit order
+CLASSES = ["Left", "Center", "Right"]
+
+# LoRA adapter settings the lora_model checkpoint was trained with
+LORA_SETTINGS = {"r": 16, "lora_alpha": 32, "lora_dropout": 0.1, "bias": "none"}
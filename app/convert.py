@@ -0,0 +1,39 @@
+import argparse
+from pathlib import Path
+import torch
+from safetensors.torch import save_file
+from logger_config import logger
+
+
+def convert_to_safetensors(checkpoint: str) -> str:
+    """
+    Write a pickled float state dict as a .safetensors file next to it.
+
+    The registry prefers that file, which is memory-mapped at load time instead of unpickled.
+
+    Args:
+        checkpoint (str): Path to the fine-tuned state dict (.pt).
+
+    Returns:
+        str: Path of the written .safetensors file.
+    """
+    state_dict = torch.load(checkpoint, map_location="cpu", weights_only=True)
+    tensors, seen = {}, set()
+    for key, tensor in state_dict.items():
+        # Safetensors refuses tensors sharing storage (e.g. tied weights); give each its own copy
+        pointer = tensor.untyped_storage().data_ptr()
+        tensors[key] = tensor.clone().contiguous() if pointer in seen else tensor.contiguous()
+        seen.add(pointer)
+    output = str(Path(checkpoint).with_suffix(".safetensors"))
+    save_file(tensors, output)
+    logger.info("Wrote {} tensors from {} to {}", len(tensors), checkpoint, output)
+    return output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert fine-tuned checkpoints to memory-mappable safetensors.")
+    parser.add_argument("checkpoints", nargs="+", help="Fine-tuned float state dicts (.pt)")
+    args = parser.parse_args()
+
+    for checkpoint in args.checkpoints:
+        print(convert_to_safetensors(checkpoint))
@@ -0,0 +1,216 @@
+import re
+import threading
+import zlib
+from typing import Optional
+import numpy as np
+from cache import normalize_text
+
+WORD = re.compile(r"\w+")
+MASK64 = (1 << 64) - 1
+FIBONACCI = 0x9E3779B97F4A7C15
+# The models read at most 128 tokens and a word is at least one token, so the first 128 words
+# hold everything the model sees
+MODEL_INPUT_WORDS = 128
+# Opening words, about a headline, that a near-duplicate must share exactly
+HEAD_WORDS = 10
+
+
+def shingle_hashes(text: str, size: int = 3, max_words: Optional[int] = None) -> np.ndarray:
+    """32-bit hashes of the distinct word `size`-grams of the first `max_words` words of the normalized text."""
+    words = WORD.findall(normalize_text(text))[:max_words]
+    grams = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), np.uint64, len(grams))
+
+
+class NearDuplicateIndex:
+    """
+    Bounded index of article MinHash signatures with LSH banding, answering whether an
+    article is a near-duplicate of one already scored and returning its stored value.
+
+    Signatures live in one preallocated array used as a ring buffer: once `capacity`
+    articles are stored, each new one replaces the oldest. Each signature is split into
+    `bands` bands; articles sharing any band are candidates, and a candidate matches
+    when the share of equal MinHash values (the estimated Jaccard similarity of the
+    word shingles) reaches `threshold` and its first `head_words` words are the same.
+    Only the first `max_words` words are compared, as the model reads no further: two
+    articles with one body but different headlines are not near-duplicates. The bands are found through one open-addressing
+    hash table, also a preallocated array, so an entry costs about 0.5 kB plus its value
+    whatever the number of articles.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        capacity: int = 100000,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        seed: int = 1,
+        max_words: Optional[int] = MODEL_INPUT_WORDS,
+        head_words: int = HEAD_WORDS,
+    ):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.capacity = capacity
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.max_words = max_words
+        self.head_words = head_words
+        # Multiply-shift hash functions, one per permutation
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, 2**64, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**64, size=num_perm, dtype=np.uint64)
+        self.signatures = np.zeros((capacity, num_perm), np.uint32)
+        self.band_keys = np.zeros((capacity, bands), np.uint64)
+        self.heads = np.zeros(capacity, np.uint64)
+        self.values = [None] * capacity
+        # Entries are slot * bands + band, placed by linear probing from the hash of the band key;
+        # the table is kept at most half full
+        table_bits = max((2 * capacity * bands - 1).bit_length(), 4)
+        self._table = np.full(1 << table_bits, -1, np.int32 if capacity * bands < 2**31 else np.int64)
+        self._table_mask = (1 << table_bits) - 1
+        self._table_shift = 64 - table_bits
+        self.size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the word shingles of the text's first `max_words` words."""
+        hashes = shingle_hashes(text, self.shingle_size, self.max_words)
+        # uint64 arithmetic wraps around, which is the modulo 2^64 of multiply-shift hashing
+        values = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)
+        return values.min(axis=1).astype(np.uint32)
+
+    def head(self, text: str) -> int:
+        """Hash of the text's first `head_words` normalized words."""
+        words = WORD.findall(normalize_text(text))[: self.head_words]
+        return zlib.crc32(" ".join(words).encode("utf-8"))
+
+    def fingerprint(self, text: str) -> tuple:
+        """The (signature, head) pair of a text, as taken by query and add."""
+        return self.signature(text), self.head(text)
+
+    def _band_keys(self, signature: np.ndarray) -> np.ndarray:
+        """One 64-bit key per band, combining the MinHash values of its rows."""
+        rows = signature.reshape(self.bands, -1).astype(np.uint64)
+        keys = np.zeros(self.bands, np.uint64)
+        for column in rows.T:
+            keys = (keys * np.uint64(0x100000001B3)) ^ column
+        return keys
+
+    def _home(self, band: int, key: int) -> int:
+        """Table position where the probing for a band key starts (Fibonacci hashing)."""
+        return (((key ^ band) * FIBONACCI) & MASK64) >> self._table_shift
+
+    def _candidates(self, keys: np.ndarray) -> np.ndarray:
+        """Slots sharing at least one band key, probing the table for all bands at once."""
+        bands = np.arange(self.bands)
+        # The vectorized _home: uint64 multiplication wraps around like the masked one
+        positions = ((keys ^ bands.astype(np.uint64)) * np.uint64(FIBONACCI)) >> np.uint64(self._table_shift)
+        positions = positions.astype(np.int64)
+        found = []
+        while len(positions):
+            entries = self._table[positions].astype(np.int64)
+            live = entries != -1
+            positions, entries, keys, bands = positions[live], entries[live], keys[live], bands[live]
+            slots, entry_bands = np.divmod(entries, self.bands)
+            match = (entry_bands == bands) & (self.band_keys[slots, entry_bands] == keys)
+            found.append(slots[match])
+            positions = (positions + 1) & self._table_mask
+        return np.unique(np.concatenate(found))
+
+    def _probe(self, band: int, key: int):
+        """Yield (position, slot) of the table entries of a band key."""
+        position = self._home(band, key)
+        while (entry := int(self._table[position])) != -1:
+            slot, entry_band = divmod(entry, self.bands)
+            if entry_band == band and int(self.band_keys[slot, band]) == key:
+                yield position, slot
+            position = (position + 1) & self._table_mask
+
+    def _insert(self, band: int, key: int, slot: int):
+        position = self._home(band, key)
+        while self._table[position] != -1:
+            position = (position + 1) & self._table_mask
+        self._table[position] = slot * self.bands + band
+
+    def _delete(self, band: int, key: int, slot: int):
+        """Remove an entry, shifting back the entries probed past it so that no probe chain breaks."""
+        hole = next(position for position, found in self._probe(band, key) if found == slot)
+        self._table[hole] = -1
+        position = hole
+        while True:
+            position = (position + 1) & self._table_mask
+            entry = int(self._table[position])
+            if entry == -1:
+                return
+            entry_slot, entry_band = divmod(entry, self.bands)
+            home = self._home(entry_band, int(self.band_keys[entry_slot, entry_band]))
+            # An entry whose home lies after the hole still reaches its home from its position
+            if hole < position and hole < home <= position or hole > position and (home > hole or home <= position):
+                continue
+            self._table[hole] = entry
+            self._table[position] = -1
+            hole = position
+
+    def query(self, signature: np.ndarray, head: int = 0):
+        """
+        The value stored for the most similar indexed article with the same head, or None when
+        none reaches the threshold.
+        """
+        keys = self._band_keys(signature)
+        with self._lock:
+            slots = self._candidates(keys)
+            slots = slots[self.heads[slots] == head]
+            if len(slots):
+                similarity = (self.signatures[slots] == signature).mean(axis=1)
+                best = similarity.argmax()
+                if similarity[best] >= self.threshold:
+                    self.hits += 1
+                    return self.values[slots[best]]
+            self.misses += 1
+            return None
+
+    def add(self, signature: np.ndarray, value, head: int = 0):
+        """Index an article's signature and head with its value, replacing the oldest article once full."""
+        keys = self._band_keys(signature)
+        with self._lock:
+            slot = self._next
+            if self.size == self.capacity:
+                for band, key in enumerate(self.band_keys[slot].tolist()):
+                    self._delete(band, key, slot)
+            self.signatures[slot] = signature
+            self.band_keys[slot] = keys
+            self.heads[slot] = head
+            self.values[slot] = value
+            for band, key in enumerate(keys.tolist()):
+                self._insert(band, key, slot)
+            self._next = (slot + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def match(self, texts: list) -> tuple:
+        """Fingerprint texts and look each one up; returns the fingerprints and the stored values (None when unmatched)."""
+        fingerprints = [self.fingerprint(text) for text in texts]
+        return fingerprints, [self.query(*fingerprint) for fingerprint in fingerprints]
+
+    def stats(self) -> dict:
+        """Return the index counters as a JSON-serializable dictionary."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self.size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def create_near_duplicate_index(config: dict) -> Optional[NearDuplicateIndex]:
+    """Build a near-duplicate index as configured, or None when NEAR_DUPLICATE_THRESHOLD is 0."""
+    if not config["NEAR_DUPLICATE_THRESHOLD"]:
+        return None
+    return NearDuplicateIndex(config["NEAR_DUPLICATE_THRESHOLD"], config["NEAR_DUPLICATE_INDEX_SIZE"])
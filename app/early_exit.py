@@ -0,0 +1,148 @@
+import math
+from pathlib import Path
+from typing import List, Sequence
+import torch
+from torch import nn
+import torch.nn.functional as F
+
+EXIT_CRITERIA = ("confidence", "entropy")
+
+
+def exit_heads_path(model_path: str) -> str:
+    """Path of the exit heads trained for a checkpoint, next to it."""
+    return str(Path(model_path).with_suffix(".exits.pt"))
+
+
+def classifier_model(module):
+    """The transformers classifier inside a (possibly peft-wrapped) module."""
+    return module.get_base_model() if hasattr(module, "get_base_model") else module
+
+
+class ExitHeads(nn.Module):
+    """
+    Classifier heads on the [CLS] hidden state of intermediate encoder layers.
+
+    Each head has the shape of BERT's own pooler and classifier (dense, tanh, linear)
+    and starts as a copy of them, so an untrained head already makes the final
+    classifier's guess from an earlier layer.
+    """
+
+    def __init__(self, layers: Sequence[int], hidden_size: int, num_labels: int):
+        super().__init__()
+        self.layers = list(layers)
+        self.heads = nn.ModuleList(
+            nn.Sequential(nn.Linear(hidden_size, hidden_size), nn.Tanh(), nn.Linear(hidden_size, num_labels))
+            for _ in self.layers
+        )
+
+    @classmethod
+    def from_classifier(cls, module, layers: Sequence[int]) -> "ExitHeads":
+        model = classifier_model(module)
+        heads = cls(layers, model.config.hidden_size, model.config.num_labels)
+        with torch.no_grad():
+            for head in heads.heads:
+                # Through the weight attributes, which peft's wrappers of trained modules also expose
+                for target, source in ((head[0], model.bert.pooler.dense), (head[2], model.classifier)):
+                    target.weight.copy_(source.weight)
+                    target.bias.copy_(source.bias)
+        return heads
+
+    def forward(self, cls_states: torch.Tensor) -> torch.Tensor:
+        """Logits of every head from [CLS] states of shape (batch, heads, hidden): (batch, heads, labels)."""
+        return torch.stack([head(cls_states[:, i]) for i, head in enumerate(self.heads)], dim=1)
+
+    def save(self, path: str):
+        torch.save({"layers": self.layers, "state_dict": self.state_dict()}, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ExitHeads":
+        checkpoint = torch.load(path, map_location="cpu", weights_only=True)
+        state_dict = checkpoint["state_dict"]
+        hidden_size = state_dict["heads.0.0.weight"].shape[1]
+        num_labels = state_dict["heads.0.2.weight"].shape[0]
+        heads = cls(checkpoint["layers"], hidden_size, num_labels)
+        heads.load_state_dict(state_dict)
+        heads.requires_grad_(False)
+        heads.eval()
+        return heads
+
+
+def should_exit(logits: torch.Tensor, criterion: str, threshold: float) -> torch.Tensor:
+    """
+    Whether each row may stop here: its top-class probability is at least `threshold`
+    ("confidence"), or its entropy normalized to [0, 1] is at most `threshold` ("entropy").
+    """
+    probabilities = F.softmax(logits, dim=-1)
+    if criterion == "confidence":
+        return probabilities.max(dim=-1).values >= threshold
+    entropy = -(probabilities * probabilities.clamp_min(1e-12).log()).sum(dim=-1)
+    return entropy / math.log(logits.shape[-1]) <= threshold
+
+
+class EarlyExit:
+    """
+    Runs the encoder layer by layer and lets each input leave at the first exit head
+    that passes the criterion, so that easy inputs skip the remaining layers. Inputs
+    that never pass go through the full model and its own classifier.
+    """
+
+    def __init__(self, heads: ExitHeads, criterion: str = "confidence", threshold: float = 0.9):
+        if criterion not in EXIT_CRITERIA:
+            raise ValueError(f"Unknown early-exit criterion: {criterion}")
+        self.heads = heads
+        self.criterion = criterion
+        self.threshold = threshold
+
+    def logits(self, module, encodings: dict):
+        """Return the logits of each input and the encoder layer (1-based) it exited at."""
+        model = classifier_model(module)
+        bert = model.bert
+        hidden = bert.embeddings(input_ids=encodings["input_ids"], token_type_ids=encodings.get("token_type_ids"))
+        # Additive mask that both the eager and the SDPA attention implementations accept
+        mask = encodings["attention_mask"][:, None, None, :].to(hidden.dtype)
+        mask = (1.0 - mask) * torch.finfo(hidden.dtype).min
+
+        batch_size = hidden.shape[0]
+        num_layers = len(bert.encoder.layer)
+        logits = torch.empty(batch_size, model.config.num_labels)
+        exit_layers = torch.full((batch_size,), num_layers, dtype=torch.long)
+        active = torch.arange(batch_size)
+        heads = dict(zip(self.heads.layers, self.heads.heads))
+        for index, layer in enumerate(bert.encoder.layer, start=1):
+            output = layer(hidden, attention_mask=mask)
+            # Layers return a tuple in transformers 4 and the hidden states in transformers 5
+            hidden = output[0] if isinstance(output, tuple) else output
+            head = heads.get(index)
+            if head is None or index == num_layers:
+                continue
+            head_logits = head(hidden[:, 0])
+            done = should_exit(head_logits, self.criterion, self.threshold)
+            if done.any():
+                # The finished rows leave the batch; the others go on to the next layer
+                logits[active[done.cpu()]] = head_logits[done].float().cpu()
+                exit_layers[active[done.cpu()]] = index
+                keep = ~done
+                active, hidden, mask = active[keep.cpu()], hidden[keep], mask[keep]
+                if not len(active):
+                    return logits, exit_layers.tolist()
+        logits[active] = model.classifier(bert.pooler(hidden)).float().cpu()
+        return logits, exit_layers.tolist()
+
+
+def load_early_exit(model_path: str, criterion: str, threshold: float):
+    """The early exit of a checkpoint, or None when no exit heads were trained for it."""
+    path = exit_heads_path(model_path)
+    if not Path(path).exists():
+        return None
+    return EarlyExit(ExitHeads.load(path), criterion, threshold)
+
+
+def cls_states(module, encodings: dict, layers: List[int]) -> tuple:
+    """
+    Run the full model once and return the [CLS] state after each of `layers`,
+    of shape (batch, layers, hidden), and the final logits.
+    """
+    outputs = module(**encodings, output_hidden_states=True)
+    # hidden_states[0] is the embedding output; hidden_states[i] the output of layer i
+    states = torch.stack([outputs.hidden_states[layer][:, 0] for layer in layers], dim=1)
+    return states, outputs.logits
@@ -0,0 +1,92 @@
+import argparse
+import json
+import torch
+from peft import LoraConfig
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSequenceClassification
+from logger_config import logger
+from model import Model
+from backends import INPUT_NAMES, LogitsModule, artifact_path, load_backend
+from constants import LORA_SETTINGS
+
+
+def export_checkpoint(
+    base_model_name: str, checkpoint: str, backends: list[str], sample_texts: list[str], lora: bool = False
+) -> dict:
+    """
+    Export a fine-tuned checkpoint to TorchScript and/or ONNX and check the exported outputs.
+
+    LoRA checkpoints are merged into their backbone first, so the exported graphs
+    carry plain Linear weights.
+
+    Args:
+        base_model_name (str): Model name or path providing the BERT configuration and tokenizer.
+        checkpoint (str): Path to the fine-tuned state dict.
+        backends (list[str]): Backends to export for ("torchscript", "onnx").
+        sample_texts (list[str]): Inputs used to trace the graph and to compare outputs.
+        lora (bool): Whether the checkpoint is a LoRA (peft) state dict.
+
+    Returns:
+        dict: Artifact path and largest absolute logit difference per backend.
+    """
+    model_config = AutoConfig.from_pretrained(base_model_name, num_labels=3)
+    tokenizer = AutoTokenizer.from_pretrained(base_model_name)
+    model_wrapper = Model(checkpoint, AutoModelForSequenceClassification.from_config(model_config), tokenizer)
+    model_wrapper.load(device="cpu", model_config=LoraConfig(**LORA_SETTINGS) if lora else None)
+    module = model_wrapper.model.merge_and_unload() if lora else model_wrapper.model
+    logits_module = LogitsModule(module).eval()
+
+    encodings = tokenizer(sample_texts, truncation=True, padding=True, max_length=128, return_tensors="pt")
+    example_inputs = tuple(encodings[name] for name in INPUT_NAMES)
+    with torch.no_grad():
+        reference = logits_module(*example_inputs)
+
+    report = {}
+    for backend in backends:
+        path = artifact_path(checkpoint, backend)
+        logger.info("Exporting {} to {}", checkpoint, path)
+        if backend == "torchscript":
+            with torch.no_grad():
+                torch.jit.save(torch.jit.trace(logits_module, example_inputs, strict=False), path)
+        elif backend == "onnx":
+            dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in INPUT_NAMES}
+            dynamic_axes["logits"] = {0: "batch"}
+            torch.onnx.export(
+                logits_module,
+                example_inputs,
+                path,
+                input_names=INPUT_NAMES,
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+                dynamo=False,
+            )
+        else:
+            raise ValueError(f"Unknown inference backend: {backend}")
+
+        exported = load_backend(backend, checkpoint).logits(dict(encodings))
+        report[backend] = {"path": path, "max_abs_logit_diff": (exported - reference).abs().max().item()}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a checkpoint to TorchScript and/or ONNX.")
+    parser.add_argument("checkpoint", help="Fine-tuned state dict (.pt); artifacts are written next to it")
+    parser.add_argument("--base-model", default="bert-base-uncased", help="Base model configuration and tokenizer")
+    parser.add_argument("--backend", action="append", choices=["torchscript", "onnx"], help="Repeat for several")
+    parser.add_argument("--lora", action="store_true", help="The checkpoint is a LoRA state dict to merge")
+    parser.add_argument("--sample", help="Text file with one input per line for tracing and output checks")
+    parser.add_argument("--tolerance", type=float, default=1e-3, help="Fail above this logit difference")
+    args = parser.parse_args()
+
+    sample_texts = ["Senate passes the budget bill", "Governor signs new tax cuts into law after a long debate"]
+    if args.sample:
+        with open(args.sample, encoding="utf-8") as sample_file:
+            sample_texts = [line.strip() for line in sample_file if line.strip()]
+
+    report = export_checkpoint(
+        args.base_model, args.checkpoint, args.backend or ["torchscript", "onnx"], sample_texts, lora=args.lora
+    )
+    print(json.dumps(report, indent=4))
+    if any(result["max_abs_logit_diff"] > args.tolerance for result in report.values()):
+        logger.error("Exported outputs differ from the PyTorch model by more than {}", args.tolerance)
+        raise SystemExit(1)
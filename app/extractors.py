@@ -0,0 +1,196 @@
+import re
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector
+
+# Bytes of a page searched for its <meta> charset, as browsers do
+SNIFF_BYTES = 1024
+# Matches the charset parameter of a Content-Type header
+CHARSET_PATTERN = re.compile(r"charset=[\"']?([\w-]+)", re.IGNORECASE)
+
+
+def charset_from_content_type(content_type: str):
+    """Return the charset declared in a Content-Type header, or None."""
+    match = CHARSET_PATTERN.search(content_type or "")
+    return match.group(1) if match else None
+
+
+def paragraph_text(paragraph) -> str:
+    """
+    Return the text of a BeautifulSoup <p> element without that of <p> elements nested in it. html.parser
+    nests an unclosed paragraph inside the previous one, and the nested paragraph is joined on its own.
+    """
+    return "".join(text for text in paragraph.strings if text.find_parent("p") is paragraph)
+
+
+def sniff_encoding(head: bytes) -> str:
+    """Return the charset a page declares in its first bytes (<meta charset> or <?xml encoding>), or utf-8."""
+    return EncodingDetector.find_declared_encoding(head, is_html=True) or "utf-8"
+
+
+class HtmlParserExtractor:
+    """
+    Joins the text of all <p> elements using BeautifulSoup's pure-Python html.parser.
+
+    The page is buffered and parsed once it is complete.
+    """
+
+    name = "html.parser"
+
+    def __init__(self, max_chars=None, encoding=None):
+        self.max_chars = max_chars
+        self.encoding = encoding
+        self._chunks = []
+
+    def feed(self, chunk: bytes) -> bool:
+        """Add a chunk of the page; returns True once no more input is needed."""
+        self._chunks.append(chunk)
+        return False
+
+    def close(self) -> str:
+        """Return the extracted paragraph text."""
+        soup = BeautifulSoup(b"".join(self._chunks), "html.parser", from_encoding=self.encoding)
+        return join_paragraphs((paragraph_text(para) for para in soup.find_all("p")), self.max_chars)
+
+
+class LxmlExtractor:
+    """
+    Joins the text of all <p> elements with lxml's C parser, parsing while the page downloads.
+
+    Extraction stops after the paragraph that reaches `max_chars`, so the rest of
+    the page does not need to be downloaded or parsed.
+    """
+
+    name = "lxml"
+
+    def __init__(self, max_chars=None, encoding=None):
+        from lxml import etree
+
+        self._etree = etree
+        self.max_chars = max_chars
+        self.encoding = encoding
+        # Without a Content-Type charset, created once the first SNIFF_BYTES are in so that
+        # the charset declared by the page is known
+        self._parser = None
+        self._head = b""
+        self._paragraphs = []
+        self._length = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        """Parse a chunk of the page; returns True once enough text has been collected."""
+        if self._parser is None:
+            self._head += chunk
+            if self.encoding is None and len(self._head) < SNIFF_BYTES:
+                return False
+            chunk = self._start()
+        self._parser.feed(chunk)
+        return self._collect()
+
+    def close(self) -> str:
+        """Return the extracted paragraph text."""
+        if self._parser is None and self._head:
+            head = self._start()
+            self._parser.feed(head)
+            self._collect()
+        if self._parser is not None and not self._enough():
+            self._parser.close()
+            self._collect()
+        return join_paragraphs(self._paragraphs, self.max_chars)
+
+    def _start(self) -> bytes:
+        """Create the parser for the buffered start of the page and return that start."""
+        self._parser = self._etree.HTMLPullParser(
+            events=("end",), tag="p", encoding=self.encoding or sniff_encoding(self._head)
+        )
+        head, self._head = self._head, b""
+        return head
+
+    def _enough(self) -> bool:
+        return self.max_chars is not None and self._length >= self.max_chars
+
+    def _collect(self) -> bool:
+        for _, element in self._parser.read_events():
+            if self._enough():
+                break
+            text = "".join(element.itertext())
+            self._paragraphs.append(text)
+            self._length += len(text)
+            # Free the paragraph's subtree; its text has been copied out, and a paragraph
+            # nested in another one is not repeated in the text of the outer one
+            element.clear(keep_tail=True)
+        return self._enough()
+
+
+class SelectolaxExtractor:
+    """
+    Joins the text of all <p> elements with selectolax's lexbor parser.
+
+    The page is buffered and parsed once it is complete.
+    """
+
+    name = "selectolax"
+
+    def __init__(self, max_chars=None, encoding=None):
+        from selectolax.lexbor import LexborHTMLParser
+
+        self._parser_class = LexborHTMLParser
+        self.max_chars = max_chars
+        self.encoding = encoding
+        self._chunks = []
+
+    def feed(self, chunk: bytes) -> bool:
+        """Add a chunk of the page; returns True once no more input is needed."""
+        self._chunks.append(chunk)
+        return False
+
+    def close(self) -> str:
+        """Return the extracted paragraph text."""
+        html = b"".join(self._chunks)
+        html = html.decode(self.encoding or sniff_encoding(html), errors="replace")
+        tree = self._parser_class(html)
+        # Innermost paragraphs first, each removed once its text is taken so that its text
+        # is not repeated in an enclosing paragraph
+        paragraphs = []
+        for node in reversed(tree.css("p")):
+            paragraphs.append(node.text(deep=True))
+            node.decompose()
+        return join_paragraphs(reversed(paragraphs), self.max_chars)
+
+
+def join_paragraphs(paragraphs, max_chars=None) -> str:
+    """Join paragraph texts with newlines, stopping after the paragraph that reaches `max_chars`."""
+    kept, length = [], 0
+    for text in paragraphs:
+        if max_chars is not None and length >= max_chars:
+            break
+        kept.append(text)
+        length += len(text)
+    return "\n".join(kept)
+
+
+EXTRACTORS = {
+    "html.parser": HtmlParserExtractor,
+    "lxml": LxmlExtractor,
+    "selectolax": SelectolaxExtractor,
+}
+
+
+# Extractors tried in turn by "auto": lxml parses while the page downloads and can stop it early,
+# selectolax parses a buffered page fastest, html.parser needs no optional dependency
+AUTO_EXTRACTORS = ("lxml", "selectolax", "html.parser")
+
+
+def create_extractor(name: str = "auto", max_chars=None, encoding=None):
+    """
+    Create a paragraph extractor by name; "auto" picks the first installed of AUTO_EXTRACTORS.
+    The extractors repair malformed markup differently (e.g. <p> tags misnested with inline tags),
+    so their paragraphs can differ on such pages.
+    """
+    if name == "auto":
+        for candidate in AUTO_EXTRACTORS:
+            try:
+                return EXTRACTORS[candidate](max_chars=max_chars, encoding=encoding)
+            except ImportError:
+                continue
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown HTML extractor: {name}")
+    return EXTRACTORS[name](max_chars=max_chars, encoding=encoding)
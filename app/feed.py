@@ -0,0 +1,118 @@
+import asyncio
+import time
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional
+from logger_config import logger
+
+
+class FeedEntry:
+    """
+    Scored articles of one outlet and the time they were fetched.
+    """
+
+    def __init__(self, articles: Optional[List[Dict]], refreshed_at: float):
+        self.articles = articles
+        self.refreshed_at = refreshed_at
+
+    def age(self) -> float:
+        return time.time() - self.refreshed_at
+
+
+class OutletFeed:
+    """
+    In-memory cache of scraped and scored outlet news, refreshed in the background.
+
+    Requests are served from the cache. An entry older than `stale_after` seconds
+    is still served while one refresh runs in the background (stale-while-revalidate);
+    concurrent requests for the same outlet share that single upstream fetch.
+    `record`, when given, is called with the outlet and its articles after each scored refresh.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Optional[List[Dict]]]],
+        score: Callable[[List[str]], Awaitable[List[tuple]]],
+        source_ids: List[str],
+        refresh_interval: float = 600,
+        stale_after: float = 300,
+        record: Optional[Callable[[str, List[Dict]], None]] = None,
+    ):
+        self.fetch = fetch
+        self.score = score
+        self.record = record
+        self.source_ids = source_ids
+        self.refresh_interval = refresh_interval
+        self.stale_after = stale_after
+        self.entries: Dict[str, FeedEntry] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._worker = None
+
+    async def start(self):
+        """Start refreshing every outlet periodically."""
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic refresh and any refresh still in flight."""
+        tasks = list(self._inflight.values())
+        if self._worker is not None:
+            tasks.append(self._worker)
+            self._worker = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def get(self, source_id: str) -> FeedEntry:
+        """Return the cached entry of an outlet, fetching it first if there is none."""
+        entry = self.entries.get(source_id)
+        if entry is None:
+            # Shielded so that a cancelled request does not cancel the refresh shared with others
+            return await asyncio.shield(self.refresh(source_id))
+        if entry.age() > self.stale_after:
+            # Serve the stale entry now and revalidate in the background
+            self.refresh(source_id)
+        return entry
+
+    def refresh(self, source_id: str) -> asyncio.Task:
+        """Fetch, score and store an outlet's news; joins the refresh already in flight, if any."""
+        task = self._inflight.get(source_id)
+        if task is None:
+            task = asyncio.create_task(self._refresh(source_id))
+            self._inflight[source_id] = task
+            task.add_done_callback(partial(self._refresh_done, source_id))
+        return task
+
+    def _refresh_done(self, source_id: str, task: asyncio.Task):
+        self._inflight.pop(source_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Refresh of outlet {} failed: {}", source_id, task.exception())
+
+    async def _refresh(self, source_id: str) -> FeedEntry:
+        started = time.perf_counter()
+        articles = await self.fetch(source_id)
+        if articles:
+            try:
+                results = await self.score([f"{article['title']} {article['content']}" for article in articles])
+                for article, (prediction, confidence, probabilities, *_) in zip(articles, results):
+                    article.update(prediction=prediction, confidence=confidence, probabilities=probabilities)
+                if self.record is not None:
+                    self.record(source_id, articles)
+            except Exception as e:
+                logger.exception("Failed to score news for outlet {}: {}", source_id, e)
+        elif source_id in self.entries:
+            # Keep serving the previous articles when the upstream fetch came back empty
+            logger.warning("Refresh of outlet {} returned no articles; keeping the cached ones.", source_id)
+            return self.entries[source_id]
+
+        entry = FeedEntry(articles, time.time())
+        self.entries[source_id] = entry
+        logger.info("Refreshed outlet {} in {:.2f}s", source_id, time.perf_counter() - started)
+        return entry
+
+    async def _run(self):
+        while True:
+            for source_id in self.source_ids:
+                try:
+                    await self.refresh(source_id)
+                except Exception as e:
+                    logger.exception("Background refresh of outlet {} failed: {}", source_id, e)
+            await asyncio.sleep(self.refresh_interval)
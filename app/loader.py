@@ -0,0 +1,113 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+from logger_config import logger
+
+# States a model goes through, reported by /ready
+PENDING, LOADING, WARMING, READY, FAILED = "pending", "loading", "warming", "ready", "failed"
+
+
+def warmup_inputs(bucket_boundaries, batch_size: int) -> List[str]:
+    """Inputs spread over the length buckets, so that each padded shape is run once before serving."""
+    lengths = [max(boundary - 2, 1) for boundary in bucket_boundaries] or [8]
+    return [" ".join(["news"] * lengths[i % len(lengths)]) for i in range(batch_size)]
+
+
+def _failed(task: asyncio.Task) -> bool:
+    return task.done() and (task.cancelled() or task.exception() is not None)
+
+
+class ModelLoader:
+    """
+    Loads the configured model variants in the background or on first use and tracks their progress.
+
+    The registry (and with it torch and transformers) is only created when the first
+    model is loaded. Every load is followed by a warmup batch, and concurrent requests
+    for a model that is still loading wait for the same load. A failed load is
+    retried by the next request for the model.
+    """
+
+    def __init__(
+        self,
+        create_registry: Callable[[], object],
+        model_specs: Dict[str, dict],
+        device: str = "cpu",
+        warmup_batch_size: int = 0,
+    ):
+        self.create_registry = create_registry
+        self.model_specs = model_specs
+        self.device = device
+        self.warmup_batch_size = warmup_batch_size
+        self.registry = None
+        self.states = dict.fromkeys(model_specs, PENDING)
+        self.errors: Dict[str, str] = {}
+        self.load_seconds: Dict[str, float] = {}
+        self._registry_task: Optional[asyncio.Task] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._background: Optional[asyncio.Task] = None
+
+    def start(self, names: List[str]):
+        """Load the given models one after another in the background."""
+        self._background = asyncio.create_task(self._load_all(names))
+
+    async def stop(self):
+        if self._background is not None:
+            self._background.cancel()
+            await asyncio.gather(self._background, return_exceptions=True)
+
+    async def _load_all(self, names: List[str]):
+        for name in names:
+            try:
+                await self.get(name)
+            except Exception:
+                # Already logged and recorded in the model's state
+                pass
+
+    async def get(self, name: str):
+        """Return a loaded model wrapper, loading it first if needed."""
+        task = self._tasks.get(name)
+        if task is None or _failed(task):
+            task = asyncio.create_task(self._load(name))
+            self._tasks[name] = task
+        # Shielded so that a cancelled request does not cancel a load shared with others
+        return await asyncio.shield(task)
+
+    async def _get_registry(self):
+        if self._registry_task is None or _failed(self._registry_task):
+            self._registry_task = asyncio.create_task(asyncio.to_thread(self.create_registry))
+        return await asyncio.shield(self._registry_task)
+
+    async def _load(self, name: str):
+        started = time.perf_counter()
+        self.states[name] = LOADING
+        try:
+            self.registry = await self._get_registry()
+            model_wrapper = await asyncio.to_thread(self.registry.load, **self.model_specs[name])
+            if self.warmup_batch_size:
+                self.states[name] = WARMING
+                texts = warmup_inputs(self.model_specs[name].get("bucket_boundaries", ()), self.warmup_batch_size)
+                await asyncio.to_thread(model_wrapper.predict_batch, texts, self.device)
+        except Exception as e:
+            self.states[name] = FAILED
+            self.errors[name] = str(e)
+            logger.exception("Failed to load {}: {}", name, e)
+            raise
+        self.states[name] = READY
+        self.errors.pop(name, None)
+        self.load_seconds[name] = round(time.perf_counter() - started, 3)
+        logger.info("{} loaded and warmed up in {:.2f}s", name, self.load_seconds[name])
+        return model_wrapper
+
+    def ready(self, names: List[str]) -> bool:
+        """Whether the given models are loaded and warmed up; a failed model is not ready."""
+        return all(self.states[name] == READY for name in names)
+
+    def status(self) -> dict:
+        """Loading progress of every configured model."""
+        return {
+            "models": self.states,
+            "loaded": sum(state == READY for state in self.states.values()),
+            "total": len(self.states),
+            "errors": self.errors,
+            "load_seconds": self.load_seconds,
+        }
@@ -1,6 +1,7 @@
 # logger_config.py
 import os
-import sys
+import random
+import threading
 from pathlib import Path
 from loguru import logger
 
@@ -8,6 +9,82 @@ from loguru import logger
 logs_dir = Path("logs")
 logs_dir.mkdir(exist_ok=True)
 
+WARNING_LEVEL_NO = logger.level("WARNING").no
+
+
+def parse_sample_rates(value: str) -> dict:
+    """Parse "/predict=0.01,/predict/batch=0.1" into {route: fraction of success logs kept}."""
+    rates = {}
+    for entry in filter(None, (item.strip() for item in value.split(","))):
+        route, _, rate = entry.rpartition("=")
+        rates[route] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class LogControl:
+    """
+    Owns the log sink, its level and the per-route sampling of routine logs.
+
+    Records carry the route they were logged for in `extra["route"]` (bound by the
+    request middleware, or "inference" and "scrape" for the hot paths off the request).
+    Below WARNING, a record of a route with a sample rate is kept for that fraction of
+    requests; warnings and errors are always kept. With enqueue, formatting and writing
+    happen on loguru's background thread, so the caller only pays for the filter.
+    """
+
+    def __init__(self, path: Path, level: str, serialize: bool, enqueue: bool, sample_rates: dict):
+        self.path = path
+        self.serialize = serialize
+        self.enqueue = enqueue
+        self.sample_rates = sample_rates
+        self.level = None
+        self._handler_id = None
+        self._lock = threading.Lock()
+        self.set_level(level)
+
+    def should_log(self, route: str) -> bool:
+        """Decide once per request whether its routine logs are kept."""
+        rate = self.sample_rates.get(route)
+        return rate is None or random.random() < rate
+
+    def filter(self, record) -> bool:
+        if record["level"].no >= WARNING_LEVEL_NO:
+            return True
+        extra = record["extra"]
+        sampled = extra.get("sampled")
+        if sampled is not None:
+            return sampled
+        return self.should_log(extra.get("route"))
+
+    def set_level(self, level: str):
+        """
+        Change the level without a restart. The sink is re-added at the new level, so that
+        loguru drops records below it before formatting them; the old sink drains first.
+        """
+        level = level.upper()
+        logger.level(level)  # Raises ValueError for an unknown level
+        with self._lock:
+            if self._handler_id is not None:
+                logger.remove(self._handler_id)
+            self._handler_id = logger.add(
+                self.path,
+                level=level,
+                filter=self.filter,
+                format="{time} {level} {message}",
+                serialize=self.serialize,
+                enqueue=self.enqueue,
+                rotation="10 MB",
+                retention="7 days",
+            )
+            self.level = level
+
+    def status(self) -> dict:
+        return {"level": self.level, "serialize": self.serialize, "enqueue": self.enqueue, "sample_rates": self.sample_rates}
+
+
+log_control = None
+
+
 def setup_logger():
     """Set up and return a logger instance based on the environment."""
     ENV = os.getenv("ENV", "DEV")  # Default to DEV if ENV is not set
@@ -15,13 +92,15 @@ def setup_logger():
     # Clear default handlers
     logger.remove()
 
-    if ENV == "DEV":
-        # add log file in development
-        logger.add(logs_dir/"development.log", level="DEBUG", rotation="10 MB", retention="7 days",
-                   format="{time} {level} {message}")
-    else:  # Production
-        logger.add(logs_dir/"production.log", level="INFO", rotation="10 MB", retention="7 days",
-                   format="{time} {level} {message}")
+    global log_control
+    log_control = LogControl(
+        # Log file in development, production log otherwise
+        logs_dir/("development.log" if ENV == "DEV" else "production.log"),
+        level=os.getenv("LOG_LEVEL", "DEBUG" if ENV == "DEV" else "INFO"),
+        serialize=os.getenv("LOG_FORMAT", "text").lower() == "json",
+        enqueue=os.getenv("LOG_ENQUEUE", "true").lower() == "true",
+        sample_rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+    )
 
     return logger
 
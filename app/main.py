@@ -1,11 +1,10 @@
-import torch
 import uvicorn
-import mlflow
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.routing import Match
 import sys
 from pathlib import Path
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
 # ignore warnings
 import warnings
@@ -20,13 +19,28 @@ parent_dir = current_file.parent
 # Append the 'app' directory to sys.path
 sys.path.append(str(parent_dir))
 
-from logger_config import logger
+from logger_config import log_control, logger
 from schema import NewsArticle, PredictionResponse
-from model import Model
+from workers import WorkerPool
+from loader import ModelLoader
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import Literal, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from batcher import InferenceExecutor, MicroBatcher, QueueFullError
+from cache import cache_key, create_prediction_cache
+from dedup import create_near_duplicate_index
 from config import get_config
-from peft import LoraConfig
-from constants import NEWS_SOURCES
-from news_app import get_outlet_news
+from constants import NEWS_SOURCES, LORA_SETTINGS
+from news_app import fetch_outlet_news, get_outlet_news, stream_outlet_news
+from scraper import create_async_client
+from feed import OutletFeed
+from metrics import CASCADE_ANSWERS, PREDICTIONS, REGISTRY, REQUEST_SECONDS, Gauge
+from cascade import CASCADE, Cascade
+from analytics import GRANULARITIES, create_analytics_store
 
 # Load the configuration
 config = get_config()
@@ -48,79 +62,637 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def route_template(scope) -> str:
+    """The path template of the route a request matches, e.g. /outlets/{outlet}."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_time(request: Request, call_next):
+    """
+    Observe the time of every request per route template, method and status, and tag
+    its logs with the route and whether its routine logs are sampled in.
+    """
+    started = time.perf_counter()
+    status = 500
+    # The route template, not the raw path, keeps /outlets/{outlet} to one label value
+    route = route_template(request.scope)
+    try:
+        with logger.contextualize(route=route, sampled=log_control.should_log(route)):
+            response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method, status=status)
+
 models = {}
+batchers = {}
+prediction_cache = create_prediction_cache(config)
+# Per model name: (weights version, near-duplicate index of the articles it scored)
+near_duplicates = {}
+# Confidence-based routing of model_name="cascade" requests (None when CASCADE_MODELS is empty)
+cascade = Cascade(config["CASCADE_MODELS"], config["CASCADE_THRESHOLDS"]) if config["CASCADE_MODELS"] else None
+# In worker-pool mode each thread dispatches to one worker process at a time
+inference_executor = InferenceExecutor(
+    max_workers=max(config["INFERENCE_WORKERS"], config["INFERENCE_PROCESSES"]),
+    max_pending=config["MAX_INFERENCE_QUEUE"],
+)
 
-@app.on_event("startup")
-async def startup_event():
+# Latest memory report of the loaded models, refreshed in the background for the /metrics gauges
+memory_report = {}
+
+async def refresh_memory_report():
+    """
+    Refresh the memory report every MEMORY_REPORT_INTERVAL seconds. In worker-pool mode the report
+    is a round trip to an inference worker, so /metrics scrapes never ask for it themselves.
     """
-    Initialize the application and load the model on startup.
+    global memory_report
+    while True:
+        registry = app.state.model_loader.registry
+        if registry is not None:
+            try:
+                memory_report = await asyncio.to_thread(registry.memory_report)
+            except Exception as e:
+                logger.warning("Could not refresh the model memory report: {}", e)
+        await asyncio.sleep(config["MEMORY_REPORT_INTERVAL"])
+
+def register_gauges():
+    """Gauges read when /metrics is scraped."""
+    REGISTRY.register(
+        Gauge("inference_queue_pending", "Inputs admitted to the inference executor and not yet answered.")
+    ).set_function(lambda: inference_executor.pending)
+    REGISTRY.register(
+        Gauge("batcher_queue_depth", "Inputs waiting to be batched per model.", ["model"])
+    ).set_function(lambda: {name: batcher.queue_depth() for name, batcher in batchers.items()})
+    REGISTRY.register(
+        Gauge("models_loaded", "Models loaded and warmed up.")
+    ).set_function(lambda: app.state.model_loader.status()["loaded"] if hasattr(app.state, "model_loader") else 0)
+    REGISTRY.register(
+        Gauge("model_weight_bytes", "Weight bytes per loaded model.", ["model"])
+    ).set_function(lambda: memory_report.get("models", {}))
+    REGISTRY.register(
+        Gauge("model_stored_bytes", "Weight bytes actually stored, shared weights counted once.")
+    ).set_function(lambda: memory_report.get("stored_bytes", 0))
+
+register_gauges()
+
+def configure_torch_threads():
+    """
+    Size torch's intra-op and inter-op thread pools before any forward pass runs.
+    """
+    import torch
+
+    if config["TORCH_NUM_THREADS"]:
+        torch.set_num_threads(config["TORCH_NUM_THREADS"])
+    if config["TORCH_INTEROP_THREADS"]:
+        try:
+            torch.set_num_interop_threads(config["TORCH_INTEROP_THREADS"])
+        except RuntimeError as e:
+            # Only possible before the first parallel operation, e.g. not after a reload
+            logger.warning("Could not set torch inter-op threads: {}", e)
+    logger.info(
+        "Inference pool: {} workers, {} intra-op and {} inter-op torch threads",
+        config["INFERENCE_WORKERS"],
+        torch.get_num_threads(),
+        torch.get_num_interop_threads(),
+    )
+
+def create_news_fetcher():
+    """
+    Return an async fetch of an outlet's news, an async iterator of its articles as they
+    are scraped, and a close function: over httpx when installed, otherwise the threaded
+    requests scraper on its own I/O pool so inference threads stay free.
+    """
+    try:
+        client = create_async_client(max_connections=config["HTTP_MAX_CONNECTIONS"])
+    except ImportError:
+        logger.warning("httpx is not installed; fetching outlet news on {} I/O threads.", config["IO_THREADS"])
+        io_executor = ThreadPoolExecutor(max_workers=config["IO_THREADS"], thread_name_prefix="io")
+
+        async def fetch(source_id):
+            return await asyncio.get_running_loop().run_in_executor(io_executor, get_outlet_news, source_id)
+
+        async def stream(source_id, limit=None):
+            # The threaded scraper returns all pages at once, so nothing is sent before they are scraped
+            articles = await asyncio.get_running_loop().run_in_executor(
+                io_executor, partial(get_outlet_news, source_id, limit=limit)
+            )
+            for article in articles or []:
+                yield article
+
+        async def close():
+            io_executor.shutdown(wait=False)
+
+        return fetch, stream, close
+
+    async def fetch(source_id):
+        return await fetch_outlet_news(client, source_id)
+
+    def stream(source_id, limit=None):
+        return stream_outlet_news(client, source_id, limit=limit)
+
+    return fetch, stream, client.aclose
+
+def service_unavailable(e: QueueFullError) -> HTTPException:
+    """
+    Shed load when the inference queue is full, telling clients when to retry.
+    """
+    logger.warning("Rejecting request: {}", e)
+    return HTTPException(
+        status_code=503, detail=str(e), headers={"Retry-After": str(config["RETRY_AFTER_SECONDS"])}
+    )
+
+def build_model_specs() -> dict:
+    """
+    Loading arguments of each model variant listed in MODELS.
     """
-    base_model_name = "bert-base-uncased"
     model_paths = {
         "model": config["MODEL_PATH"],
         "quantized_model": config["MODEL_PATH1"],
         "lora_model": config["MODEL_PATH2"]
     }
-    logger.info("Loading pre-trained BERT model and tokenizer.")
-    base_model = AutoModelForSequenceClassification.from_pretrained(base_model_name, num_labels=3)
-    tokenizer = AutoTokenizer.from_pretrained(base_model_name)
+    model_specs = {}
+    for model_name in config["MODELS"]:
+        model_config = None
+        if model_name == "lora_model":
+            from peft import LoraConfig
 
-    for model_name, model_path in model_paths.items():
-        try:
-            model_config = None
-            device = config["DEVICE"]
-            
-            if model_name == "lora_model":
-                model_config = LoraConfig(
-                    r=16,
-                    lora_alpha=32,
-                    lora_dropout=0.1,
-                    bias="none"
-                )
-            logger.info(f"Initializing Model wrapper for {model_name} with device: {device} and model path: {model_path}")
-            model_wrapper = Model(model_path=model_path, model=base_model, tokenizer=tokenizer)
-            model_wrapper.load(device=device, model_config=model_config)  # Load the fine-tuned weights
-            
+            model_config = LoraConfig(**LORA_SETTINGS)
+        model_specs[model_name] = {
+            "name": model_name,
+            "model_path": model_paths[model_name],
+            "lora_config": model_config,
+            "quantized": model_name in config["QUANTIZED_MODELS"],
+            "backend": config["MODEL_BACKENDS"].get(model_name, "eager"),
+            "early_exit": (
+                {"criterion": config["EARLY_EXIT_CRITERION"], "threshold": config["EARLY_EXIT_THRESHOLD"]}
+                if model_name in config["EARLY_EXIT_MODELS"]
+                else None
+            ),
+            "bucket_boundaries": config["LENGTH_BUCKETS"],
+        }
+    return model_specs
+
+def create_registry(model_specs: dict):
+    """
+    Create the model registry, importing torch and transformers only now.
+    In worker-pool mode, start the workers, which load every model up front.
+    """
+    configure_torch_threads()
+    if config["INFERENCE_PROCESSES"]:
+        # Forward passes run in pinned worker processes that share the memory-mapped weights
+        pool = WorkerPool(
+            config["BASE_MODEL_NAME"],
+            list(model_specs.values()),
+            device=config["DEVICE"],
+            num_workers=config["INFERENCE_PROCESSES"],
+            threads_per_worker=config["TORCH_NUM_THREADS"],
+            warmup_batch_size=config["WARMUP_BATCH_SIZE"],
+            token_cache_size=config["TOKEN_CACHE_SIZE"],
+        )
+        pool.start()
+        return pool
+
+    from registry import ModelRegistry
+
+    logger.info("Loading BERT configuration and tokenizer.")
+    # Each variant gets its own module; identical weights are stored once by the registry
+    return ModelRegistry(
+        config["BASE_MODEL_NAME"],
+        device=config["DEVICE"],
+        token_cache_size=config["TOKEN_CACHE_SIZE"],
+        num_threads=config["TORCH_NUM_THREADS"],
+    )
+
+async def get_batcher(model_name: str) -> MicroBatcher:
+    """
+    Return the batcher of a configured model, loading the model on first use.
+    """
+    if model_name not in batchers:
+        model_wrapper = await app.state.model_loader.get(model_name)
+        if model_name not in batchers:
             # Store the loaded models
-            models[model_name] = (model_wrapper, device, model_config)
-            logger.info(f"{model_name} loaded successfully on startup.")
+            spec = app.state.model_loader.model_specs[model_name]
+            models[model_name] = (model_wrapper, config["DEVICE"], spec["lora_config"])
+            batchers[model_name] = MicroBatcher(
+                model_wrapper,
+                config["DEVICE"],
+                max_batch_size=config["MAX_BATCH_SIZE"],
+                max_wait_ms=config["MAX_BATCH_WAIT_MS"],
+                executor=inference_executor,
+            )
+            await batchers[model_name].start()
+    return batchers[model_name]
 
-        except Exception as e:
-            logger.exception(f"Failed to load {model_name}: {e}")
+@app.on_event("startup")
+async def startup_event():
+    """
+    Initialize the application and start loading the models without blocking the server.
+    """
+    model_specs = build_model_specs()
+    app.state.model_loader = ModelLoader(
+        partial(create_registry, model_specs),
+        model_specs,
+        device=config["DEVICE"],
+        # Worker processes warm up their own models
+        warmup_batch_size=0 if config["INFERENCE_PROCESSES"] else config["WARMUP_BATCH_SIZE"],
+    )
+    # Models that must be loaded before /ready reports ready; the others load on first use
+    app.state.preloaded_models = list(model_specs) if config["LOAD_MODELS"] == "eager" else []
+    app.state.model_loader.start(app.state.preloaded_models)
+    app.state.memory_refresh = asyncio.create_task(refresh_memory_report())
+
+    # Keep every outlet's news scraped and scored in the background, recording it for analytics
+    app.state.analytics = create_analytics_store(config)
+    fetch, app.state.stream_news, app.state.close_fetcher = create_news_fetcher()
+    app.state.outlet_feed = OutletFeed(
+        fetch=fetch,
+        score=score_feed_articles,
+        source_ids=list(NEWS_SOURCES.values()),
+        refresh_interval=config["FEED_REFRESH_INTERVAL"],
+        stale_after=config["FEED_STALE_AFTER"],
+        record=app.state.analytics.record if app.state.analytics is not None else None,
+    )
+    if config["FEED_BACKGROUND_REFRESH"]:
+        await app.state.outlet_feed.start()
+
+async def score_feed_articles(input_data: list[str]) -> list:
+    """
+    Score outlet articles with the model configured for the feed, through the prediction cache
+    and the near-duplicate index, since outlets often carry the same wire stories.
+    """
+    if config["FEED_MODEL"] not in app.state.model_loader.model_specs:
+        raise RuntimeError(f"Feed model {config['FEED_MODEL']} is not configured.")
+    return await score_inputs(config["FEED_MODEL"], input_data)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Stop the outlet feed refresh, the batching loops of all loaded models and the worker pools,
+    then write the buffered analytics and flush the logs.
+    """
+    await app.state.outlet_feed.stop()
+    app.state.memory_refresh.cancel()
+    await asyncio.gather(app.state.memory_refresh, return_exceptions=True)
+    if app.state.analytics is not None:
+        app.state.analytics.close()
+    await app.state.model_loader.stop()
+    for batcher in batchers.values():
+        await batcher.stop()
+    inference_executor.shutdown()
+    if isinstance(app.state.model_loader.registry, WorkerPool):
+        app.state.model_loader.registry.stop()
+    await app.state.close_fetcher()
+    # Flush the records still queued for the background log writer
+    await logger.complete()
+
+def model_input(article: NewsArticle):
+    """The text of an article, or its pre-tokenized input ids."""
+    if article.input_ids is not None:
+        return article.input_ids
+    return f"{article.title} {article.content}"
+
+def check_input_ids(model_wrapper, articles: list[NewsArticle]):
+    """Reject pre-tokenized input ids outside the model's vocabulary before they are batched with other requests."""
+    for article in articles:
+        if article.input_ids is not None and max(article.input_ids) >= model_wrapper.vocab_size:
+            raise HTTPException(
+                status_code=400, detail=f"input_ids must be smaller than the vocabulary size {model_wrapper.vocab_size}."
+            )
+
+def prediction_cache_key(model_name: str, input_data, long_document: bool = False, aggregation: str = "mean") -> str:
+    """
+    Build the prediction cache key of an input (a text or input ids) for a loaded model and inference mode.
+    """
+    mode = ""
+    if not isinstance(input_data, str):
+        input_data, mode = " ".join(map(str, input_data)), "ids"
+    if long_document:
+        mode = (
+            f"long:{aggregation}:{config['LONG_DOC_MAX_WINDOWS']}:"
+            f"{config['LONG_DOC_TOKEN_BUDGET']}:{config['LONG_DOC_STRIDE']}"
+        )
+    return cache_key(input_data, model_name, models[model_name][0].weights_version, mode)
+
+def requested_models(model_name: str) -> list[str]:
+    """The models a request runs through: the selected model, or the stages of the cascade."""
+    model_specs = app.state.model_loader.model_specs
+    if model_name == CASCADE:
+        if cascade is None or not set(cascade.stages) <= model_specs.keys():
+            raise HTTPException(status_code=400, detail="The cascade is not configured.")
+        return cascade.stages
+    if model_name not in model_specs:
+        raise HTTPException(status_code=400, detail="Invalid model name selected.")
+    return [model_name]
+
+def near_duplicate_index(model_name: str):
+    """The near-duplicate index of a loaded model, started afresh when its weights change; None when disabled."""
+    version = models[model_name][0].weights_version
+    entry = near_duplicates.get(model_name)
+    if entry is None or entry[0] != version:
+        index = create_near_duplicate_index(config)
+        if index is None:
+            return None
+        entry = near_duplicates[model_name] = (version, index)
+    return entry[1]
+
+def cached_result(cached: list) -> tuple:
+    """A prediction cache entry as a result tuple; entries written before early exit hold no exit layer."""
+    return tuple(cached) + (None,) * (5 - len(cached))
+
+async def cache_call(func, *args):
+    """Call the prediction cache, in a thread when its backend blocks on disk (SQLite)."""
+    if prediction_cache.blocking:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+async def score_inputs(model_name: str, input_data: list, single: bool = False) -> list:
+    """
+    Score inputs with one model, answering cached inputs from the prediction cache and
+    near-duplicates of already scored texts from the near-duplicate index.
+    A single input joins the model's micro-batches; several run as one batch job.
+    Returns one (prediction, confidence, probabilities, None, exit layer) tuple per input,
+    laid out like the results of score_long and the prediction cache entries.
+    """
+    batcher = await get_batcher(model_name)
+    results = [None] * len(input_data)
+    keys = [None] * len(input_data)
+    # Results to write to the prediction cache, in one call once the inputs are answered
+    cache_updates = []
+    if prediction_cache is not None:
+        # Answer cached articles directly and only score the misses
+        keys = [prediction_cache_key(model_name, item) for item in input_data]
+        for i, cached in enumerate(await cache_call(prediction_cache.get_many, keys)):
+            if cached is not None:
+                results[i] = cached_result(cached)
+    PREDICTIONS.inc(len(input_data) - results.count(None), model=model_name, outcome="cached")
+    index = near_duplicate_index(model_name)
+    fingerprints = {}
+    texts = [i for i, result in enumerate(results) if result is None and isinstance(input_data[i], str)]
+    if index is not None and texts:
+        # Reuse the prediction of an already scored near-identical text, e.g. a lightly edited wire story.
+        # Signatures take milliseconds per long article, so they are computed off the event loop,
+        # but outside the inference executor so that hashing takes no room from forward passes
+        found, duplicates = await asyncio.to_thread(index.match, [input_data[i] for i in texts])
+        fingerprints = dict(zip(texts, found))
+        for i, duplicate in zip(texts, duplicates):
+            if duplicate is not None:
+                results[i] = duplicate
+                PREDICTIONS.inc(model=model_name, outcome="near_duplicate")
+                if keys[i] is not None:
+                    cache_updates.append((keys[i], list(duplicate)))
+    misses = [i for i, result in enumerate(results) if result is None]
+    if not misses:
+        if cache_updates:
+            await cache_call(prediction_cache.set_many, cache_updates)
+        return results
+    try:
+        if single and len(misses) == 1:
+            # Queue the article for a batched forward pass of the selected fine-tuned model
+            scored = [await batcher.submit(input_data[misses[0]])]
+        else:
+            scored = await batcher.run_batch([input_data[i] for i in misses], chunk_size=config["PREDICT_CHUNK_SIZE"])
+    except QueueFullError:
+        # Counted here, where the rejecting model is known, e.g. a stage of the cascade
+        PREDICTIONS.inc(len(misses), model=model_name, outcome="rejected")
+        raise
+    for i, (prediction, confidence, probabilities, *exit_layer) in zip(misses, scored):
+        results[i] = (prediction, confidence, probabilities, None, exit_layer[0] if exit_layer else None)
+        if keys[i] is not None:
+            cache_updates.append((keys[i], list(results[i])))
+        if i in fingerprints:
+            signature, head = fingerprints[i]
+            index.add(signature, results[i], head)
+    PREDICTIONS.inc(len(misses), model=model_name, outcome="ok")
+    if cache_updates:
+        await cache_call(prediction_cache.set_many, cache_updates)
+    return results
+
+async def score_long(model_name: str, text: str, aggregation: str) -> tuple:
+    """
+    Score overlapping windows of a full article in one forward pass.
+    Returns (prediction, confidence, probabilities, number of windows, None).
+    """
+    batcher = await get_batcher(model_name)
+    key = cached = None
+    if prediction_cache is not None:
+        key = prediction_cache_key(model_name, text, True, aggregation)
+        cached = await cache_call(prediction_cache.get, key)
+    if cached is not None:
+        PREDICTIONS.inc(model=model_name, outcome="cached")
+        return cached_result(cached)
+    try:
+        prediction, confidence, probabilities, windows = await batcher.run(
+            batcher.model_wrapper.predict_long,
+            text,
+            batcher.device,
+            aggregation,
+            config["LONG_DOC_MAX_WINDOWS"],
+            config["LONG_DOC_TOKEN_BUDGET"],
+            config["LONG_DOC_STRIDE"],
+        )
+    except QueueFullError:
+        PREDICTIONS.inc(model=model_name, outcome="rejected")
+        raise
+    result = (prediction, confidence, probabilities, windows, None)
+    if key is not None:
+        await cache_call(prediction_cache.set, key, list(result))
+    PREDICTIONS.inc(model=model_name, outcome="ok")
+    return result
+
+def long_document_scorer(aggregation: str):
+    """A scorer laid out like score_inputs that scores each text as a long document with score_long."""
+    async def score(model_name: str, input_data: list) -> list:
+        return [await score_long(model_name, text, aggregation) for text in input_data]
+    return score
+
+def prediction_response(result: tuple, stage: str = None) -> PredictionResponse:
+    prediction, confidence, probabilities, windows, exit_layer = result
+    return PredictionResponse(
+        prediction=prediction,
+        confidence=confidence,
+        probabilities=probabilities,
+        windows=windows,
+        stage=stage,
+        exit_layer=exit_layer,
+    )
 
 @app.post("/predict", response_model=PredictionResponse)
-def predict(article: NewsArticle):
+async def predict(article: NewsArticle):
     """
-    Predict the political leaning of a news article based on the selected fine-tuned model.
+    Predict the political leaning of a news article based on the selected fine-tuned model,
+    or with model_name "cascade", with the cheapest model confident enough to answer.
     """
     try:
         logger.info("Received prediction request.")
         # Get the selected fine-tuned model from the request
         selected_model = article.model_name
 
-        if selected_model not in models:
-            raise HTTPException(status_code=400, detail="Invalid model name selected.")
-        
-        input_data = [f"{article.title} {article.content}"]
-        device = models[selected_model][1]
-        # Use the selected fine-tuned model for prediction
+        for model_name in requested_models(selected_model):
+            batcher = await get_batcher(model_name)
+            check_input_ids(batcher.model_wrapper, [article])
+
+        input_data = model_input(article)
+        if article.long_document:
+            score = long_document_scorer(article.aggregation)
+        else:
+            score = partial(score_inputs, single=True)
+
         logger.info("Performing prediction using model: {}", selected_model)
-        prediction, confidence, probabilities = models[selected_model][0].predict(input_data, device=models[selected_model][1])
+        stage = None
+        if selected_model == CASCADE:
+            [(result, stage)] = await cascade.run(score, [input_data])
+            CASCADE_ANSWERS.inc(stage=stage)
+        else:
+            [result] = await score(selected_model, [input_data])
 
         logger.info(
             "Prediction successful: Class - {}, Confidence - {:.2f}",
-            prediction,
-            confidence,
-        )
-        return PredictionResponse(
-            prediction=prediction,
-            confidence=confidence,
-            probabilities=probabilities
+            result[0],
+            result[1],
         )
+        return prediction_response(result, stage)
+    except QueueFullError as e:
+        raise service_unavailable(e)
+    except HTTPException:
+        raise
     except Exception as e:
+        PREDICTIONS.inc(model=article.model_name, outcome="error")
         logger.exception("Prediction failed: {}", e)
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@app.post("/predict/batch", response_model=list[PredictionResponse])
+async def predict_batch(articles: list[NewsArticle]):
+    """
+    Predict the political leaning of many news articles, batching the forward passes per model.
+    Articles sent to the cascade are escalated to the next stage together. Long documents are
+    scored one by one over their windows, as by /predict.
+    """
+    # The group of articles being scored, for the error counter
+    group = None
+    try:
+        logger.info("Received batch prediction request for {} articles.", len(articles))
+        if len(articles) > config["MAX_BATCH_REQUEST_ITEMS"]:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {config['MAX_BATCH_REQUEST_ITEMS']} articles are accepted per request.",
+            )
+
+        # Group the articles by model, and long documents by aggregation, so that each group
+        # runs its own batched forward passes
+        positions_by_group = {}
+        for position, article in enumerate(articles):
+            key = (article.model_name, article.aggregation if article.long_document else None)
+            positions_by_group.setdefault(key, []).append(position)
+        for (model_name, _), positions in positions_by_group.items():
+            for stage in requested_models(model_name):
+                batcher = await get_batcher(stage)
+                check_input_ids(batcher.model_wrapper, [articles[i] for i in positions])
+
+        responses = [None] * len(articles)
+        for group, positions in positions_by_group.items():
+            model_name, aggregation = group
+            score = score_inputs if aggregation is None else long_document_scorer(aggregation)
+            input_data = [model_input(articles[i]) for i in positions]
+            if model_name == CASCADE:
+                answers = await cascade.run(score, input_data)
+                for stage in (stage for _, stage in answers):
+                    CASCADE_ANSWERS.inc(stage=stage)
+            else:
+                answers = [(result, None) for result in await score(model_name, input_data)]
+            for position, (result, stage) in zip(positions, answers):
+                responses[position] = prediction_response(result, stage)
+
+        logger.info("Batch prediction successful for {} articles.", len(articles))
+        return responses
+    except QueueFullError as e:
+        raise service_unavailable(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        if group is not None:
+            PREDICTIONS.inc(len(positions_by_group[group]), model=group[0], outcome="error")
+        logger.exception("Batch prediction failed: {}", e)
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Expose latency histograms, prediction counters and queue and memory gauges in the Prometheus text format.
+    """
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/logging")
+def get_logging():
+    """
+    Report the log level, output format and per-route sample rates.
+    """
+    return log_control.status()
+
+@app.put("/logging/level")
+def set_log_level(level: str):
+    """
+    Change the log level without a restart, e.g. PUT /logging/level?level=DEBUG.
+    """
+    try:
+        log_control.set_level(level)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Unknown log level: {level}")
+    logger.warning("Log level set to {}", log_control.level)
+    return log_control.status()
+
+@app.get("/stats/batching")
+def get_batching_stats():
+    """
+    Report batch size and queue wait statistics of each model's batcher.
+    """
+    return {model_name: batcher.stats.snapshot() for model_name, batcher in batchers.items()}
+
+@app.get("/stats/models")
+def get_model_stats():
+    """
+    Report the parameter memory of each loaded model and the memory actually stored
+    (of one worker process, including its resident and shared memory, in worker-pool mode).
+    """
+    registry = app.state.model_loader.registry
+    if registry is None:
+        return {"models": {}, "stored_bytes": 0}
+    return registry.memory_report()
+
+@app.get("/stats/cache")
+def get_cache_stats():
+    """
+    Report hit/miss counters of the prediction cache, of the near-duplicate index of each model
+    and, with in-process models, of the token cache.
+    """
+    stats = {"backend": None} if prediction_cache is None else prediction_cache.stats()
+    stats["near_duplicates"] = {model_name: index.stats() for model_name, (_, index) in near_duplicates.items()}
+    encoder = getattr(app.state.model_loader.registry, "encoder", None)
+    if encoder is not None:
+        stats["tokenization"] = encoder.stats()
+    return stats
+
+@app.get("/health")
+def health():
+    """
+    Liveness check; answers as soon as the server runs, while models may still be loading.
+    """
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready(response: Response):
+    """
+    Readiness check with the loading progress of each model; 503 until the preloaded models are loaded.
+    """
+    model_loader = app.state.model_loader
+    is_ready = model_loader.ready(app.state.preloaded_models)
+    if not is_ready:
+        response.status_code = 503
+    return {"ready": is_ready, **model_loader.status()}
+
 @app.get("/outlets")
 def get_news_outlet():
     """
@@ -134,10 +706,48 @@ def get_news_outlet():
         logger.exception("Failed to fetch news outlets: {}", e)
         raise HTTPException(status_code=500, detail="Failed to fetch news outlets.")
 
+async def score_outlet_article(model_name: str, article: dict) -> dict:
+    """The prediction fields of one streamed outlet article, scored as it arrives."""
+    text = f"{article['title']} {article['content']}"
+    score = partial(score_inputs, single=True)
+    if model_name == CASCADE:
+        [(result, stage)] = await cascade.run(score, [text])
+        CASCADE_ANSWERS.inc(stage=stage)
+        return {"prediction": result[0], "confidence": result[1], "probabilities": result[2], "stage": stage}
+    [result] = await score(model_name, [text])
+    return {"prediction": result[0], "confidence": result[1], "probabilities": result[2]}
+
+async def stream_outlet_articles(source_id: str, model_name: str, limit: int):
+    """
+    Yield an outlet's articles as NDJSON lines, each as soon as it is scraped and scored.
+    An article that cannot be scored is still sent, without a prediction.
+    Articles scored by the feed model are recorded for analytics like the feed's.
+    """
+    sent = 0
+    async for article in app.state.stream_news(source_id, limit):
+        try:
+            article.update(await score_outlet_article(model_name, article))
+            if app.state.analytics is not None and model_name == config["FEED_MODEL"]:
+                app.state.analytics.record(source_id, [article])
+        except Exception as e:
+            logger.warning("Sending an unscored article of outlet {}: {!r}", source_id, e)
+        sent += 1
+        yield json.dumps(article) + "\n"
+    logger.info("Streamed {} articles of outlet {}", sent, source_id)
+
 @app.get("/outlets/{outlet}")
-def get_news_details(outlet: str):
+async def get_news_details(
+    outlet: str,
+    response: Response,
+    stream: bool = False,
+    limit: Optional[int] = Query(None, ge=1),
+    model_name: Optional[str] = None,
+):
     """
-    Retrieve details of a specific news outlet.
+    Retrieve the scored news of a specific news outlet from the background-refreshed feed.
+
+    With stream=true, fetch up to `limit` fresh articles instead and send each one as a line of
+    newline-delimited JSON as soon as it is scraped and scored by `model_name` (default FEED_MODEL).
     """
     try:
         logger.info("Fetching details for outlet: {}", outlet)
@@ -146,13 +756,62 @@ def get_news_details(outlet: str):
         else:
             logger.warning("No outlets found for: {}", outlet)
             raise HTTPException(status_code=404, detail="No outlets found.")
-        response = get_outlet_news(outlet)
+        if stream:
+            if limit is not None and limit > config["OUTLET_MAX_ARTICLES"]:
+                raise HTTPException(
+                    status_code=400, detail=f"At most {config['OUTLET_MAX_ARTICLES']} articles can be streamed."
+                )
+            model_name = model_name or config["FEED_MODEL"]
+            for stage in requested_models(model_name):
+                await get_batcher(stage)
+            return StreamingResponse(
+                stream_outlet_articles(outlet, model_name, limit or config["OUTLET_ARTICLES"]),
+                media_type="application/x-ndjson",
+            )
+        if limit is not None or model_name is not None:
+            raise HTTPException(status_code=400, detail="limit and model_name require stream=true.")
+        entry = await app.state.outlet_feed.get(outlet)
+        response.headers["X-Feed-Refreshed-At"] = str(int(entry.refreshed_at))
+        response.headers["X-Feed-Age"] = str(int(entry.age()))
         logger.info("Successfully fetched news for outlet: {}", outlet)
-        return response
+        return entry.articles
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Failed to fetch news details for outlet {}: {}", outlet, e)
         raise HTTPException(status_code=500, detail="Failed to fetch news details.")
 
+@app.get("/analytics/outlets")
+def get_outlet_analytics(
+    granularity: Literal[tuple(GRANULARITIES)] = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    outlet: Optional[list[str]] = Query(None),
+):
+    """
+    Leaning of each outlet over time, from the rollups of the articles scored by the feed model:
+    per hour or day, the number of articles, their mean class probabilities and the count of each
+    predicted class, as columns indexed like `buckets` (bucket start times in Unix seconds). Covers the 30 days before `end` (default now) unless `start` is given.
+    """
+    analytics = app.state.analytics
+    if analytics is None:
+        raise HTTPException(status_code=404, detail="Analytics are disabled.")
+    unknown = [name for name in outlet or [] if name not in NEWS_SOURCES]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"No outlets found: {', '.join(unknown)}.")
+    end_time = end.timestamp() if end else time.time()
+    start_time = start.timestamp() if start else end_time - 30 * 86400
+    source_ids = [NEWS_SOURCES[name] for name in outlet] if outlet else None
+    rollups = analytics.query(granularity, start_time, end_time, source_ids)
+
+    outlet_names = {source_id: name for name, source_id in NEWS_SOURCES.items()}
+    return {
+        "granularity": granularity,
+        "start": datetime.fromtimestamp(start_time, timezone.utc).isoformat(),
+        "end": datetime.fromtimestamp(end_time, timezone.utc).isoformat(),
+        "outlets": {outlet_names.get(source_id, source_id): columns for source_id, columns in rollups.items()},
+    }
+
 if __name__ == "__main__":
     logger.info("Starting application server.")
     uvicorn.run(
@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Sequence, Tuple
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    A named metric with a fixed set of label names, rendered in the Prometheus text format.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], **extra) -> str:
+        return format_labels({**dict(zip(self.labelnames, key)), **extra})
+
+    def samples(self):
+        """Yield (suffix, label string, value) of every sample."""
+        return iter(())
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(f"{self.name}{suffix}{labels} {format_value(value)}" for suffix, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """A monotonically increasing count per label set."""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield "_total", self._labels(key), value
+
+
+class Gauge(Metric):
+    """
+    A value per label set that can go up and down, or be read from a callback when rendered.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = None
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], object]):
+        """
+        Read the gauge from `function` at render time. It returns a number, or for a
+        labelled gauge a dict mapping label-value tuples (or single values) to numbers.
+        """
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            values = self._function()
+            if not isinstance(values, dict):
+                values = {(): values}
+            for key, value in values.items():
+                yield "", self._labels(key if isinstance(key, tuple) else (key,)), value
+            return
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield "", self._labels(key), value
+
+
+class Histogram(Metric):
+    """Counts of observations per bucket, with their sum and count, per label set."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket, then the sum of the observations
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[position] += 1
+                    break
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        counts = self._values.get(self._key(labels))
+        return sum(counts[:-1]) if counts else 0
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        for key, counts in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield "_bucket", self._labels(key, le=format_value(bound)), cumulative
+            yield "_sum", self._labels(key), counts[-1]
+            yield "_count", self._labels(key), cumulative
+
+
+@contextmanager
+def observe_outcome(histogram: Histogram, timeouts: tuple = (TimeoutError,), **labels):
+    """
+    Observe the duration of the block in a histogram with an "outcome" label:
+    "ok", "timeout" for the `timeouts` exceptions or cancellation, or "error".
+    """
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except (*timeouts, asyncio.CancelledError):
+        outcome = "timeout"
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - started, outcome=outcome, **labels)
+
+
+class MetricsRegistry:
+    """The metrics exposed by /metrics."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Inference, recorded by the Model wrapper and the batchers
+INFERENCE_STAGE_SECONDS = REGISTRY.register(
+    Histogram("inference_stage_seconds", "Time per inference stage and call.", ["model", "stage"])
+)
+BATCH_SIZE = REGISTRY.register(
+    Histogram("inference_batch_size", "Inputs per micro-batch.", ["model"], buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+)
+QUEUE_WAIT_SECONDS = REGISTRY.register(
+    Histogram("inference_queue_wait_seconds", "Time an input waited for its micro-batch.", ["model"])
+)
+EXIT_LAYER = REGISTRY.register(
+    Histogram("early_exit_layer", "Encoder layer each input exited at.", ["model"], buckets=range(1, 25))
+)
+PREDICTIONS = REGISTRY.register(
+    Counter("predictions", "Articles answered per model and outcome (ok, cached, near_duplicate, rejected, error).", ["model", "outcome"])
+)
+CASCADE_ANSWERS = REGISTRY.register(
+    Counter("cascade_answers", "Cascade requests answered per stage.", ["stage"])
+)
+
+# Outlet news, recorded by news_app and the scraper
+NEWSAPI_FETCH_SECONDS = REGISTRY.register(
+    Histogram("newsapi_fetch_seconds", "NewsAPI request time per outcome.", ["outcome"])
+)
+SCRAPE_SECONDS = REGISTRY.register(
+    Histogram("scrape_seconds", "Time to fetch and extract one article page per outcome.", ["outcome"])
+)
+
+# HTTP requests, recorded by a middleware in main
+REQUEST_SECONDS = REGISTRY.register(
+    Histogram("http_request_duration_seconds", "Request time per route, method and status.", ["route", "method", "status"])
+)
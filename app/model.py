@@ -1,19 +1,58 @@
+import time
+from contextlib import contextmanager, nullcontext
 from logger_config import logger
 import torch
 import numpy as np
 import torch.nn.functional as F
 from peft import get_peft_model, LoraConfig
 from config import get_config
+from constants import CLASSES
+from tokenization import TokenEncoder, length_buckets
+from cache import weights_version
+from metrics import EXIT_LAYER, INFERENCE_STAGE_SECONDS
+from profiling import profiler
+
+# Per-call logs are sampled as the "inference" route (LOG_SAMPLE_RATES)
+inference_logger = logger.bind(route="inference")
+
+# Ways to combine the window logits of a long document
+WINDOW_AGGREGATIONS = ("mean", "max_confidence", "attention")
+
+# Characters of a long document kept per token it needs; generous for English subwords
+CHARS_PER_TOKEN = 8
 
 class Model:
     """
     Wrapper for PyTorch model loading and inference.
     """
 
-    def __init__(self, model_path: str, model, tokenizer):
+    def __init__(
+        self,
+        model_path: str,
+        model,
+        tokenizer,
+        bucket_boundaries=(16, 32, 64, 128),
+        adapter_name=None,
+        lock=None,
+        backend=None,
+        encoder=None,
+    ):
         self.model_path = model_path
         self.model = model
         self.tokenizer = tokenizer
+        # Fast-tokenizer encoding with a token cache, shared by the variants of a registry
+        self.encoder = encoder if encoder is not None else TokenEncoder(tokenizer)
+        self.bucket_boundaries = bucket_boundaries
+        # LoRA variants sharing one peft model activate their adapter under the shared lock
+        self.adapter_name = adapter_name
+        self.lock = lock if lock is not None else nullcontext()
+        # Exported graph runtime (see backends.py); None runs the eager PyTorch model
+        self.backend = backend
+        self.weights_version = None
+        # Name the model is served under, used as the metrics label; set by the registry
+        self.name = None
+        # Exit heads on intermediate layers (see early_exit.py); None runs every layer
+        self.early_exit = None
         logger.info("Initialized Model instance with model path: {}", model_path)
 
     def load(self, device, model_config=None):
@@ -26,6 +65,7 @@ class Model:
             self.model.load_state_dict(torch.load(self.model_path, map_location=device, weights_only=True))
             self.model.to(device)
             self.model.eval()
+            self.weights_version = weights_version(self.model_path)
             logger.info("Model loaded successfully from {}", self.model_path)
         except FileNotFoundError:
             logger.error("Model file not found: {}", self.model_path)
@@ -35,28 +75,217 @@ class Model:
             raise
 
     def predict(self, input_data, device):
-        """Perform predictions."""
+        """Perform a prediction for a single input: a text, or its input ids with the special tokens."""
+        prediction, confidence, prediction_values, *_ = self.predict_batch([input_data], device)[0]
+        inference_logger.info("Prediction completed: Class - {}, Confidence - {:.2f}", prediction, confidence)
+        return prediction, confidence, prediction_values
+
+    @property
+    def vocab_size(self) -> int:
+        return len(self.tokenizer)
+
+    def predict_batch(self, input_data, device, chunk_size=64):
+        """
+        Perform predictions for a batch of inputs, one forward pass per length bucket of at most `chunk_size`.
+        Inputs are texts or pre-tokenized input id sequences (with the special tokens).
+        Returns one (prediction, confidence, probabilities) tuple per input, in input order;
+        with early exit, each tuple also holds the encoder layer the input exited at.
+        """
         try:
-            logger.info("Starting prediction for input data")
-            # Tokenize input data
-            encodings = self.tokenizer(
-                input_data, truncation=True, padding=True, max_length=128, return_tensors="pt"
-            )
-            encodings = {key: val.to(device) for key, val in encodings.items()}
-            # Perform inference
-            with torch.no_grad():
-                outputs = self.model(**encodings)
-                logits = outputs.logits
-                probabilities = F.softmax(logits, dim=1)
-                confidence, prediction_index = torch.max(probabilities, dim=1)
-            # Map prediction index to class
-            classes = ["Left", "Center", "Right"]
-            prediction = classes[prediction_index.item()]
-            prediction_values = probabilities.cpu().numpy().flatten().tolist()
-
-            logger.info("Prediction completed: Class - {}, Confidence - {:.2f}", prediction, confidence.item())
-            return prediction, confidence.item(), prediction_values
+            inference_logger.debug("Starting batch prediction for {} inputs", len(input_data))
+            if not input_data:
+                return []
+            timings = {}
+            with profiler.sample(self.name or "model"):
+                # Tokenize without padding; each length bucket is padded to its own longest item
+                with self._stage("tokenize", timings):
+                    sequences = self.encoder.encode(input_data)
+                lengths = [len(input_ids) for input_ids in sequences]
+                probabilities = torch.empty(len(input_data), len(CLASSES))
+                exit_layers = [None] * len(input_data)
+                for bucket in length_buckets(lengths, chunk_size, self.bucket_boundaries):
+                    with self._stage("tokenize", timings):
+                        bucket_encodings = self.encoder.pad([sequences[i] for i in bucket])
+                    with self._stage("forward", timings):
+                        if self.early_exit is None:
+                            logits = self._logits(bucket_encodings, device)
+                        else:
+                            logits, bucket_exit_layers = self._early_exit_logits(bucket_encodings, device)
+                            for position, layer in zip(bucket, bucket_exit_layers):
+                                exit_layers[position] = layer
+                    with self._stage("postprocess", timings):
+                        probabilities[bucket] = F.softmax(logits, dim=1)
+                with self._stage("postprocess", timings):
+                    confidence, prediction_index = torch.max(probabilities, dim=1)
+                    # Map prediction indices to classes
+                    predictions = [CLASSES[index] for index in prediction_index.tolist()]
+                    results = list(zip(predictions, confidence.tolist(), probabilities.tolist()))
+            self._record(timings)
+            if self.early_exit is not None:
+                for layer in exit_layers:
+                    EXIT_LAYER.observe(layer, model=self.name or "unknown")
+                return [result + (layer,) for result, layer in zip(results, exit_layers)]
+            return results
 
         except Exception as e:
-            logger.exception("Error during prediction.")
+            logger.exception("Error during batch prediction.")
             raise
+
+    def predict_long(self, text, device, aggregation="mean", max_windows=8, token_budget=1024, stride=32):
+        """
+        Perform a prediction over overlapping 128-token windows of a long document.
+
+        At most `max_windows` windows and `token_budget` tokens are scored, in one
+        batched forward pass. The window logits are aggregated with `aggregation`:
+        "mean" averages them, "max_confidence" keeps the most confident window and
+        "attention" weights each window by the softmax of its top logit.
+        Returns (prediction, confidence, probabilities, number of windows).
+        """
+        try:
+            if aggregation not in WINDOW_AGGREGATIONS:
+                raise ValueError(f"Unknown window aggregation: {aggregation}")
+            # Split the text into overlapping windows, dropping those beyond the window cap or token budget
+            window_limit = max(1, min(max_windows, token_budget // 128))
+            timings = {}
+            with profiler.sample(self.name or "model"):
+                with self._stage("tokenize", timings):
+                    # Only tokenize the head of the text: one window past the limit shows nothing was cut
+                    # from the kept windows; a head that yields fewer is retried on the full text
+                    special_tokens = self.tokenizer.num_special_tokens_to_add()
+                    text_cap = (128 + window_limit * (128 - special_tokens - stride)) * CHARS_PER_TOKEN
+                    encodings = self._windows(text[:text_cap], stride)
+                    if len(text) > text_cap and encodings["input_ids"].shape[0] <= window_limit:
+                        encodings = self._windows(text, stride)
+                    encodings = {key: val[:window_limit] for key, val in encodings.items()}
+                windows = encodings["input_ids"].shape[0]
+                inference_logger.debug("Scoring long document with {} windows", windows)
+
+                with self._stage("forward", timings):
+                    logits = self._logits(encodings, device)
+                with self._stage("postprocess", timings):
+                    if aggregation == "mean":
+                        probabilities = F.softmax(logits.mean(dim=0), dim=0)
+                    elif aggregation == "max_confidence":
+                        window_probabilities = F.softmax(logits, dim=1)
+                        probabilities = window_probabilities[window_probabilities.max(dim=1).values.argmax()]
+                    else:
+                        weights = F.softmax(logits.max(dim=1).values, dim=0)
+                        probabilities = F.softmax((weights.unsqueeze(1) * logits).sum(dim=0), dim=0)
+                    confidence, prediction_index = torch.max(probabilities, dim=0)
+                    result = CLASSES[prediction_index.item()], confidence.item(), probabilities.tolist(), windows
+            self._record(timings)
+            return result
+
+        except Exception as e:
+            logger.exception("Error during long document prediction.")
+            raise
+
+    def _windows(self, text, stride):
+        """Tokenize `text` into overlapping 128-token windows."""
+        encodings = self.tokenizer(
+            text,
+            truncation=True,
+            padding=True,
+            max_length=128,
+            stride=stride,
+            return_overflowing_tokens=True,
+            return_tensors="pt",
+        )
+        return {key: val for key, val in encodings.items() if key != "overflow_to_sample_mapping"}
+
+    @contextmanager
+    def _stage(self, stage: str, timings: dict):
+        """Add the time spent in the block to `timings[stage]` and label it in profiler traces."""
+        started = time.perf_counter()
+        with torch.profiler.record_function(stage):
+            yield
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+    def _record(self, timings: dict):
+        for stage, seconds in timings.items():
+            INFERENCE_STAGE_SECONDS.observe(seconds, model=self.name or "unknown", stage=stage)
+
+    def _logits(self, encodings, device):
+        """Run one forward pass over padded encodings and return the logits on CPU."""
+        if self.backend is not None:
+            return self.backend.logits(encodings)
+        encodings = {key: val.to(device) for key, val in encodings.items()}
+        # Perform inference
+        with self.lock, torch.no_grad():
+            if self.adapter_name is not None:
+                self.model.set_adapter(self.adapter_name)
+            outputs = self.model(**encodings)
+            return outputs.logits.cpu()
+
+    def _early_exit_logits(self, encodings, device):
+        """Run the encoder layer by layer, stopping each input at its first confident exit head."""
+        encodings = {key: val.to(device) for key, val in encodings.items()}
+        with self.lock, torch.no_grad():
+            if self.adapter_name is not None:
+                self.model.set_adapter(self.adapter_name)
+            return self.early_exit.logits(self.model, encodings)
+
+
+def quantize_dynamic_int8(model):
+    """Replace the Linear layers of a float model by int8 dynamic-quantized ones."""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def is_quantized_state_dict(state_dict) -> bool:
+    """Whether a state dict holds packed int8 Linear weights rather than float ones."""
+    return any("_packed_params" in key for key in state_dict)
+
+
+class QuantizedModel(Model):
+    """
+    Wrapper for an int8 dynamic-quantized model, served on CPU.
+
+    The artifact is the state dict of the quantized module. A float checkpoint
+    is also accepted and quantized at load time.
+    """
+
+    def load(self, device, model_config=None):
+        """Load an int8 artifact, or quantize a float checkpoint, into the float model skeleton."""
+        try:
+            logger.info(f"Loading quantized model from {self.model_path} using {device}")
+            state_dict = torch.load(self.model_path, map_location="cpu", weights_only=True)
+            if is_quantized_state_dict(state_dict):
+                self.model = quantize_dynamic_int8(self.model)
+                self.model.load_state_dict(state_dict)
+            else:
+                logger.warning("{} holds float weights; quantizing at load time.", self.model_path)
+                self.model.load_state_dict(state_dict)
+                self.model = quantize_dynamic_int8(self.model)
+            self.model.eval()
+            self.weights_version = weights_version(self.model_path)
+            logger.info("Quantized model loaded successfully from {}", self.model_path)
+        except FileNotFoundError:
+            logger.error("Model file not found: {}", self.model_path)
+            raise
+        except Exception as e:
+            logger.exception("Failed to load quantized model.")
+            raise
+
+    def save(self, artifact_path):
+        """Save the int8 state dict, which load() restores without re-quantizing."""
+        torch.save(self.model.state_dict(), artifact_path)
+        logger.info("Quantized model saved to {}", artifact_path)
+
+
+def parity_check(reference, candidate, input_data, device, chunk_size=64) -> dict:
+    """
+    Compare the predictions of two model wrappers on the same inputs.
+
+    Returns the share of inputs on which the predicted classes agree and the
+    largest absolute difference between their class probabilities.
+    """
+    reference_results = reference.predict_batch(input_data, device, chunk_size)
+    candidate_results = candidate.predict_batch(input_data, device, chunk_size)
+    reference_probabilities = torch.tensor([result[2] for result in reference_results])
+    candidate_probabilities = torch.tensor([result[2] for result in candidate_results])
+    agreement = (reference_probabilities.argmax(dim=1) == candidate_probabilities.argmax(dim=1)).float().mean()
+    return {
+        "samples": len(input_data),
+        "agreement": agreement.item(),
+        "max_abs_probability_diff": (reference_probabilities - candidate_probabilities).abs().max().item(),
+    }
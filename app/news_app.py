@@ -1,15 +1,59 @@
 # import requests
-from scraper import scrape_website
-from typing import List, Dict, Optional
+from scraper import scrape_as_completed_async, scrape_many, scrape_many_async
+from typing import AsyncIterator, List, Dict, Optional
 from newsapi import NewsApiClient
 from config import get_config
+from metrics import NEWSAPI_FETCH_SECONDS, observe_outcome
+
+config = get_config()
 
 # Initialize the News API client
-newsapi = NewsApiClient(api_key=get_config()["NEWS_API_KEY"])
+newsapi = NewsApiClient(api_key=config["NEWS_API_KEY"])
+
+# Endpoint behind NewsApiClient.get_everything, called directly by the async path
+NEWS_API_EVERYTHING_URL = config["NEWS_API_URL"]
+
+# Most articles NewsAPI returns per request
+NEWS_API_MAX_PAGE_SIZE = 100
+
+
+def page_size(limit: int) -> int:
+    """Articles to request from NewsAPI for `limit` articles; never fewer than its default of 20."""
+    return min(max(limit, 20), NEWS_API_MAX_PAGE_SIZE)
+
+
+def select_articles(everything: Dict, source_id: str, limit: int = 5) -> Optional[List[Dict]]:
+    """Validate a NewsAPI response and keep the first `limit` articles that have a URL."""
+    if everything.get("status") != "ok":
+        print(f"Error fetching news: {everything.get('message', 'Unknown error')}")
+        return None
+
+    all_articles = everything.get("articles", [])
+    if not all_articles:
+        print(f"No articles found for source: {source_id}")
+        return None
+
+    return [article for article in all_articles if article.get("url")][:limit]
+
+
+def combine_contents(articles: List[Dict], contents: Dict[str, Optional[str]]) -> Optional[List[Dict[str, str]]]:
+    """Pair each article with its scraped content and publication time, leaving out pages that failed."""
+    outlet_news_details = []
+    for article in articles:
+        content = contents[article["url"]]
+        if content is None:
+            print(f"Error scraping content from {article['url']}")
+            continue
+
+        outlet_news_details.append(
+            {"title": article.get("title", "No Title"), "content": content, "published_at": article.get("publishedAt")}
+        )
+
+    return outlet_news_details if outlet_news_details else None
 
 
 def get_outlet_news(
-    source_id: Optional[str], query: Optional[str] = None
+    source_id: Optional[str], query: Optional[str] = None, limit: Optional[int] = None
 ) -> Optional[List[Dict[str, str]]]:
     """
     Fetch news articles from a specific outlet and scrape their content.
@@ -17,57 +61,117 @@ def get_outlet_news(
     Args:
         source_id (Optional[str]): The unique ID of the news source (e.g., 'bbc-news'). Required.
         query (Optional[str]): The search keyword for filtering articles. Defaults to None.
+        limit (Optional[int]): Number of articles to fetch. Defaults to OUTLET_ARTICLES.
 
     Returns:
-        Optional[List[Dict[str, str]]]: A list of dictionaries containing article titles and scraped content from url.
+        Optional[List[Dict[str, str]]]: A list of dictionaries containing article titles, scraped content from url
+        and NewsAPI publication times (published_at, None when missing).
         Returns None if source_id is not provided or no articles are found.
 
-    Raises:
-        Exception: If an error occurs while scraping an article's content.
+    Articles whose page cannot be scraped within the deadlines are left out.
     """
     # Validate the input
     if not source_id:
         print("Error: Source ID must be provided.")
         return None
 
+    limit = limit or config["OUTLET_ARTICLES"]
     try:
         # Fetch articles from the specified source
-        everything = newsapi.get_everything(q=query, sources=source_id)
-
-        # Validate API response
-        if everything.get("status") != "ok":
-            print(f"Error fetching news: {everything.get('message', 'Unknown error')}")
+        with observe_outcome(NEWSAPI_FETCH_SECONDS):
+            everything = newsapi.get_everything(q=query, sources=source_id, page_size=page_size(limit))
+        articles = select_articles(everything, source_id, limit)
+        if not articles:
             return None
 
-        # Extract articles
-        all_articles = everything.get("articles", [])
-        if not all_articles:
-            print(f"No articles found for source: {source_id}")
-            return None
+        # Scrape all articles concurrently; failed or late pages are skipped
+        contents = scrape_many(
+            [article["url"] for article in articles],
+            max_workers=config["SCRAPE_MAX_WORKERS"],
+            per_host_limit=config["SCRAPE_PER_HOST_LIMIT"],
+            request_deadline=config["SCRAPE_REQUEST_DEADLINE"],
+            total_deadline=config["SCRAPE_TOTAL_DEADLINE"],
+            extractor=config["HTML_EXTRACTOR"],
+            max_chars=config["EXTRACT_MAX_CHARS"] or None,
+        )
+        return combine_contents(articles, contents)
 
-        # Process articles and scrape content
-        outlet_news_details = []
-        for count, article in enumerate(all_articles):
-            if count >= 5:  # Limit to the first 5 articles
-                break
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return None
 
-            title = article.get("title", "No Title")
-            url = article.get("url")
-            if not url:
-                continue
 
-            try:
-                # Scrape website content
-                content = scrape_website(url)
-            except Exception as e:
-                print(f"Error scraping content from {url}: {e}")
-                continue
+async def fetch_articles(client, source_id: str, query: Optional[str], limit: int) -> Optional[List[Dict]]:
+    """Query NewsAPI over an httpx.AsyncClient for the first `limit` articles of an outlet."""
+    # Only needed here; the client passed in is an httpx.AsyncClient
+    import httpx
 
-            # Append article details to the list
-            outlet_news_details.append({"title": title, "content": content})
+    params = {"sources": source_id, "pageSize": page_size(limit)}
+    if query:
+        params["q"] = query
+    with observe_outcome(NEWSAPI_FETCH_SECONDS, (TimeoutError, httpx.TimeoutException)):
+        response = await client.get(NEWS_API_EVERYTHING_URL, params=params, headers={"X-Api-Key": config["NEWS_API_KEY"]})
+    return select_articles(response.json(), source_id, limit)
 
-        return outlet_news_details if outlet_news_details else None
+
+async def fetch_outlet_news(
+    client, source_id: Optional[str], query: Optional[str] = None, limit: Optional[int] = None
+) -> Optional[List[Dict[str, str]]]:
+    """
+    Async counterpart of get_outlet_news that queries NewsAPI and scrapes over an httpx.AsyncClient,
+    so no thread is held while waiting on the network.
+    """
+    if not source_id:
+        print("Error: Source ID must be provided.")
+        return None
+
+    try:
+        articles = await fetch_articles(client, source_id, query, limit or config["OUTLET_ARTICLES"])
+        if not articles:
+            return None
+
+        contents = await scrape_many_async(
+            client,
+            [article["url"] for article in articles],
+            per_host_limit=config["SCRAPE_PER_HOST_LIMIT"],
+            request_deadline=config["SCRAPE_REQUEST_DEADLINE"],
+            total_deadline=config["SCRAPE_TOTAL_DEADLINE"],
+            extractor=config["HTML_EXTRACTOR"],
+            max_chars=config["EXTRACT_MAX_CHARS"] or None,
+        )
+        return combine_contents(articles, contents)
 
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         return None
+
+
+async def stream_outlet_news(
+    client, source_id: str, query: Optional[str] = None, limit: Optional[int] = None
+) -> AsyncIterator[Dict[str, str]]:
+    """
+    Fetch an outlet's articles like fetch_outlet_news, but yield each one as soon as its
+    page is scraped, in the order the pages finish. Errors end the stream early.
+    """
+    try:
+        articles = await fetch_articles(client, source_id, query, limit or config["OUTLET_ARTICLES"])
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return
+    if not articles:
+        return
+
+    titles = {article["url"]: article.get("title", "No Title") for article in articles}
+    published = {article["url"]: article.get("publishedAt") for article in articles}
+    pages = scrape_as_completed_async(
+        client,
+        list(titles),
+        per_host_limit=config["SCRAPE_PER_HOST_LIMIT"],
+        request_deadline=config["SCRAPE_REQUEST_DEADLINE"],
+        total_deadline=config["SCRAPE_TOTAL_DEADLINE"],
+        extractor=config["HTML_EXTRACTOR"],
+        max_chars=config["EXTRACT_MAX_CHARS"] or None,
+    )
+    async for url, content in pages:
+        if content is not None:
+            yield {"title": titles[url], "content": content, "published_at": published[url]}
@@ -0,0 +1,47 @@
+import itertools
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from logger_config import logger
+from config import get_config
+
+config = get_config()
+
+
+class SamplingProfiler:
+    """
+    Captures a torch profiler trace of one in every `every_n` inference calls.
+
+    Each sampled call writes a Chrome trace (open in chrome://tracing or Perfetto)
+    and a table of the slowest operators to `output_dir`. With every_n=0 sampling
+    is off and the hook costs one comparison per call.
+    """
+
+    def __init__(self, every_n: int = 0, output_dir: str = "profiles", row_limit: int = 25):
+        self.every_n = every_n
+        self.output_dir = Path(output_dir)
+        self.row_limit = row_limit
+        self._calls = itertools.count(1)
+
+    @contextmanager
+    def sample(self, name: str):
+        """Profile the block if it is the n-th call since the last sample."""
+        if not self.every_n or next(self._calls) % self.every_n:
+            yield
+            return
+
+        from torch.profiler import ProfilerActivity, profile
+
+        with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as trace:
+            yield
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{time.perf_counter_ns()}"
+        trace.export_chrome_trace(str(path.with_suffix(".json")))
+        path.with_suffix(".txt").write_text(
+            trace.key_averages().table(sort_by="self_cpu_time_total", row_limit=self.row_limit)
+        )
+        logger.info("Wrote profiler trace {}", path.with_suffix(".json"))
+
+
+# Shared by every model; sampling is opt-in through PROFILE_EVERY_N
+profiler = SamplingProfiler(config["PROFILE_EVERY_N"], config["PROFILE_DIR"])
@@ -0,0 +1,55 @@
+import argparse
+import json
+import torch  # imported before transformers so that int8 dtypes pickle without touching its lazy modules
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSequenceClassification
+from logger_config import logger
+from model import Model, QuantizedModel, parity_check
+
+
+def build_quantized_artifact(base_model_name: str, checkpoint: str, output: str, sample_texts: list[str]) -> dict:
+    """
+    Quantize a float checkpoint to an int8 artifact and check it against the float model.
+
+    Args:
+        base_model_name (str): Model name or path providing the BERT configuration and tokenizer.
+        checkpoint (str): Path to the fine-tuned float state dict.
+        output (str): Path to write the int8 state dict to.
+        sample_texts (list[str]): Inputs used for the parity check.
+
+    Returns:
+        dict: Parity report of the int8 model against the float model.
+    """
+    model_config = AutoConfig.from_pretrained(base_model_name, num_labels=3)
+    tokenizer = AutoTokenizer.from_pretrained(base_model_name)
+
+    reference = Model(checkpoint, AutoModelForSequenceClassification.from_config(model_config), tokenizer)
+    reference.load(device="cpu")
+    quantized = QuantizedModel(checkpoint, AutoModelForSequenceClassification.from_config(model_config), tokenizer)
+    quantized.load(device="cpu")
+    quantized.save(output)
+
+    # Reload the artifact so that the parity check covers what will actually be served
+    served = QuantizedModel(output, AutoModelForSequenceClassification.from_config(model_config), tokenizer)
+    served.load(device="cpu")
+    return parity_check(reference, served, sample_texts, device="cpu")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an int8 dynamic-quantized model artifact.")
+    parser.add_argument("checkpoint", help="Fine-tuned float state dict (.pt)")
+    parser.add_argument("output", help="Path of the int8 artifact to write")
+    parser.add_argument("--base-model", default="bert-base-uncased", help="Base model configuration and tokenizer")
+    parser.add_argument("--sample", help="Text file with one parity-check input per line")
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="Fail below this class agreement")
+    args = parser.parse_args()
+
+    sample_texts = ["Senate passes the budget bill", "Governor signs new tax cuts into law"]
+    if args.sample:
+        with open(args.sample, encoding="utf-8") as sample_file:
+            sample_texts = [line.strip() for line in sample_file if line.strip()]
+
+    report = build_quantized_artifact(args.base_model, args.checkpoint, args.output, sample_texts)
+    print(json.dumps(report, indent=4))
+    if report["agreement"] < args.min_agreement:
+        logger.error("Quantized model agrees with the float model on only {:.2%} of inputs", report["agreement"])
+        raise SystemExit(1)
@@ -0,0 +1,250 @@
+import copy
+import hashlib
+import threading
+from pathlib import Path
+import torch
+from logger_config import logger
+from peft import get_peft_model
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSequenceClassification
+from model import Model, QuantizedModel
+from tokenization import TokenEncoder
+from cache import weights_version
+from backends import artifact_path, load_backend
+from early_exit import exit_heads_path, load_early_exit
+
+# Name under which peft stores the adapter of a freshly wrapped model
+DEFAULT_ADAPTER = "default"
+
+
+def tensor_digest(tensor: torch.Tensor) -> tuple:
+    """Identify a tensor by dtype, shape and content."""
+    data = tensor.detach().cpu().contiguous().view(-1).view(torch.uint8)
+    return tensor.dtype, tuple(tensor.shape), hashlib.blake2b(data.numpy().tobytes(), digest_size=16).digest()
+
+
+def checkpoint_path(model_path: str) -> str:
+    """Prefer a .safetensors copy next to a pickled checkpoint when one exists."""
+    safetensors_path = Path(model_path).with_suffix(".safetensors")
+    return str(safetensors_path) if safetensors_path.exists() else model_path
+
+
+def read_checkpoint(model_path: str) -> dict:
+    """
+    Read a float checkpoint as memory-mapped tensors.
+
+    Untouched pages stay backed by the file, so processes loading the same checkpoint
+    share them. Safetensors files are mapped without unpickling anything.
+    """
+    path = checkpoint_path(model_path)
+    if path.endswith(".safetensors"):
+        from safetensors.torch import load_file
+
+        return load_file(path, device="cpu")
+    return torch.load(path, map_location="cpu", weights_only=True, mmap=True)
+
+
+def is_adapter_key(key: str) -> bool:
+    """Whether a state dict key belongs to a LoRA adapter rather than the backbone."""
+    return ".lora_" in key
+
+
+class ModelRegistry:
+    """
+    Loads the model variants so that each one is an isolated module while weights are stored once.
+
+    Every checkpoint tensor is interned by content: identical tensors in different
+    checkpoints (e.g. the fp32 and float quantized checkpoints, or the frozen backbone
+    of LoRA variants) point to the same read-only storage. LoRA variants whose
+    backbone weights match share one peft model, each as a named adapter that is
+    activated per forward pass.
+    """
+
+    def __init__(
+        self,
+        base_model_name: str,
+        device: str = "cpu",
+        num_labels: int = 3,
+        token_cache_size: int = 10000,
+        num_threads: int = 0,
+    ):
+        logger.info("Loading model configuration and tokenizer for {}", base_model_name)
+        self.model_config = AutoConfig.from_pretrained(base_model_name, num_labels=num_labels)
+        self.tokenizer = AutoTokenizer.from_pretrained(base_model_name, use_fast=True)
+        # One token cache for all variants, which share the tokenizer
+        self.encoder = TokenEncoder(self.tokenizer, cache_size=token_cache_size)
+        self.device = device
+        # Intra-op threads of ONNX Runtime sessions; 0 matches torch's thread pool
+        self.num_threads = num_threads
+        self.models = {}
+        self._tensors = {}
+        self._lora_backbones = {}
+
+    def _skeleton(self):
+        """Build an untrained classifier whose parameters are replaced by checkpoint tensors."""
+        return AutoModelForSequenceClassification.from_config(self.model_config)
+
+    def _intern(self, state_dict: dict) -> dict:
+        """Replace each tensor by the registry's shared copy of the same content."""
+        shared = {}
+        for key, tensor in state_dict.items():
+            shared[key] = self._tensors.setdefault(tensor_digest(tensor), tensor)
+        return shared
+
+    def _attach(self, module, state_dict: dict):
+        """Point the module's parameters at the shared tensors without copying them."""
+        module.load_state_dict(state_dict, assign=True)
+        module.requires_grad_(False)
+        module.to(self.device)
+        module.eval()
+        return module
+
+    def load(
+        self,
+        name: str,
+        model_path: str,
+        lora_config=None,
+        quantized=False,
+        backend="eager",
+        early_exit=None,
+        **model_kwargs,
+    ) -> Model:
+        """
+        Load one model variant from its checkpoint and register it under `name`.
+
+        Args:
+            name (str): Model name used by the API (e.g. "lora_model").
+            model_path (str): Path to the variant's state dict.
+            lora_config (Optional[LoraConfig]): Adapter configuration for LoRA checkpoints.
+            quantized (bool): Serve the variant as an int8 dynamic-quantized model (eager backend only).
+            backend (str): "eager", or "torchscript"/"onnx" to serve the artifact exported next to the checkpoint.
+            early_exit (Optional[dict]): "criterion" and "threshold" to serve the variant with the exit
+                heads trained next to its checkpoint (see train_exits.py).
+            **model_kwargs: Extra arguments for the Model wrapper.
+
+        Returns:
+            Model: A wrapper around the variant, ready for inference.
+        """
+        logger.info("Loading {} from {} using {}", name, model_path, self.device)
+        model_kwargs.setdefault("encoder", self.encoder)
+        if backend != "eager":
+            if quantized:
+                raise ValueError(f"{name}: int8 quantization is only served by the eager backend, not {backend}")
+            # Exported graphs hold their own (LoRA-merged) weights; no PyTorch module is built
+            model_wrapper = Model(
+                model_path=model_path,
+                model=None,
+                tokenizer=self.tokenizer,
+                backend=load_backend(backend, model_path, num_threads=self.num_threads or torch.get_num_threads()),
+                **model_kwargs,
+            )
+            # Versioned by the artifact that is served, so a re-export invalidates the cached predictions
+            model_wrapper.weights_version = f"{weights_version(artifact_path(model_path, backend))}+{backend}"
+            model_wrapper.name = name
+            if early_exit:
+                logger.warning("Early exit needs the eager backend; {} runs every layer.", name)
+            self.models[name] = model_wrapper
+            logger.info("{} loaded successfully with the {} backend", name, backend)
+            return model_wrapper
+
+        if quantized:
+            # Int8 weights are the variant's own compact copy and are not shared
+            model_wrapper = QuantizedModel(
+                model_path=model_path, model=self._skeleton(), tokenizer=self.tokenizer, **model_kwargs
+            )
+            model_wrapper.load(device=self.device)
+            model_wrapper.name = name
+            self._attach_early_exit(model_wrapper, model_path, early_exit)
+            self.models[name] = model_wrapper
+            logger.info("{} loaded successfully", name)
+            return model_wrapper
+
+        state_dict = self._intern(read_checkpoint(model_path))
+        if lora_config is None:
+            module = self._attach(self._skeleton(), state_dict)
+            model_wrapper = Model(model_path=model_path, model=module, tokenizer=self.tokenizer, **model_kwargs)
+        else:
+            module, lock = self._load_adapter(name, state_dict, lora_config)
+            model_wrapper = Model(
+                model_path=model_path,
+                model=module,
+                tokenizer=self.tokenizer,
+                adapter_name=name,
+                lock=lock,
+                **model_kwargs,
+            )
+        model_wrapper.weights_version = weights_version(checkpoint_path(model_path))
+        model_wrapper.name = name
+        self._attach_early_exit(model_wrapper, model_path, early_exit)
+        self.models[name] = model_wrapper
+        logger.info("{} loaded successfully", name)
+        return model_wrapper
+
+    def _attach_early_exit(self, model_wrapper: Model, model_path: str, early_exit):
+        """Serve a variant with its exit heads, when they were trained."""
+        if not early_exit:
+            return
+        model_wrapper.early_exit = load_early_exit(model_path, early_exit["criterion"], early_exit["threshold"])
+        if model_wrapper.early_exit is None:
+            logger.warning("No exit heads at {}; {} runs every layer.", exit_heads_path(model_path), model_wrapper.name)
+            return
+        model_wrapper.early_exit.heads.to(self.device)
+        # Early-exit predictions differ from full-depth ones, so they get their own cache keys
+        model_wrapper.weights_version += (
+            f"+exit-{weights_version(exit_heads_path(model_path))}-{early_exit['criterion']}-{early_exit['threshold']}"
+        )
+        logger.info(
+            "{} exits early at layers {} ({} {})",
+            model_wrapper.name,
+            model_wrapper.early_exit.heads.layers,
+            early_exit["criterion"],
+            early_exit["threshold"],
+        )
+
+    def _load_adapter(self, name: str, state_dict: dict, lora_config):
+        """Add a LoRA checkpoint as adapter `name` on the peft model sharing its backbone."""
+        # Checkpoints are saved with peft's default adapter name; rename it to the variant's name
+        adapter_state = {
+            key.replace(f".{DEFAULT_ADAPTER}.", f".{name}."): tensor
+            for key, tensor in state_dict.items()
+            if is_adapter_key(key)
+        }
+        backbone_state = {key: tensor for key, tensor in state_dict.items() if not is_adapter_key(key)}
+        backbone_id = tuple(sorted((key, id(tensor)) for key, tensor in backbone_state.items()))
+
+        if backbone_id in self._lora_backbones:
+            module, lock = self._lora_backbones[backbone_id]
+            with lock:
+                module.add_adapter(name, copy.deepcopy(lora_config))
+                module.load_state_dict(adapter_state, strict=False, assign=True)
+                module.requires_grad_(False)
+                module.eval()
+            logger.info("Added adapter {} to a shared LoRA backbone", name)
+        else:
+            module = get_peft_model(self._skeleton(), copy.deepcopy(lora_config), adapter_name=name)
+            self._attach(module, {**backbone_state, **adapter_state})
+            lock = threading.Lock()
+            self._lora_backbones[backbone_id] = (module, lock)
+        return module, lock
+
+    def memory_report(self) -> dict:
+        """Report the weight bytes of each variant against the bytes actually stored."""
+        report = {}
+        unique = {}
+        for name, model_wrapper in self.models.items():
+            if model_wrapper.model is None:
+                continue
+            tensors = list(model_tensors(model_wrapper.model))
+            report[name] = sum(tensor.nbytes for tensor in tensors)
+            for tensor in tensors:
+                unique[tensor.untyped_storage().data_ptr()] = tensor.untyped_storage().nbytes()
+        return {"models": report, "stored_bytes": sum(unique.values())}
+
+
+def model_tensors(module):
+    """Yield the weight tensors of a module, including packed int8 Linear weights."""
+    for tensor in module.state_dict().values():
+        if isinstance(tensor, torch.Tensor):
+            yield tensor
+        elif isinstance(tensor, tuple):
+            # Dynamic-quantized Linear layers store (packed weight, bias) tuples
+            yield from (item for item in tensor if isinstance(item, torch.Tensor))
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import Literal, Optional
+from pydantic import BaseModel, Field, NonNegativeInt, model_validator
 
 
 # Pydantic models for request and response
@@ -6,9 +7,25 @@ class NewsArticle(BaseModel):
     title: str
     content: str
     model_name: str
+    long_document: bool = False
+    aggregation: Literal["mean", "max_confidence", "attention"] = "mean"
+    # Input ids of "title content" from the base model's tokenizer, including [CLS] and [SEP];
+    # when given, the model scores them instead of tokenizing the text
+    input_ids: Optional[list[NonNegativeInt]] = Field(None, min_length=2, max_length=128)
+
+    @model_validator(mode="after")
+    def check_input_ids(self):
+        if self.input_ids is not None and self.long_document:
+            raise ValueError("input_ids cannot be combined with long_document.")
+        return self
 
 
 class PredictionResponse(BaseModel):
     prediction: str
     confidence: float
     probabilities: list[float]
+    windows: Optional[int] = None
+    # Model that answered a cascade request
+    stage: Optional[str] = None
+    # Encoder layer the prediction exited at, for models served with early exit
+    exit_layer: Optional[int] = None
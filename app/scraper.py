@@ -1,25 +1,89 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
 from loguru import logger
-from bs4 import BeautifulSoup
+from extractors import charset_from_content_type, create_extractor
+from metrics import SCRAPE_SECONDS, observe_outcome
+
+# Per-page logs are sampled as the "scrape" route (LOG_SAMPLE_RATES)
+scrape_logger = logger.bind(route="scrape")
+
+# (connect, read) timeouts of a single request, in seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+
+
+def create_session(pool_maxsize: int = 32) -> requests.Session:
+    """
+    Create a session whose keep-alive connection pool is shared by all scraping threads.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "Mozilla/5.0 (compatible; PoliticalLeaningNewsDetection/1.0)"
+    return session
+
+
+# Shared by every scrape so that connections to the same news sites are reused
+session = create_session()
+
+
+def create_async_client(max_connections: int = 32, timeout=DEFAULT_TIMEOUT):
+    """
+    Create an httpx.AsyncClient for scraping from the event loop.
+
+    Raises ImportError when httpx is not installed; callers fall back to the threaded scraper.
+    """
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+        headers={"User-Agent": session.headers["User-Agent"]},
+        follow_redirects=True,
+    )
+
 
 # Scrape Web Content
-def scrape_website(url):
+def scrape_website(url, timeout=DEFAULT_TIMEOUT, deadline=None, extractor="auto", max_chars=None):
     """
     Fetch and parse webpage content.
+
+    Args:
+        url (str): Page to scrape.
+        timeout (tuple): (connect, read) timeouts of each socket operation, in seconds.
+        deadline (Optional[float]): time.monotonic() value by which the whole download must finish.
+        extractor (str): Paragraph extractor from extractors.EXTRACTORS, or "auto".
+        max_chars (Optional[int]): Stop once this much paragraph text has been extracted.
     """
     try:
-        logger.info("Fetching webpage content from URL: {}", url)
-        response = requests.get(url)
+        scrape_logger.info("Fetching webpage content from URL: {}", url)
+        response = session.get(url, timeout=timeout, stream=True)
         if response.status_code != 200:
             logger.warning("Non-success status code received: {}", response.status_code)
+            response.close()
             raise Exception(f"Failed to fetch webpage: {response.status_code}")
 
-        logger.debug("Parsing HTML content.")
-        soup = BeautifulSoup(response.content, "html.parser")
-        paragraphs = soup.find_all("p")
-        content = "\n".join([para.get_text() for para in paragraphs])
+        # Parse the body as it streams in, so that a slow site cannot exceed the deadline
+        # and the download stops once enough paragraph text has been extracted
+        scrape_logger.debug("Parsing HTML content.")
+        parser = create_extractor(
+            extractor, max_chars=max_chars, encoding=charset_from_content_type(response.headers.get("Content-Type"))
+        )
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            if parser.feed(chunk):
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                response.close()
+                raise requests.Timeout(f"Deadline exceeded while downloading {url}")
+        response.close()
+        content = parser.close()
 
-        logger.info("Successfully scraped content from URL: {}", url)
+        scrape_logger.info("Successfully scraped content from URL: {}", url)
         return content
     except requests.RequestException as e:
         logger.exception("HTTP request failed: {}", e)
@@ -28,6 +92,165 @@ def scrape_website(url):
         logger.exception("An error occurred while scraping: {}", e)
         raise
 
+
+def scrape_many(
+    urls,
+    max_workers=8,
+    per_host_limit=2,
+    timeout=DEFAULT_TIMEOUT,
+    request_deadline=15,
+    total_deadline=20,
+    extractor="auto",
+    max_chars=None,
+):
+    """
+    Scrape several pages concurrently and return whatever finished in time.
+
+    Args:
+        urls (List[str]): Pages to scrape.
+        max_workers (int): Number of pages fetched at the same time.
+        per_host_limit (int): Number of pages fetched at the same time from one host.
+        timeout (tuple): (connect, read) timeouts of each socket operation, in seconds.
+        request_deadline (float): Seconds allowed for a single page.
+        total_deadline (float): Seconds allowed for all pages together.
+        extractor (str): Paragraph extractor from extractors.EXTRACTORS, or "auto".
+        max_chars (Optional[int]): Stop extracting a page once this much paragraph text has been collected.
+
+    Returns:
+        Dict[str, Optional[str]]: Scraped content per URL, None for pages that failed or ran out of time.
+    """
+    started = time.monotonic()
+    host_limits = {urlparse(url).netloc: threading.BoundedSemaphore(per_host_limit) for url in urls}
+
+    def scrape(url):
+        with host_limits[urlparse(url).netloc]:
+            # Time spent waiting for the host slot counts against the overall deadline only
+            deadline = min(time.monotonic() + request_deadline, started + total_deadline)
+            if time.monotonic() >= deadline:
+                raise requests.Timeout(f"Deadline exceeded before fetching {url}")
+            with observe_outcome(SCRAPE_SECONDS, (requests.Timeout, TimeoutError)):
+                return scrape_website(
+                    url, timeout=timeout, deadline=deadline, extractor=extractor, max_chars=max_chars
+                )
+
+    results = dict.fromkeys(urls)
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scraper")
+    futures = {executor.submit(scrape, url): url for url in urls}
+    done, pending = wait(futures, timeout=total_deadline)
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except Exception as e:
+            logger.warning("Skipping {}: {}", futures[future], e)
+    for future in pending:
+        future.cancel()
+        logger.warning("Skipping {}: overall deadline of {}s exceeded", futures[future], total_deadline)
+    # Do not wait for stragglers; their own deadline stops them shortly
+    executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+async def scrape_website_async(client, url, extractor="auto", max_chars=None):
+    """
+    Fetch and parse webpage content over an async client; see scrape_website.
+    The caller bounds the total time with asyncio.timeout.
+    """
+    scrape_logger.info("Fetching webpage content from URL: {}", url)
+    async with client.stream("GET", url) as response:
+        if response.status_code != 200:
+            logger.warning("Non-success status code received: {}", response.status_code)
+            raise Exception(f"Failed to fetch webpage: {response.status_code}")
+
+        parser = create_extractor(
+            extractor, max_chars=max_chars, encoding=charset_from_content_type(response.headers.get("Content-Type"))
+        )
+        async for chunk in response.aiter_bytes(chunk_size=64 * 1024):
+            if parser.feed(chunk):
+                break
+    content = parser.close()
+    scrape_logger.info("Successfully scraped content from URL: {}", url)
+    return content
+
+
+async def scrape_as_completed_async(
+    client,
+    urls,
+    per_host_limit=2,
+    request_deadline=15,
+    total_deadline=20,
+    extractor="auto",
+    max_chars=None,
+):
+    """
+    Scrape several pages concurrently on the event loop and yield (url, content) as each
+    page finishes, so that callers can use the first pages while the others load.
+
+    Takes the same limits as scrape_many. Pages that fail are skipped; pages still loading
+    at the total deadline, or when the caller stops iterating, are cancelled.
+    """
+    import httpx
+
+    host_limits = {urlparse(url).netloc: asyncio.Semaphore(per_host_limit) for url in urls}
+
+    async def scrape(url):
+        async with host_limits[urlparse(url).netloc]:
+            with observe_outcome(SCRAPE_SECONDS, (TimeoutError, httpx.TimeoutException)):
+                async with asyncio.timeout(request_deadline):
+                    return await scrape_website_async(client, url, extractor=extractor, max_chars=max_chars)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + total_deadline
+    tasks = {asyncio.create_task(scrape(url)): url for url in urls}
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, timeout=deadline - loop.time(), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                url = tasks.pop(task)
+                if task.exception() is not None:
+                    logger.warning("Skipping {}: {!r}", url, task.exception())
+                else:
+                    yield url, task.result()
+    finally:
+        for task, url in tasks.items():
+            task.cancel()
+            if loop.time() >= deadline:
+                logger.warning("Skipping {}: overall deadline of {}s exceeded", url, total_deadline)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def scrape_many_async(
+    client,
+    urls,
+    per_host_limit=2,
+    request_deadline=15,
+    total_deadline=20,
+    extractor="auto",
+    max_chars=None,
+):
+    """
+    Scrape several pages concurrently on the event loop and return whatever finished in time.
+
+    Takes the same limits as scrape_many; concurrency overall is bounded by the client's
+    connection pool. Returns a dict of scraped content per URL, None for pages that
+    failed or ran out of time.
+    """
+    results = dict.fromkeys(urls)
+    pages = scrape_as_completed_async(
+        client,
+        urls,
+        per_host_limit=per_host_limit,
+        request_deadline=request_deadline,
+        total_deadline=total_deadline,
+        extractor=extractor,
+        max_chars=max_chars,
+    )
+    async for url, content in pages:
+        results[url] = content
+    return results
+
+
 # Main Script
 if __name__ == "__main__":
     # Example URLs to scrape
@@ -0,0 +1,59 @@
+import os
+import sys
+from pathlib import Path
+import pytest
+
+# The app modules import each other by bare name (see app/main.py), so put app/ on the path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+# config.py reads the environment at import time; the model tests run with the development settings
+os.environ.setdefault("PYTHON_ENV", "DEV")
+
+WORDS = "news the senate passes budget bill governor signs new tax cuts into law a of and to is in".split()
+
+
+@pytest.fixture(scope="session")
+def tiny_models(tmp_path_factory):
+    """
+    A directory with a tiny BERT base model (base/), a fine-tuned checkpoint (model.pt)
+    and a LoRA checkpoint on the same backbone (lora.pt), laid out like app/.
+    """
+    import torch
+    from peft import LoraConfig, get_peft_model
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+    from app.constants import LORA_SETTINGS
+
+    directory = tmp_path_factory.mktemp("models")
+    special_tokens = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    backend = Tokenizer(models.WordPiece({token: i for i, token in enumerate(special_tokens + WORDS)}, unk_token="[UNK]"))
+    backend.normalizer = normalizers.BertNormalizer(lowercase=True)
+    backend.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    backend.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", pair="[CLS] $A [SEP] $B:1 [SEP]:1", special_tokens=[("[CLS]", 2), ("[SEP]", 3)]
+    )
+    tokenizer = BertTokenizerFast(
+        tokenizer_object=backend, unk_token="[UNK]", pad_token="[PAD]", cls_token="[CLS]", sep_token="[SEP]", mask_token="[MASK]"
+    )
+    tokenizer.save_pretrained(directory / "base")
+    # Wide initial weights, so that the untrained model's class probabilities are far from uniform
+    config = BertConfig(
+        vocab_size=len(special_tokens) + len(WORDS),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        num_labels=3,
+        initializer_range=0.5,
+    )
+    config.save_pretrained(directory / "base")
+
+    torch.manual_seed(0)
+    model = BertForSequenceClassification(config).eval()
+    torch.save(model.state_dict(), directory / "model.pt")
+    lora_model = get_peft_model(model, LoraConfig(**LORA_SETTINGS))
+    for name, parameter in lora_model.named_parameters():
+        # Trained adapters are non-zero; peft initializes lora_B to zeros
+        if "lora_B" in name:
+            torch.nn.init.normal_(parameter, std=0.5)
+    torch.save(lora_model.state_dict(), directory / "lora.pt")
+    return directory
@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+import time
+import pytest
+
+pytest.importorskip("pyarrow")
+from app.analytics import AnalyticsStore  # noqa: E402
+
+DAY = 86400
+# Midnight UTC, 1 January 2024
+START = 1704067200
+
+
+def segments(directory):
+    return list((directory / "articles").glob("*.parquet"))
+
+
+def wait_for_segments(directory, count):
+    """Wait for the writer thread to write `count` segments."""
+    deadline = time.time() + 5
+    while len(segments(directory)) < count and time.time() < deadline:
+        time.sleep(0.01)
+    return segments(directory)
+
+
+def article(title, probabilities):
+    return {"title": title, "content": "content", "prediction": "Center", "probabilities": probabilities}
+
+
+def test_rollups_count_each_article_once(tmp_path):
+    store = AnalyticsStore(str(tmp_path))
+    assert store.record("cnn", [article("a", [0.2, 0.7, 0.1]), article("b", [0.6, 0.3, 0.1])], START + 60) == 2
+    # Fetched again, with different whitespace, or not scored
+    assert store.record("cnn", [article("A ", [0.2, 0.7, 0.1]), {"title": "c", "content": "d"}], START + 7200) == 0
+    assert store.record("fox-news", [article("c", [0.1, 0.1, 0.8])], START + DAY + 60) == 1
+
+    days = store.query("day", START, START + 2 * DAY)
+    assert days["cnn"]["buckets"] == [START]
+    assert days["cnn"]["count"] == [2]
+    assert days["cnn"]["mean_probabilities"]["Left"] == [pytest.approx(0.4)]
+    assert days["cnn"]["predictions"] == {"Left": [1], "Center": [1], "Right": [0]}
+    assert days["fox-news"]["buckets"] == [START + DAY]
+    assert list(store.query("hour", START, START + DAY, ["fox-news"])) == []
+
+
+def test_flushed_rollups_survive_a_restart(tmp_path):
+    store = AnalyticsStore(str(tmp_path), flush_rows=2)
+    store.record("cnn", [article("a", [0.2, 0.7, 0.1]), article("b", [0.6, 0.3, 0.1])], START)
+    assert len(wait_for_segments(tmp_path, 1)) == 1
+    store.record("cnn", [article("c", [0.1, 0.1, 0.8])], START + 3600)
+    store.close()
+    assert len(segments(tmp_path)) == 2
+
+    reopened = AnalyticsStore(str(tmp_path))
+    assert reopened.query("hour", START, START + DAY)["cnn"]["count"] == [2, 1]
+    assert reopened.record("cnn", [article("a", [0.2, 0.7, 0.1])], START) == 0
+
+
+def test_segment_without_saved_rollups_is_rolled_up_on_open(tmp_path):
+    store = AnalyticsStore(str(tmp_path))
+    store.record("cnn", [article("a", [0.2, 0.7, 0.1])], START)
+    store.close()
+    # As if the process died between writing the segment and saving its rollups
+    connection = sqlite3.connect(str(tmp_path / "rollups.sqlite"))
+    connection.executescript("DELETE FROM rollups; DELETE FROM segments;")
+    connection.close()
+
+    assert AnalyticsStore(str(tmp_path)).query("day", START, START + DAY)["cnn"]["count"] == [1]
+
+
+def test_rebuild_recomputes_the_rollups(tmp_path):
+    store = AnalyticsStore(str(tmp_path), flush_rows=1)
+    store.record("cnn", [article("a", [0.2, 0.7, 0.1])], START)
+    store.record("cnn", [article("b", [0.6, 0.3, 0.1])], START + 60)
+    before = store.query("day", START, START + DAY)["cnn"]
+    store.rebuild()
+    after = store.query("day", START, START + DAY)["cnn"]
+    assert (after["buckets"], after["count"], after["predictions"]) == (before["buckets"], [2], before["predictions"])
+    # The segments store the probabilities as float32
+    assert after["mean_probabilities"] == {
+        label: pytest.approx(means, rel=1e-6) for label, means in before["mean_probabilities"].items()
+    }
+
+
+def test_articles_are_bucketed_by_publication_time(tmp_path):
+    store = AnalyticsStore(str(tmp_path))
+    published = {**article("a", [0.2, 0.7, 0.1]), "published_at": "2024-01-01T05:30:00Z"}
+    undated = {**article("b", [0.6, 0.3, 0.1]), "published_at": None}
+    invalid = {**article("c", [0.1, 0.1, 0.8]), "published_at": "yesterday"}
+    assert store.record("cnn", [published, undated, invalid], START + DAY + 60) == 3
+
+    hours = store.query("hour", START, START + 2 * DAY)["cnn"]
+    assert hours["buckets"] == [START + 5 * 3600, START + DAY]
+    assert hours["count"] == [1, 2]
+
+
+def test_segments_are_written_off_the_recording_thread(tmp_path):
+    store = AnalyticsStore(str(tmp_path), flush_rows=1)
+    writers = []
+    write_segment = store._write_segment
+    store._write_segment = lambda buffer: writers.append(threading.current_thread()) or write_segment(buffer)
+    store.record("cnn", [article("a", [0.2, 0.7, 0.1])], START)
+    assert len(wait_for_segments(tmp_path, 1)) == 1
+    assert writers and threading.current_thread() not in writers
+    store.close()
+
+
+def test_buffered_articles_are_written_on_a_timer(tmp_path):
+    store = AnalyticsStore(str(tmp_path), flush_interval=0.05)
+    store.record("cnn", [article("a", [0.2, 0.7, 0.1])], START)
+    assert len(wait_for_segments(tmp_path, 1)) == 1
+    store.close()
+
+
+def test_nothing_is_recorded_after_close(tmp_path):
+    store = AnalyticsStore(str(tmp_path))
+    store.close()
+    assert store.record("cnn", [article("a", [0.2, 0.7, 0.1])], START) == 0
+    assert segments(tmp_path) == []
+
+
+def test_failed_write_keeps_the_articles_buffered(tmp_path):
+    store = AnalyticsStore(str(tmp_path))
+    store.record("cnn", [article("a", [0.2, 0.7, 0.1])], START)
+    write_segment = store._write_segment
+
+    def full_disk(buffer):
+        raise OSError("disk full")
+
+    store._write_segment = full_disk
+    with pytest.raises(OSError):
+        store.flush()
+    store.record("cnn", [article("b", [0.6, 0.3, 0.1])], START)
+    store._write_segment = write_segment
+    store.close()
+
+    assert AnalyticsStore(str(tmp_path)).query("day", START, START + DAY)["cnn"]["count"] == [2]
+
+
+def test_unknown_granularity_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        AnalyticsStore(str(tmp_path)).query("week", START, START + DAY)
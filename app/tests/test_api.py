@@ -0,0 +1,143 @@
+import time
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient  # noqa: E402
+
+ARTICLES = [
+    {"title": "Senate passes budget", "content": "the senate passes the budget bill", "model_name": "model"},
+    {"title": "Tax cuts", "content": "governor signs new tax cuts into law", "model_name": "lora_model"},
+    {"title": "News", "content": "news of the tax bill", "model_name": "model"},
+]
+
+
+@pytest.fixture
+def client(tiny_models, monkeypatch):
+    """The API serving the tiny model and LoRA variant, with fresh per-process state and no outlet feed."""
+    from app import main
+    from app.cache import MemoryBackend, PredictionCache
+
+    settings = {
+        "BASE_MODEL_NAME": str(tiny_models / "base"),
+        "MODEL_PATH": str(tiny_models / "model.pt"),
+        "MODEL_PATH2": str(tiny_models / "lora.pt"),
+        "MODELS": ["model", "lora_model"],
+        "LOAD_MODELS": "lazy",
+        "INFERENCE_PROCESSES": 0,
+        "FEED_BACKGROUND_REFRESH": False,
+        "ANALYTICS": False,
+        "MAX_BATCH_REQUEST_ITEMS": 4,
+        "MEMORY_REPORT_INTERVAL": 0.05,
+    }
+    for key, value in settings.items():
+        monkeypatch.setitem(main.config, key, value)
+    monkeypatch.setattr(main, "models", {})
+    monkeypatch.setattr(main, "batchers", {})
+    monkeypatch.setattr(main, "near_duplicates", {})
+    monkeypatch.setattr(main, "memory_report", {})
+    monkeypatch.setattr(main, "prediction_cache", PredictionCache(MemoryBackend()))
+    # Built from the module main imported, so that its QueueFullError is the one main catches
+    monkeypatch.setattr(main, "inference_executor", main.InferenceExecutor(max_workers=1, max_pending=64))
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_batch_predictions_match_single_predictions_in_order(client):
+    response = client.post("/predict/batch", json=ARTICLES)
+    assert response.status_code == 200
+    batch = response.json()
+    assert len(batch) == len(ARTICLES)
+
+    for article, result in zip(ARTICLES, batch):
+        single = client.post("/predict", json=article).json()
+        assert result["prediction"] == single["prediction"]
+        assert result["probabilities"] == pytest.approx(single["probabilities"], abs=1e-5)
+    assert batch[0]["probabilities"] != pytest.approx(batch[1]["probabilities"], abs=1e-3)
+
+
+def test_batch_accepts_input_ids(client, tiny_models):
+    from transformers import AutoTokenizer
+
+    article = ARTICLES[0]
+    input_ids = AutoTokenizer.from_pretrained(str(tiny_models / "base"))(f"{article['title']} {article['content']}")["input_ids"]
+    by_text, by_ids = client.post("/predict/batch", json=[article, {**article, "input_ids": input_ids}]).json()
+    assert by_ids["probabilities"] == pytest.approx(by_text["probabilities"], abs=1e-5)
+
+
+def test_batch_rejects_too_many_articles(client):
+    response = client.post("/predict/batch", json=ARTICLES * 2)
+    assert response.status_code == 413
+
+
+def test_batch_rejects_an_unknown_model(client):
+    response = client.post("/predict/batch", json=[ARTICLES[0], {**ARTICLES[1], "model_name": "missing"}])
+    assert response.status_code == 400
+
+
+def test_metrics_scrapes_do_not_query_the_models(client, monkeypatch):
+    """
+    Test that the model-memory gauges are read from the report refreshed in the background, so that a
+    scrape never waits for an inference worker.
+    """
+    from app import main
+
+    client.post("/predict", json=ARTICLES[0])
+    deadline = time.time() + 5
+    while 'model_weight_bytes{model="model"}' not in client.get("/metrics").text and time.time() < deadline:
+        time.sleep(0.05)
+
+    def busy_worker():
+        raise AssertionError("/metrics asked the registry for its memory report")
+
+    monkeypatch.setattr(main.app.state.model_loader.registry, "memory_report", busy_worker)
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert 'model_weight_bytes{model="model"}' in metrics.text
+
+
+def test_near_duplicate_reuse_is_off_by_default(client):
+    from app import main
+
+    client.post("/predict", json=ARTICLES[0])
+    assert main.config["NEAR_DUPLICATE_THRESHOLD"] == 0
+    assert client.get("/stats/cache").json()["near_duplicates"] == {}
+
+
+def test_near_duplicates_are_answered_while_inference_is_full(client, monkeypatch):
+    """Test that matching against the near-duplicate index takes no room in the inference queue."""
+    from app import main
+
+    monkeypatch.setitem(main.config, "NEAR_DUPLICATE_THRESHOLD", 0.9)
+    monkeypatch.setattr(main, "prediction_cache", None)
+    scored = client.post("/predict", json=ARTICLES[0]).json()
+
+    monkeypatch.setattr(main.inference_executor, "pending", main.inference_executor.max_pending)
+    response = client.post("/predict", json=ARTICLES[0])
+    assert response.status_code == 200
+    assert response.json()["probabilities"] == pytest.approx(scored["probabilities"])
+    assert client.get("/stats/cache").json()["near_duplicates"]["model"]["hits"] == 1
+
+
+def test_batch_scores_long_documents_like_single_predictions(client):
+    article = {**ARTICLES[0], "content": " ".join([ARTICLES[0]["content"]] * 100), "long_document": True}
+    articles = [article, {**article, "aggregation": "max_confidence"}, ARTICLES[0]]
+    batch = client.post("/predict/batch", json=articles).json()
+    for article, result in zip(articles, batch):
+        single = client.post("/predict", json=article).json()
+        assert result["windows"] == single["windows"]
+        assert result["probabilities"] == pytest.approx(single["probabilities"], abs=1e-5)
+    assert batch[0]["windows"] > 1 and batch[2]["windows"] is None
+
+
+def test_batch_rejections_are_counted_for_the_rejecting_model(client, monkeypatch):
+    from app import main
+
+    client.post("/predict", json=ARTICLES[0])
+    client.post("/predict", json=ARTICLES[1])
+    monkeypatch.setattr(main, "prediction_cache", None)
+    monkeypatch.setattr(main.inference_executor, "pending", main.inference_executor.max_pending)
+    response = client.post("/predict/batch", json=[ARTICLES[1], ARTICLES[0], ARTICLES[2]])
+    assert response.status_code == 503, response.text
+    metrics = client.get("/metrics").text
+    assert 'predictions_total{model="lora_model",outcome="rejected"} 1' in metrics
+    assert 'outcome="rejected"} 2' not in metrics
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import pytest
+from app.batcher import BatchStats, InferenceExecutor, MicroBatcher, QueueFullError
+
+
+class FakeModel:
+    """Stand-in for the Model wrapper that records the batches it receives."""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict_batch(self, input_data, device):
+        self.batches.append(list(input_data))
+        return [(text.upper(), 1.0, [0.0, 1.0, 0.0]) for text in input_data]
+
+
+class FailingModel:
+    def predict_batch(self, input_data, device):
+        raise RuntimeError("forward pass failed")
+
+
+async def submit_all(batcher, texts):
+    await batcher.start()
+    try:
+        return await asyncio.gather(*(batcher.submit(text) for text in texts))
+    finally:
+        await batcher.stop()
+
+
+def test_concurrent_requests_share_one_batch():
+    """
+    Test that concurrent submissions are answered from a single forward pass, in order.
+    """
+    model = FakeModel()
+    batcher = MicroBatcher(model, "cpu", max_batch_size=8, max_wait_ms=50)
+    results = asyncio.run(submit_all(batcher, ["a", "b", "c"]))
+
+    assert [result[0] for result in results] == ["A", "B", "C"]
+    assert model.batches == [["a", "b", "c"]]
+    assert batcher.stats.snapshot()["batches"] == 1
+
+
+def test_batches_are_capped_at_max_batch_size():
+    """
+    Test that a burst larger than max_batch_size is split into several batches.
+    """
+    model = FakeModel()
+    batcher = MicroBatcher(model, "cpu", max_batch_size=2, max_wait_ms=50)
+    results = asyncio.run(submit_all(batcher, ["a", "b", "c", "d", "e"]))
+
+    assert len(results) == 5
+    assert all(len(batch) <= 2 for batch in model.batches)
+    assert batcher.stats.snapshot()["items"] == 5
+
+
+def test_queue_depth_counts_inputs_waiting_for_a_batch():
+    """
+    Test that inputs submitted while a batch runs are reported as queued until they are batched.
+    """
+    release = threading.Event()
+
+    class BlockingModel(FakeModel):
+        def predict_batch(self, input_data, device):
+            release.wait()
+            return super().predict_batch(input_data, device)
+
+    async def scenario():
+        batcher = MicroBatcher(BlockingModel(), "cpu", max_batch_size=1, max_wait_ms=0)
+        assert batcher.queue_depth() == 0
+        await batcher.start()
+        running = asyncio.create_task(batcher.submit("a"))
+        await asyncio.sleep(0.05)
+        queued = [asyncio.create_task(batcher.submit(text)) for text in "bc"]
+        await asyncio.sleep(0.05)
+        depth = batcher.queue_depth()
+        release.set()
+        await asyncio.gather(running, *queued)
+        await batcher.stop()
+        return depth, batcher.queue_depth()
+
+    assert asyncio.run(scenario()) == (2, 0)
+
+
+def test_model_errors_are_propagated_to_callers():
+    """
+    Test that a failing forward pass raises in every waiting caller.
+    """
+    batcher = MicroBatcher(FailingModel(), "cpu", max_batch_size=4, max_wait_ms=5)
+    with pytest.raises(RuntimeError, match="forward pass failed"):
+        asyncio.run(submit_all(batcher, ["a", "b"]))
+
+
+def test_batch_stats_snapshot():
+    stats = BatchStats()
+    stats.record(3, [0.001, 0.002, 0.003])
+    snapshot = stats.snapshot()
+    assert snapshot["batch_size_histogram"]["le_4"] == 1
+    assert snapshot["mean_queue_wait_ms"] == pytest.approx(2.0)
+    assert snapshot["max_queue_wait_ms"] == pytest.approx(3.0)
+
+
+def test_full_inference_queue_rejects_new_work():
+    """
+    Test that submissions beyond max_pending raise QueueFullError and that admitted work still completes.
+    """
+    model = FakeModel()
+    batcher = MicroBatcher(
+        model, "cpu", max_batch_size=8, max_wait_ms=50, executor=InferenceExecutor(max_pending=2)
+    )
+
+    async def scenario():
+        await batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(text) for text in "abc"), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(scenario())
+    assert [result[0] for result in results[:2]] == ["A", "B"]
+    assert isinstance(results[2], QueueFullError)
+    assert batcher.executor.pending == 0
+
+
+def test_oversized_job_is_admitted_into_an_empty_queue():
+    executor = InferenceExecutor(max_pending=2)
+    executor.admit(5)
+    with pytest.raises(QueueFullError):
+        executor.admit(1)
+    executor.release(5)
+    executor.admit(1)
@@ -0,0 +1,83 @@
+import json
+import pytest
+import pyarrow.parquet as pq
+from app import bulk_score
+from app.bulk_score import read_chunks, score_file
+
+
+class FakeScorer:
+    """Scores every text as Center and records the texts it saw."""
+
+    texts = []
+
+    def predict_batch(self, input_data, device, chunk_size):
+        FakeScorer.texts.extend(input_data)
+        return [("Center", 0.5, [0.25, 0.5, 0.25]) for _ in input_data]
+
+
+@pytest.fixture
+def articles(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_score, "load_scorer", lambda model_options: FakeScorer())
+    FakeScorer.texts = []
+    path = tmp_path / "articles.jsonl"
+    with open(path, "w") as f:
+        for i in range(10):
+            f.write(json.dumps({"id": i, "title": f"title {i}", "content": "body", "outlet": "cnn"}) + "\n")
+    return path
+
+
+def test_read_chunks_streams_bounded_chunks(articles):
+    chunks = list(read_chunks(str(articles), ["id", "title"], chunk_rows=4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert chunks[0][0] == {"id": 0, "title": "title 0"}
+
+
+def test_score_file_writes_parquet_parts(articles, tmp_path):
+    output = tmp_path / "out"
+    stats = score_file(
+        str(articles), str(output), {"model_path": "model.pt"}, ["title", "content"], "id", ["outlet"], chunk_rows=4
+    )
+    table = pq.read_table(output)
+    assert stats["rows"] == 10 and stats["chunks"] == 3
+    assert table.column_names == ["id", "outlet", "prediction", "confidence", "p_left", "p_center", "p_right"]
+    assert sorted(table.column("id").to_pylist()) == list(range(10))
+    assert FakeScorer.texts[0] == "title 0 body"
+
+
+def test_resume_only_scores_missing_chunks(articles, tmp_path):
+    """
+    Test that an interrupted run is resumed from the chunks whose part file is missing.
+    """
+    output = tmp_path / "out"
+    score_file(str(articles), str(output), {"model_path": "model.pt"}, ["title"], chunk_rows=4)
+    (output / "part-000001.parquet").unlink()
+    FakeScorer.texts = []
+
+    stats = score_file(str(articles), str(output), {"model_path": "model.pt"}, ["title"], chunk_rows=4)
+    assert stats["skipped_chunks"] == 2
+    assert FakeScorer.texts == ["title 4", "title 5", "title 6", "title 7"]
+    assert sorted(pq.read_table(output).column("row").to_pylist()) == list(range(10))
+
+
+def test_resume_rejects_different_options(articles, tmp_path):
+    output = tmp_path / "out"
+    score_file(str(articles), str(output), {"model_path": "model.pt"}, ["title"], chunk_rows=4)
+    with pytest.raises(ValueError, match="different options"):
+        score_file(str(articles), str(output), {"model_path": "other.pt"}, ["title"], chunk_rows=4)
+
+
+def test_near_duplicates_reuse_earlier_predictions(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_score, "load_scorer", lambda model_options: FakeScorer())
+    FakeScorer.texts = []
+    story = "the senate passed the spending bill late on tuesday after a week of negotiations"
+    path = tmp_path / "articles.jsonl"
+    with open(path, "w") as f:
+        for i, title in enumerate([story, "an unrelated report on farm subsidies", story + " reuters", story]):
+            f.write(json.dumps({"id": i, "title": title}) + "\n")
+
+    stats = score_file(
+        str(path), str(tmp_path / "out"), {"model_path": "model.pt"}, ["title"], chunk_rows=2, near_duplicate_threshold=0.8
+    )
+    assert stats["near_duplicates"] == 2
+    assert FakeScorer.texts == [story, "an unrelated report on farm subsidies"]
+    assert pq.read_table(tmp_path / "out").num_rows == 4
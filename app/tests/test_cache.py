@@ -0,0 +1,84 @@
+import time
+from app.cache import MemoryBackend, PredictionCache, SQLiteBackend, cache_key
+
+
+def test_cache_key_ignores_case_and_whitespace():
+    assert cache_key("Breaking  News\n", "model", "v1") == cache_key("breaking news", "model", "v1")
+
+
+def test_cache_key_depends_on_model_and_version():
+    key = cache_key("breaking news", "model", "v1")
+    assert key != cache_key("breaking news", "lora_model", "v1")
+    assert key != cache_key("breaking news", "model", "v2")
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+    backend.set("c", 3)
+    assert backend.get("a") == 1
+    assert backend.get("b") is None
+    assert backend.get("c") == 3
+
+
+def test_memory_backend_expires_entries():
+    backend = MemoryBackend(max_entries=2, ttl=0.01)
+    backend.set("a", 1)
+    time.sleep(0.02)
+    assert backend.get("a") is None
+
+
+def test_sqlite_backend_persists_across_instances(tmp_path):
+    """
+    Test that a second SQLite backend on the same file sees earlier predictions.
+    """
+    path = str(tmp_path / "predictions.sqlite")
+    SQLiteBackend(path, max_entries=10).set("a", ["Left", 0.9, [0.9, 0.05, 0.05], None])
+    assert SQLiteBackend(path, max_entries=10).get("a") == ["Left", 0.9, [0.9, 0.05, 0.05], None]
+
+
+def test_sqlite_backend_is_bounded(tmp_path):
+    """
+    Test that the least recently used rows are evicted in one batch once the bound and its slack are passed.
+    """
+    backend = SQLiteBackend(str(tmp_path / "predictions.sqlite"), max_entries=10)
+    for key in "abcdefghijk":
+        backend.set(key, key)
+        time.sleep(0.01)
+    assert len(backend) == 11
+    backend.get("a")
+    backend.set("l", "l")
+    assert len(backend) == 10
+    assert backend.get("a") == "a"
+    assert backend.get("b") is None and backend.get("c") is None
+
+
+def test_sqlite_eviction_counts_rows_written_by_other_processes(tmp_path):
+    path = str(tmp_path / "predictions.sqlite")
+    first, second = SQLiteBackend(path, max_entries=10), SQLiteBackend(path, max_entries=10)
+    for key in "abcdef":
+        first.set(key, key)
+    for key in "ghijkl":
+        second.set(key, key)
+    # Each backend counts its own writes and recounts the table once they run past the slack
+    for key in "mnopq":
+        first.set(key, key)
+    assert len(first) == 17
+    first.set("r", "r")
+    assert len(first) == 10
+
+
+def test_only_the_sqlite_cache_blocks(tmp_path):
+    assert not PredictionCache(MemoryBackend()).blocking
+    assert PredictionCache(SQLiteBackend(str(tmp_path / "predictions.sqlite"))).blocking
+
+
+def test_prediction_cache_counts_hits_and_misses():
+    cache = PredictionCache(MemoryBackend())
+    cache.get("a")
+    cache.set("a", 1)
+    cache.get("a")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
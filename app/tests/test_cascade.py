@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from app.cascade import Cascade
+from app.tune_cascade import evaluate, tune
+
+
+def fake_scorer(confidences: dict):
+    """Score each input with the confidence its stage has for it, recording the calls."""
+    calls = []
+
+    async def score(model_name, inputs):
+        calls.append((model_name, list(inputs)))
+        return [("Left", confidences[model_name][text], [1.0, 0.0, 0.0]) for text in inputs]
+
+    return score, calls
+
+
+def test_cascade_escalates_only_unconfident_inputs():
+    score, calls = fake_scorer({"small": {"a": 0.95, "b": 0.6, "c": 0.85}, "large": {"b": 0.7, "c": 0.99}})
+    answers = asyncio.run(Cascade(["small", "large"], [0.8]).run(score, ["a", "b", "c"]))
+
+    assert [stage for _, stage in answers] == ["small", "large", "small"]
+    assert calls == [("small", ["a", "b", "c"]), ("large", ["b"])]
+
+
+def test_last_stage_answers_whatever_is_left():
+    score, calls = fake_scorer({"small": {"a": 0.1}, "medium": {"a": 0.2}, "large": {"a": 0.3}})
+    [(result, stage)] = asyncio.run(Cascade(["small", "medium", "large"], [0.9, 0.5]).run(score, ["a"]))
+
+    assert (stage, result[1]) == ("large", 0.3)
+    assert [model_name for model_name, _ in calls] == ["small", "medium", "large"]
+
+
+def test_cascade_stops_when_every_input_is_answered():
+    score, calls = fake_scorer({"small": {"a": 0.99}, "large": {}})
+    asyncio.run(Cascade(["small", "large"], [0.9]).run(score, ["a"]))
+    assert calls == [("small", ["a"])]
+
+
+def test_cascade_thresholds_must_match_the_stages():
+    assert Cascade(["a", "b", "c"], [0.8]).thresholds == [0.8, 0.8]
+    with pytest.raises(ValueError):
+        Cascade(["a", "b", "c"], [0.8, 0.7, 0.6])
+    with pytest.raises(ValueError):
+        Cascade(["a"], [])
+
+
+# Two texts: the small model is confident and right on the first, unsure and wrong on the second
+RESULTS = {"small": [(0, 0.95), (1, 0.55)], "large": [(0, 0.9), (2, 0.8)]}
+LABELS = [0, 2]
+COSTS = {"small": 0.001, "large": 0.004}
+
+
+def test_evaluate_counts_the_cost_of_every_stage_tried():
+    row = evaluate(RESULTS, LABELS, COSTS, ["small", "large"], [0.9])
+    assert row["accuracy"] == 1.0
+    assert row["answered"] == {"small": 0.5, "large": 0.5}
+    # The first text costs the small model, the second both models
+    assert row["ms_per_text"] == pytest.approx((1 + 5) / 2)
+
+
+def test_tune_picks_the_cheapest_threshold_within_the_accuracy_target():
+    report = tune(RESULTS, LABELS, COSTS, ["small", "large"], [0.5, 0.9, 0.99], max_accuracy_drop=0.0)
+    assert report["reference"]["accuracy"] == 1.0
+    assert report["best"]["thresholds"] == [0.9]
+
+    report = tune(RESULTS, LABELS, COSTS, ["small", "large"], [0.5, 0.9, 0.99], max_accuracy_drop=0.5)
+    assert report["best"]["thresholds"] == [0.5]
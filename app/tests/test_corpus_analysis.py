@@ -0,0 +1,61 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_analysis.corpus_analysis import analyze_corpus, analyze_table, word_counts
+
+
+def corpus(rows):
+    return pa.table(
+        {
+            "outlet": [f"outlet {i % 3}" for i in range(rows)],
+            "headline": [f"Headline {i}: the Senate votes" for i in range(rows)],
+            "body": [None if i % 10 == 0 else " ".join(["word"] * (i % 7)) for i in range(rows)],
+            "political_leaning": [["LEFT", "CENTER", "CENTER", "RIGHT", "UNDEFINED"][i % 5] for i in range(rows)],
+        }
+    )
+
+
+def test_word_counts_match_str_split():
+    texts = [" two\twords ", "", None, "no\xa0break　space", "café crème\n", "\x01 control"]
+    array = pa.chunked_array([texts[:2], texts[2:]]).slice(1)
+    assert word_counts(array).tolist() == [len(text.split()) if text else 0 for text in texts[1:]]
+
+
+def test_rows_with_missing_values_or_undefined_leaning_are_dropped():
+    report = analyze_table(corpus(100)).summary(stop_words={"the", "headline"}, top=2)
+    assert (report["rows"], report["nulls"]["body"], report["leanings"]["UNDEFINED"]) == (100, 10, 20)
+    # 80 defined rows, of which 10 LEFT rows have no body
+    assert report["classes"] == {"CENTER": 40, "RIGHT": 20, "LEFT": 10}
+    assert report["lengths"]["headline"] == {"min": 5, "max": 5, "mean": 5.0, "p50": 5, "p90": 5, "p99": 5}
+    assert report["tokens"]["LEFT"]["all"][0][1] == 10
+    assert [token for token, _ in report["tokens"]["LEFT"]["filtered"]] == ["senate", "votes"]
+
+
+def test_chunked_parallel_analysis_matches_one_pass(tmp_path):
+    table = corpus(1000).append_column("id", pa.array(range(1000)))
+    path = str(tmp_path / "corpus.parquet")
+    pq.write_table(table, path, row_group_size=300)
+
+    whole = analyze_table(table)
+    chunked = analyze_corpus(path, sample_size=50, chunk_rows=128, workers=2)
+    assert chunked.tokens == whole.tokens
+    assert (chunked.classes, chunked.leanings) == (whole.classes, whole.leanings)
+    assert chunked.summary()["lengths"] == whole.summary()["lengths"]
+    assert chunked.summary()["sampled"] == {"CENTER": 50, "LEFT": 50, "RIGHT": 50}
+    # The sample does not depend on the number of workers
+    sequential = analyze_corpus(path, sample_size=50, chunk_rows=128)
+    assert sequential.balanced_sample().column("id").to_pylist() == chunked.balanced_sample().column("id").to_pylist()
+
+
+def test_balanced_sample_has_as_many_rows_of_each_leaning():
+    stats = analyze_table(corpus(100), sample_size=30, seed=1)
+    sample = stats.balanced_sample()
+    assert sample.num_rows == 3 * 10
+    assert sorted(sample.column("political_leaning").value_counts().field("counts").to_pylist()) == [10, 10, 10]
+    assert sample.column("body").null_count == 0
+    assert stats.balanced_sample(per_class=5).num_rows == 15
+
+
+def test_duplicate_rows_are_counted_across_chunks():
+    table = corpus(10)
+    stats = analyze_table(table).merge(analyze_table(table.slice(0, 4)))
+    assert (stats.rows, stats.duplicates) == (14, 4)
@@ -0,0 +1,66 @@
+import numpy as np
+from app.dedup import NearDuplicateIndex, shingle_hashes
+
+STORY = (
+    "The Senate passed the spending bill late on Tuesday after a week of negotiations, "
+    "sending it to the president, who is expected to sign it before the deadline on Friday."
+)
+
+
+def test_shingles_ignore_case_punctuation_and_whitespace():
+    assert set(shingle_hashes("Breaking: the  Senate VOTES")) == set(shingle_hashes("breaking the senate votes"))
+    assert len(shingle_hashes("two words")) == 1
+
+
+def test_edited_copy_of_a_story_is_a_near_duplicate():
+    index = NearDuplicateIndex(threshold=0.8)
+    signature, head = index.fingerprint(STORY)
+    index.add(signature, "wire story", head)
+
+    edited = STORY.replace("who is expected", "who is widely expected")
+    assert index.query(*index.fingerprint(edited)) == "wire story"
+    assert index.query(*index.fingerprint("The House rejected a bill on farm subsidies.")) is None
+    assert (index.stats()["hits"], index.stats()["misses"]) == (1, 1)
+
+
+def test_same_body_under_another_headline_is_not_a_near_duplicate():
+    body = " ".join([STORY] * 5)
+    index = NearDuplicateIndex(threshold=0.8)
+    signature, head = index.fingerprint("Fox: Biden disaster " + body)
+    index.add(signature, "Right", head)
+
+    other = index.fingerprint("CNN: Biden triumph " + body)
+    # The shingles barely differ, but the headlines do
+    assert (index.signature("CNN: Biden triumph " + body) == signature).mean() > 0.8
+    assert index.query(*other) is None
+
+
+def test_only_the_model_input_is_compared():
+    index = NearDuplicateIndex(threshold=1.0, max_words=20)
+    first, second = STORY + " Markets rallied.", STORY + " The president stayed silent on the matter."
+    assert (index.signature(first) == index.signature(second)).all()
+    signature, head = index.fingerprint(first)
+    index.add(signature, "first", head)
+    fingerprints, values = index.match([second, "Unrelated news"])
+    assert values == ["first", None]
+    assert fingerprints[0][1] == head
+
+
+def test_identical_text_always_matches():
+    index = NearDuplicateIndex(threshold=1.0)
+    index.add(index.signature(STORY), 1, index.head(STORY))
+    assert index.query(*index.fingerprint(STORY.upper())) == 1
+
+
+def test_full_index_replaces_its_oldest_articles():
+    index = NearDuplicateIndex(threshold=1.0, capacity=3, num_perm=8, bands=4)
+    rng = np.random.default_rng(0)
+    signatures = [rng.integers(0, 4, 8).astype(np.uint32) for _ in range(20)]
+    for value, signature in enumerate(signatures):
+        index.add(signature, value)
+
+    assert index.size == 3
+    for value in (17, 18, 19):
+        assert (signatures[index.query(signatures[value])] == signatures[value]).all()
+    # Every band of the evicted articles left the table with them
+    assert (index._table != -1).sum() == 3 * 4
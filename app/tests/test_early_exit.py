@@ -0,0 +1,81 @@
+import pytest
+import torch
+from transformers import BertConfig, BertForSequenceClassification
+from app.early_exit import EarlyExit, ExitHeads, cls_states, should_exit
+from app.train_exits import exit_report, train_heads
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=50, hidden_size=16, num_hidden_layers=4, num_attention_heads=2, intermediate_size=32, num_labels=3
+    )
+    return BertForSequenceClassification(config).eval()
+
+
+@pytest.fixture
+def encodings():
+    input_ids = torch.tensor([[2, 5, 9, 11, 3], [2, 7, 3, 0, 0], [2, 8, 8, 3, 0]])
+    return {
+        "input_ids": input_ids,
+        "attention_mask": (input_ids != 0).long(),
+        "token_type_ids": torch.zeros_like(input_ids),
+    }
+
+
+def test_should_exit_by_confidence_and_entropy():
+    logits = torch.tensor([[10.0, 0.0, 0.0], [0.0, 0.0, 0.0]])
+    assert should_exit(logits, "confidence", 0.9).tolist() == [True, False]
+    assert should_exit(logits, "entropy", 0.1).tolist() == [True, False]
+    # A uniform distribution has the maximal normalized entropy of 1
+    assert should_exit(logits, "entropy", 1.0).tolist() == [True, True]
+
+
+def test_unknown_criterion_is_rejected():
+    with pytest.raises(ValueError):
+        EarlyExit(ExitHeads([1], 16, 3), criterion="margin")
+
+
+def test_exit_heads_roundtrip(tmp_path, model):
+    heads = ExitHeads.from_classifier(model, [1, 2])
+    path = str(tmp_path / "model.exits.pt")
+    heads.save(path)
+    loaded = ExitHeads.load(path)
+
+    states = torch.randn(2, 2, 16)
+    assert loaded.layers == [1, 2]
+    assert torch.equal(loaded(states), heads(states))
+
+
+def test_early_exit_never_taken_matches_the_full_model(model, encodings):
+    early_exit = EarlyExit(ExitHeads.from_classifier(model, [1, 2, 3]), threshold=1.1)
+    with torch.no_grad():
+        logits, exit_layers = early_exit.logits(model, encodings)
+        expected = model(**encodings).logits
+    assert exit_layers == [4, 4, 4]
+    assert torch.allclose(logits, expected, atol=1e-5)
+
+
+def test_early_exit_always_taken_uses_the_first_head(model, encodings):
+    heads = ExitHeads.from_classifier(model, [2, 3])
+    with torch.no_grad():
+        logits, exit_layers = EarlyExit(heads, threshold=0.0).logits(model, encodings)
+        states, _ = cls_states(model, encodings, [2, 3])
+        expected = heads(states)[:, 0]
+    assert exit_layers == [2, 2, 2]
+    assert torch.allclose(logits, expected, atol=1e-5)
+
+
+def test_trained_heads_learn_their_targets_and_report_the_exits(model):
+    torch.manual_seed(0)
+    states = torch.randn(64, 2, 16)
+    targets = (states[:, 1, 0] > 0).long()
+    heads = ExitHeads(layers=[1, 2], hidden_size=16, num_labels=3)
+    losses = train_heads(heads, states, targets, epochs=30, lr=0.05, batch_size=16)
+    assert losses[-1] < losses[0]
+
+    final_logits = torch.nn.functional.one_hot(targets, 3).float() * 10
+    [never, always] = exit_report(heads, states, final_logits, targets.tolist(), "confidence", [1.1, 0.0], 4)
+    assert (never["mean_exit_layer"], never["agreement"], never["accuracy"]) == (4.0, 1.0, 1.0)
+    assert always["mean_exit_layer"] == 1.0 and always["layers_saved"] == 0.75
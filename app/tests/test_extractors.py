@@ -0,0 +1,110 @@
+import sys
+from pathlib import Path
+import pytest
+from app.extractors import EXTRACTORS, charset_from_content_type, create_extractor
+
+FIXTURES_DIR = Path(__file__).resolve().parents[2] / "benchmarks" / "fixtures"
+
+
+# A page that each parser repairs in its own way: html.parser nests the second paragraph in the first
+MISNESTED = b"<p>a <b>b<p>c</b> d</p>"
+MISNESTED_PARAGRAPHS = {"html.parser": "a b d\nc", "lxml": "a b\nc d", "selectolax": "a b\nc d"}
+LATIN1_PAGES = {
+    "meta charset": b"<html><head><meta charset='iso-8859-1'></head><body><p>caf\xe9</p><p>na\xefve</p></body></html>",
+    "meta http-equiv": (
+        b'<html><head><meta http-equiv="Content-Type" content="text/html; charset=windows-1252"></head>'
+        b"<body><p>caf\xe9 \x93quoted\x94</p></body></html>"
+    ),
+}
+
+
+def extract(name, html, max_chars=None, chunk_size=4096, encoding="utf-8"):
+    extractor = create_extractor(name, max_chars=max_chars, encoding=encoding)
+    for start in range(0, len(html), chunk_size):
+        if extractor.feed(html[start:start + chunk_size]):
+            break
+    return extractor.close()
+
+
+@pytest.mark.parametrize("fixture", sorted(FIXTURES_DIR.glob("*.html")), ids=lambda path: path.name)
+@pytest.mark.parametrize("name", ["lxml", "selectolax"])
+def test_fast_extractors_match_html_parser(name, fixture):
+    """
+    Test that the C-backed extractors return the same paragraphs as html.parser on the saved pages.
+    """
+    pytest.importorskip(name)
+    html = fixture.read_bytes()
+    assert extract(name, html) == extract("html.parser", html)
+
+
+@pytest.mark.parametrize("name", list(EXTRACTORS))
+def test_extractors_repair_misnested_paragraphs_in_their_own_way(name):
+    if name != "html.parser":
+        pytest.importorskip(name)
+    assert extract(name, MISNESTED) == MISNESTED_PARAGRAPHS[name]
+
+
+def test_auto_extractor_prefers_the_fast_extractors():
+    pytest.importorskip("lxml")
+    assert create_extractor("auto").name == "lxml"
+
+
+def test_auto_extractor_falls_back_to_html_parser(monkeypatch):
+    for module in ("lxml", "selectolax", "selectolax.lexbor"):
+        monkeypatch.setitem(sys.modules, module, None)
+    assert create_extractor("auto").name == "html.parser"
+
+
+@pytest.mark.parametrize("html", LATIN1_PAGES.values(), ids=list(LATIN1_PAGES))
+@pytest.mark.parametrize("name", list(EXTRACTORS))
+def test_extractors_decode_the_charset_declared_in_the_page(name, html):
+    """
+    Test that a page without a Content-Type charset is decoded with its <meta> charset, like html.parser does.
+    """
+    if name != "html.parser":
+        pytest.importorskip(name)
+    expected = extract("html.parser", html, encoding=None)
+    assert "\ufffd" not in expected and "caf\u00e9" in expected
+    assert extract(name, html, encoding=None, chunk_size=16) == expected
+
+
+@pytest.mark.parametrize("name", list(EXTRACTORS))
+def test_extractors_default_to_utf8(name):
+    if name != "html.parser":
+        pytest.importorskip(name)
+    assert extract(name, "<p>café über</p>".encode("utf-8"), encoding=None) == "café über"
+
+
+@pytest.mark.parametrize("name", list(EXTRACTORS))
+def test_extractors_return_an_unclosed_paragraph_once(name):
+    """
+    Test that a paragraph left open by the next one, which html.parser nests inside it, is returned once.
+    """
+    if name != "html.parser":
+        pytest.importorskip(name)
+    html = b"<html><body><p>Valid paragraph<p>Unclosed tag</body></html>"
+    assert extract(name, html) == "Valid paragraph\nUnclosed tag"
+
+
+@pytest.mark.parametrize("name", list(EXTRACTORS))
+def test_extractors_stop_after_max_chars(name):
+    if name != "html.parser":
+        pytest.importorskip(name)
+    html = b"<html><body>" + b"".join(b"<p>paragraph %d</p>" % i for i in range(100)) + b"</body></html>"
+    assert extract(name, html, max_chars=20) == "paragraph 0\nparagraph 1"
+
+
+def test_lxml_extractor_stops_feeding_early():
+    """
+    Test that the streaming extractor asks for no more input once it has enough text.
+    """
+    pytest.importorskip("lxml")
+    extractor = create_extractor("lxml", max_chars=10, encoding="utf-8")
+    assert extractor.feed(b"<html><body><p>first paragraph</p>") is True
+
+
+def test_charset_from_content_type():
+    assert charset_from_content_type("text/html; charset=ISO-8859-1") == "ISO-8859-1"
+    assert charset_from_content_type('text/html; charset="utf-8"') == "utf-8"
+    assert charset_from_content_type("text/html") is None
+    assert charset_from_content_type(None) is None
@@ -0,0 +1,79 @@
+import asyncio
+from app.feed import OutletFeed
+
+
+class FakeUpstream:
+    """Counts upstream fetches and returns one article per fetch."""
+
+    def __init__(self, delay=0.05):
+        self.fetches = 0
+        self.delay = delay
+
+    async def fetch(self, source_id):
+        self.fetches += 1
+        await asyncio.sleep(self.delay)
+        return [{"title": f"{source_id} {self.fetches}", "content": "content"}]
+
+
+async def score(input_data):
+    return [("Center", 0.9, [0.05, 0.9, 0.05]) for _ in input_data]
+
+
+def test_burst_of_requests_triggers_one_fetch():
+    """
+    Test that concurrent requests for an uncached outlet share a single upstream fetch.
+    """
+    upstream = FakeUpstream()
+    feed = OutletFeed(upstream.fetch, score, ["cnn"])
+
+    async def burst():
+        return await asyncio.gather(*(feed.get("cnn") for _ in range(10)))
+
+    entries = asyncio.run(burst())
+    assert upstream.fetches == 1
+    assert all(entry is entries[0] for entry in entries)
+    assert entries[0].articles[0]["prediction"] == "Center"
+
+
+def test_stale_entry_is_served_while_revalidating():
+    """
+    Test that a stale entry is returned immediately and replaced by one background refresh.
+    """
+    upstream = FakeUpstream()
+    feed = OutletFeed(upstream.fetch, score, ["cnn"], stale_after=0)
+
+    async def scenario():
+        first = await feed.get("cnn")
+        stale = await asyncio.gather(feed.get("cnn"), feed.get("cnn"))
+        await asyncio.sleep(0.2)
+        return first, stale, feed.entries["cnn"]
+
+    first, stale, refreshed = asyncio.run(scenario())
+    assert all(entry is first for entry in stale)
+    assert upstream.fetches == 2
+    assert refreshed.articles[0]["title"] == "cnn 2"
+
+
+def test_empty_refresh_keeps_cached_articles():
+    responses = iter([[{"title": "a", "content": "b"}], None])
+
+    async def fetch(source_id):
+        return next(responses)
+
+    feed = OutletFeed(fetch, score, ["cnn"])
+
+    async def scenario():
+        first = await feed.get("cnn")
+        second = await feed.refresh("cnn")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert second is first
+
+
+def test_scored_articles_are_recorded():
+    recorded = []
+    feed = OutletFeed(FakeUpstream(delay=0).fetch, score, ["cnn"], record=lambda *args: recorded.append(args))
+    asyncio.run(feed.get("cnn"))
+    assert recorded == [("cnn", feed.entries["cnn"].articles)]
+    assert recorded[0][1][0]["probabilities"] == [0.05, 0.9, 0.05]
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from app.loader import ModelLoader, warmup_inputs
+
+
+class FakeModel:
+    def __init__(self):
+        self.warmup_batches = []
+
+    def predict_batch(self, input_data, device):
+        self.warmup_batches.append(list(input_data))
+        return []
+
+
+class FakeRegistry:
+    """Counts registry creations and model loads."""
+
+    created = 0
+
+    def __init__(self):
+        FakeRegistry.created += 1
+        self.loads = []
+
+    def load(self, name, model_path):
+        if model_path is None:
+            raise FileNotFoundError(f"No checkpoint for {name}")
+        self.loads.append(name)
+        return FakeModel()
+
+
+def make_loader(**specs):
+    return ModelLoader(FakeRegistry, {name: {"name": name, "model_path": path} for name, path in specs.items()}, warmup_batch_size=4)
+
+
+def test_concurrent_requests_share_one_load():
+    """
+    Test that requests for a model that is still loading wait for the same load and are warmed up once.
+    """
+    FakeRegistry.created = 0
+    loader = make_loader(model="model.pt", lora_model="lora.pt")
+
+    async def scenario():
+        return await asyncio.gather(loader.get("model"), loader.get("model"))
+
+    first, second = asyncio.run(scenario())
+    assert first is second
+    assert len(first.warmup_batches) == 1
+    assert FakeRegistry.created == 1
+    assert loader.registry.loads == ["model"]
+    assert loader.status()["models"] == {"model": "ready", "lora_model": "pending"}
+
+
+def test_failed_load_is_reported():
+    loader = make_loader(model="model.pt", lora_model=None)
+
+    async def scenario():
+        loader.start(["model", "lora_model"])
+        await loader._background
+
+    asyncio.run(scenario())
+    assert loader.ready(["model"])
+    assert not loader.ready(["model", "lora_model"])
+    status = loader.status()
+    assert status["models"] == {"model": "ready", "lora_model": "failed"}
+    assert "No checkpoint" in status["errors"]["lora_model"]
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(loader.get("lora_model"))
+
+
+def test_failed_load_is_retried_on_the_next_request():
+    loader = make_loader(lora_model=None)
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(loader.get("lora_model"))
+
+    loader.model_specs["lora_model"]["model_path"] = "lora.pt"
+    assert isinstance(asyncio.run(loader.get("lora_model")), FakeModel)
+    assert loader.ready(["lora_model"])
+    assert loader.status()["errors"] == {}
+
+
+def test_warmup_inputs_cover_every_bucket():
+    texts = warmup_inputs((16, 32), 4)
+    assert [len(text.split()) for text in texts] == [14, 30, 14, 30]
@@ -0,0 +1,46 @@
+import json
+import pytest
+from app.logger_config import LogControl, logger, parse_sample_rates
+
+
+@pytest.fixture
+def log_control(tmp_path):
+    control = LogControl(tmp_path / "test.log", "INFO", serialize=True, enqueue=True, sample_rates={"/predict": 0.0})
+    yield control
+    logger.remove(control._handler_id)
+
+
+def read_records(log_control):
+    logger.complete()
+    return [json.loads(line)["record"] for line in log_control.path.read_text().splitlines()]
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("") == {}
+    assert parse_sample_rates("/predict=0.01, inference=2") == {"/predict": 0.01, "inference": 1.0}
+
+
+def test_sampled_out_routes_still_log_warnings(log_control):
+    logger.bind(route="/predict").info("routine")
+    logger.bind(route="/predict").warning("unusual")
+    logger.bind(route="/outlets").info("unsampled route")
+
+    assert [record["message"] for record in read_records(log_control)] == ["unusual", "unsampled route"]
+
+
+def test_request_decision_overrides_route_rate(log_control):
+    logger.bind(route="/predict", sampled=True).info("sampled in")
+    logger.bind(route="/outlets", sampled=False).info("sampled out")
+
+    assert [record["message"] for record in read_records(log_control)] == ["sampled in"]
+
+
+def test_level_changes_at_runtime(log_control):
+    logger.debug("hidden")
+    log_control.set_level("debug")
+    logger.debug("shown")
+
+    assert log_control.level == "DEBUG"
+    assert [record["message"] for record in read_records(log_control)] == ["shown"]
+    with pytest.raises(ValueError):
+        log_control.set_level("LOUD")
@@ -0,0 +1,73 @@
+import pytest
+from app.metrics import Counter, Gauge, Histogram, MetricsRegistry, observe_outcome
+
+
+def test_counter_renders_total_per_label_set():
+    counter = Counter("predictions", "Predictions.", ["model", "outcome"])
+    counter.inc(model="model", outcome="ok")
+    counter.inc(2, model="model", outcome="ok")
+    counter.inc(model="lora_model", outcome="error")
+
+    assert counter.value(model="model", outcome="ok") == 3
+    lines = counter.render().splitlines()
+    assert lines[:2] == ["# HELP predictions Predictions.", "# TYPE predictions counter"]
+    assert 'predictions_total{model="model",outcome="ok"} 3' in lines
+    assert 'predictions_total{model="lora_model",outcome="error"} 1' in lines
+
+
+def test_wrong_labels_are_rejected():
+    counter = Counter("predictions", "Predictions.", ["model"])
+    with pytest.raises(ValueError):
+        counter.inc(outcome="ok")
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", ["stage"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value, stage="forward")
+
+    lines = histogram.render().splitlines()
+    assert 'latency_seconds_bucket{stage="forward",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="forward",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{stage="forward",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{stage="forward"} 4' in lines
+    assert 'latency_seconds_sum{stage="forward"} 4.25' in lines
+
+
+def test_gauge_reads_its_function_at_render_time():
+    depths = {"model": 2}
+    gauge = Gauge("queue_depth", "Queue depth.", ["model"])
+    gauge.set_function(lambda: depths)
+    depths["lora_model"] = 5
+
+    lines = gauge.render().splitlines()
+    assert 'queue_depth{model="model"} 2' in lines
+    assert 'queue_depth{model="lora_model"} 5' in lines
+
+
+def test_label_values_are_escaped():
+    gauge = Gauge("info", "Info.", ["path"])
+    gauge.set(1, path='a "quoted"\\path')
+    assert 'info{path="a \\"quoted\\"\\\\path"} 1' in gauge.render()
+
+
+def test_observe_outcome_labels_timeouts_and_errors():
+    histogram = Histogram("fetch_seconds", "Fetch time.", ["outcome"])
+    with observe_outcome(histogram):
+        pass
+    with pytest.raises(TimeoutError):
+        with observe_outcome(histogram):
+            raise TimeoutError
+    with pytest.raises(RuntimeError):
+        with observe_outcome(histogram):
+            raise RuntimeError
+
+    assert [histogram.count(outcome=outcome) for outcome in ("ok", "timeout", "error")] == [1, 1, 1]
+
+
+def test_registry_rejects_duplicate_names():
+    registry = MetricsRegistry()
+    registry.register(Counter("requests", "Requests."))
+    with pytest.raises(ValueError):
+        registry.register(Counter("requests", "Requests."))
+    assert registry.render().endswith("# TYPE requests counter\n")
@@ -0,0 +1,121 @@
+import random
+import pytest
+import torch
+import torch.nn.functional as F
+from transformers import BertConfig, BertForSequenceClassification
+from app.constants import CLASSES
+from app.model import Model
+
+WORDS = ["senate", "passes", "tax", "bill", "house", "votes", "budget", "deal", "court", "rules"]
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "[CLS]": 2, "[SEP]": 3, **{word: i + 4 for i, word in enumerate(WORDS)}}
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    """A word-level BERT-style fast tokenizer built in memory."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+
+    backend = Tokenizer(models.WordLevel(VOCAB, unk_token="[UNK]"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 2), ("[SEP]", 3)]
+    )
+    return PreTrainedTokenizerFast(
+        tokenizer_object=backend,
+        pad_token="[PAD]",
+        unk_token="[UNK]",
+        model_input_names=["input_ids", "token_type_ids", "attention_mask"],
+    )
+
+
+@pytest.fixture(scope="module")
+def model(tokenizer):
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=len(VOCAB), hidden_size=16, num_hidden_layers=2, num_attention_heads=2, intermediate_size=32, num_labels=3
+    )
+    return Model("model.pt", BertForSequenceClassification(config).eval(), tokenizer)
+
+
+def document(words, seed=0):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def window_logits(model, text, windows, stride=32):
+    """The logits of the first `windows` windows of the fully tokenized text."""
+    encodings = model._windows(text, stride)
+    return model._logits({key: val[:windows] for key, val in encodings.items()}, "cpu")
+
+
+def test_predict_scores_the_whole_text(model):
+    text = document(40)
+    prediction, confidence, probabilities = model.predict(text, "cpu")
+    [expected] = model.predict_batch([text], "cpu")
+    assert (prediction, confidence, probabilities) == expected
+    assert model.predict(model.encoder.encode([text])[0], "cpu") == expected
+
+
+def test_short_text_is_one_window(model):
+    prediction, confidence, probabilities, windows = model.predict_long(document(20), "cpu")
+    assert windows == 1
+    assert prediction == CLASSES[probabilities.index(confidence)]
+
+
+def test_long_text_is_cut_before_tokenizing(model, monkeypatch):
+    text = document(5000)
+    tokenized = []
+    windows_of = model._windows
+    monkeypatch.setattr(model, "_windows", lambda text, stride: tokenized.append(len(text)) or windows_of(text, stride))
+
+    *_, probabilities, windows = model.predict_long(text, "cpu", aggregation="mean", max_windows=4)
+
+    assert windows == 4
+    assert tokenized == [(128 + 4 * (128 - 2 - 32)) * 8]
+    expected = F.softmax(window_logits(model, text, 4).mean(dim=0), dim=0)
+    assert probabilities == pytest.approx(expected.tolist(), abs=1e-5)
+
+
+def test_head_with_too_few_windows_falls_back_to_the_full_text(model):
+    # Words longer than CHARS_PER_TOKEN leave the head short of the window limit
+    text = " ".join(["filibuster" * 3] * 2000)
+    *_, windows = model.predict_long(text, "cpu", max_windows=4)
+    assert windows == 4
+
+
+def test_token_budget_caps_the_windows(model):
+    *_, windows = model.predict_long(document(5000), "cpu", max_windows=8, token_budget=256)
+    assert windows == 2
+
+
+@pytest.mark.parametrize("aggregation", ["mean", "max_confidence", "attention"])
+def test_window_aggregations(model, aggregation):
+    text = document(1000, seed=1)
+    logits = window_logits(model, text, 3)
+    if aggregation == "mean":
+        expected = F.softmax(logits.mean(dim=0), dim=0)
+    elif aggregation == "max_confidence":
+        window_probabilities = F.softmax(logits, dim=1)
+        expected = window_probabilities[window_probabilities.max(dim=1).values.argmax()]
+    else:
+        weights = F.softmax(logits.max(dim=1).values, dim=0)
+        expected = F.softmax((weights.unsqueeze(1) * logits).sum(dim=0), dim=0)
+
+    prediction, confidence, probabilities, windows = model.predict_long(text, "cpu", aggregation=aggregation, max_windows=3)
+
+    assert windows == 3
+    assert probabilities == pytest.approx(expected.tolist(), abs=1e-5)
+    assert confidence == pytest.approx(expected.max().item(), abs=1e-5)
+
+
+def test_max_confidence_keeps_one_window(model):
+    text = document(1000, seed=2)
+    window_probabilities = F.softmax(window_logits(model, text, 3), dim=1).tolist()
+    *_, probabilities, _ = model.predict_long(text, "cpu", aggregation="max_confidence", max_windows=3)
+    assert any(probabilities == pytest.approx(window, abs=1e-5) for window in window_probabilities)
+
+
+def test_unknown_aggregation_is_rejected(model):
+    with pytest.raises(ValueError):
+        model.predict_long("senate passes tax bill", "cpu", aggregation="median")
@@ -0,0 +1,26 @@
+import pytest
+import torch
+from app.model import is_quantized_state_dict
+from app.quantize import build_quantized_artifact
+from app.registry import ModelRegistry
+
+TEXTS = ["the senate passes the budget bill", "governor signs new tax cuts into law", "news", "a tax bill"]
+
+
+def test_int8_artifact_round_trip(tiny_models, tmp_path):
+    """
+    Test that a saved int8 artifact loads without re-quantizing and predicts like the float
+    checkpoint quantized at load time.
+    """
+    artifact = str(tmp_path / "model_int8.pt")
+    report = build_quantized_artifact(str(tiny_models / "base"), str(tiny_models / "model.pt"), artifact, TEXTS)
+    assert report["samples"] == len(TEXTS)
+    assert is_quantized_state_dict(torch.load(artifact, weights_only=True))
+
+    registry = ModelRegistry(str(tiny_models / "base"), token_cache_size=0)
+    served = registry.load("quantized_model", artifact, quantized=True)
+    quantized_at_load = registry.load("float_quantized_model", str(tiny_models / "model.pt"), quantized=True)
+    for result, expected in zip(served.predict_batch(TEXTS, "cpu"), quantized_at_load.predict_batch(TEXTS, "cpu")):
+        assert result[0] == expected[0]
+        assert result[2] == pytest.approx(expected[2], abs=1e-6)
+    assert served.weights_version != quantized_at_load.weights_version
@@ -0,0 +1,118 @@
+import shutil
+import pytest
+import torch
+from app.registry import ModelRegistry
+
+TEXTS = ["the senate passes the budget bill", "governor signs new tax cuts into law", "news"]
+
+
+@pytest.fixture
+def registry(tiny_models):
+    return ModelRegistry(str(tiny_models / "base"), token_cache_size=0)
+
+
+def reference_probabilities(tiny_models, checkpoint, lora=False):
+    """Probabilities of a checkpoint loaded on its own, outside the registry."""
+    from peft import LoraConfig, get_peft_model
+    from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+    from app.constants import LORA_SETTINGS
+
+    base = str(tiny_models / "base")
+    module = AutoModelForSequenceClassification.from_config(AutoConfig.from_pretrained(base, num_labels=3))
+    if lora:
+        module = get_peft_model(module, LoraConfig(**LORA_SETTINGS))
+    module.load_state_dict(torch.load(checkpoint, weights_only=True))
+    encodings = AutoTokenizer.from_pretrained(base)(TEXTS, padding=True, return_tensors="pt")
+    with torch.no_grad():
+        return torch.softmax(module.eval()(**encodings).logits, dim=1).tolist()
+
+
+def max_difference(first, second) -> float:
+    return (torch.tensor(first) - torch.tensor(second)).abs().max().item()
+
+
+def probabilities(model_wrapper):
+    return [result[2] for result in model_wrapper.predict_batch(TEXTS, "cpu")]
+
+
+def test_lora_variants_sharing_weights_stay_isolated(tiny_models, tmp_path, registry):
+    """
+    Test that the adapters of LoRA variants sharing one backbone never leak into each other's
+    outputs, or into those of the plain model whose weights they share.
+    """
+    other_lora = tmp_path / "other_lora.pt"
+    state_dict = torch.load(tiny_models / "lora.pt", weights_only=True)
+    torch.save({key: -tensor if "lora_B" in key else tensor for key, tensor in state_dict.items()}, other_lora)
+    from peft import LoraConfig
+    from app.constants import LORA_SETTINGS
+
+    model = registry.load("model", str(tiny_models / "model.pt"))
+    lora_model = registry.load("lora_model", str(tiny_models / "lora.pt"), lora_config=LoraConfig(**LORA_SETTINGS))
+    other_model = registry.load("other_lora_model", str(other_lora), lora_config=LoraConfig(**LORA_SETTINGS))
+
+    expected = {
+        "model": reference_probabilities(tiny_models, tiny_models / "model.pt"),
+        "lora_model": reference_probabilities(tiny_models, tiny_models / "lora.pt", lora=True),
+        "other_lora_model": reference_probabilities(tiny_models, other_lora, lora=True),
+    }
+    assert max_difference(expected["lora_model"], expected["model"]) > 0.01
+    assert max_difference(expected["other_lora_model"], expected["lora_model"]) > 0.01
+    # Interleaved, so each call follows one that activated another adapter
+    for model_wrapper in (lora_model, model, other_model, lora_model, other_model, model):
+        for result, reference in zip(probabilities(model_wrapper), expected[model_wrapper.name]):
+            assert result == pytest.approx(reference, abs=1e-5)
+
+    assert lora_model.model is other_model.model
+    report = registry.memory_report()
+    assert report["stored_bytes"] < sum(report["models"].values())
+
+
+@pytest.mark.parametrize("backend", ["torchscript", "onnx"])
+def test_exported_backend_matches_eager(tiny_models, tmp_path, registry, backend):
+    if backend == "onnx":
+        pytest.importorskip("onnxruntime")
+    from app.export import export_checkpoint
+
+    checkpoint = str(tmp_path / "model.pt")
+    shutil.copy(tiny_models / "model.pt", checkpoint)
+    export_checkpoint(str(tiny_models / "base"), checkpoint, [backend], TEXTS)
+
+    eager = registry.load("model", checkpoint)
+    exported = registry.load(f"model_{backend}", checkpoint, backend=backend)
+
+    for (prediction, _, probabilities), (exported_prediction, _, exported_probabilities) in zip(
+        eager.predict_batch(TEXTS, "cpu"), exported.predict_batch(TEXTS, "cpu")
+    ):
+        assert exported_prediction == prediction
+        assert exported_probabilities == pytest.approx(probabilities, abs=1e-4)
+    assert exported.weights_version != eager.weights_version
+    assert exported.weights_version.endswith(f"+{backend}")
+
+
+def test_torchscript_backend_keeps_the_process_thread_count(tiny_models, tmp_path):
+    from app.export import export_checkpoint
+
+    checkpoint = str(tmp_path / "model.pt")
+    shutil.copy(tiny_models / "model.pt", checkpoint)
+    export_checkpoint(str(tiny_models / "base"), checkpoint, ["torchscript"], TEXTS)
+    threads = torch.get_num_threads()
+    registry = ModelRegistry(str(tiny_models / "base"), token_cache_size=0, num_threads=threads + 1)
+    registry.load("model", checkpoint, backend="torchscript")
+    assert torch.get_num_threads() == threads
+
+
+def test_exported_backend_is_versioned_by_its_artifact(tiny_models, tmp_path, registry):
+    from app.export import export_checkpoint
+
+    checkpoint = str(tmp_path / "model.pt")
+    shutil.copy(tiny_models / "model.pt", checkpoint)
+    export_checkpoint(str(tiny_models / "base"), checkpoint, ["torchscript"], TEXTS)
+    before = registry.load("model", checkpoint, backend="torchscript").weights_version
+
+    export_checkpoint(str(tiny_models / "base"), checkpoint, ["torchscript"], TEXTS[:1])
+    assert registry.load("model", checkpoint, backend="torchscript").weights_version != before
+
+
+def test_quantized_variant_rejects_an_exported_backend(tiny_models, registry):
+    with pytest.raises(ValueError, match="eager"):
+        registry.load("quantized_model", str(tiny_models / "model.pt"), quantized=True, backend="onnx")
@@ -17,6 +17,16 @@ def test_news_article_invalid():
     with pytest.raises(ValueError):
         NewsArticle(title="Missing Content")  # content and model_name are required
 
+def test_news_article_input_ids():
+    article = NewsArticle(title="", content="", model_name="model", input_ids=[101, 2054, 102])
+    assert article.input_ids == [101, 2054, 102]
+    with pytest.raises(ValueError):
+        NewsArticle(title="", content="", model_name="model", input_ids=[101, -1, 102])
+    with pytest.raises(ValueError):
+        NewsArticle(title="", content="", model_name="model", input_ids=[101] * 129)
+    with pytest.raises(ValueError):
+        NewsArticle(title="", content="", model_name="model", input_ids=[101, 102], long_document=True)
+
 def test_prediction_response_valid():
     # Test with valid data
     response = PredictionResponse(
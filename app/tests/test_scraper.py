@@ -1,9 +1,12 @@
+import threading
+import time
 import pytest
 import requests
 from requests.exceptions import RequestException
 from bs4 import BeautifulSoup
 from unittest.mock import patch
-from your_script import scrape_website  # Replace "your_script" with the filename of your main script
+import asyncio
+from app.scraper import scrape_as_completed_async, scrape_many, scrape_many_async, scrape_website
 
 # Test URL for scraping
 TEST_URL = "https://example.com"
@@ -42,7 +45,7 @@ def test_scrape_website_request_exception():
     """
     Test that scrape_website raises an exception when a RequestException occurs.
     """
-    with patch("requests.get", side_effect=RequestException("Request failed")):
+    with patch("app.scraper.session.get", side_effect=RequestException("Request failed")):
         with pytest.raises(RequestException, match="Request failed"):
             scrape_website(TEST_URL)
 
@@ -63,7 +66,103 @@ def test_scrape_website_invalid_html(requests_mock):
     invalid_html = "<html><body><p>Valid paragraph<p>Unclosed tag</body></html>"
     requests_mock.get(TEST_URL, text=invalid_html, status_code=200)
 
-    # Ensure that only valid paragraphs are returned
+    # Ensure that the unclosed paragraph is returned once, after the valid one
     content = scrape_website(TEST_URL)
-    assert content == "Valid paragraph"
+    assert content == "Valid paragraph\nUnclosed tag"
 
+def test_scrape_many_returns_partial_results(requests_mock):
+    """
+    Test that scrape_many keeps the pages that succeeded when another one fails.
+    """
+    requests_mock.get("https://a.example.com/1", text="<p>First article</p>", status_code=200)
+    requests_mock.get("https://b.example.com/2", status_code=500)
+
+    results = scrape_many(["https://a.example.com/1", "https://b.example.com/2"])
+    assert results == {"https://a.example.com/1": "First article", "https://b.example.com/2": None}
+
+def test_scrape_many_fetches_concurrently():
+    """
+    Test that the total time is close to the slowest page, not the sum of all pages.
+    """
+    def slow_page(url, timeout, deadline, **kwargs):
+        time.sleep(0.2)
+        return url
+
+    urls = [f"https://site{i}.example.com/" for i in range(5)]
+    with patch("app.scraper.scrape_website", side_effect=slow_page):
+        started = time.monotonic()
+        results = scrape_many(urls, max_workers=5)
+        elapsed = time.monotonic() - started
+    assert results == {url: url for url in urls}
+    assert elapsed < 0.6
+
+def test_scrape_many_stops_at_total_deadline():
+    """
+    Test that pages still loading at the overall deadline are left out.
+    """
+    def page(url, timeout, deadline, **kwargs):
+        time.sleep(1 if "slow" in url else 0)
+        return url
+
+    with patch("app.scraper.scrape_website", side_effect=page):
+        results = scrape_many(["https://fast.example.com/", "https://slow.example.com/"], total_deadline=0.3)
+    assert results == {"https://fast.example.com/": "https://fast.example.com/", "https://slow.example.com/": None}
+
+def test_scrape_many_limits_requests_per_host():
+    """
+    Test that no more than per_host_limit pages are fetched from one host at a time.
+    """
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def page(url, timeout, deadline, **kwargs):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return url
+
+    urls = [f"https://same.example.com/{i}" for i in range(6)]
+    with patch("app.scraper.scrape_website", side_effect=page):
+        scrape_many(urls, max_workers=6, per_host_limit=2)
+    assert peak[0] == 2
+
+
+def test_scrape_many_async_skips_failed_pages():
+    """
+    Test that the async scraper returns the content of good pages and None for failed ones.
+    """
+    httpx = pytest.importorskip("httpx")
+
+    def handler(request):
+        if request.url.path == "/bad":
+            return httpx.Response(500)
+        return httpx.Response(200, html="<html><body><p>Async paragraph</p></body></html>")
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await scrape_many_async(client, ["https://a.com/good", "https://a.com/bad"])
+
+    results = asyncio.run(scenario())
+    assert results == {"https://a.com/good": "Async paragraph", "https://a.com/bad": None}
+
+
+def test_scrape_as_completed_async_yields_pages_as_they_finish():
+    """
+    Test that pages are yielded in the order they finish and that slow pages are dropped at the deadline.
+    """
+    httpx = pytest.importorskip("httpx")
+    delays = {"/slow": 0.2, "/fast": 0.0, "/stuck": 5.0}
+
+    async def handler(request):
+        await asyncio.sleep(delays[request.url.path])
+        return httpx.Response(200, html=f"<html><body><p>{request.url.path}</p></body></html>")
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            urls = [f"https://{path[1:]}.com{path}" for path in delays]
+            return [url async for url, _ in scrape_as_completed_async(client, urls, total_deadline=0.5)]
+
+    assert asyncio.run(scenario()) == ["https://fast.com/fast", "https://slow.com/slow"]
@@ -0,0 +1,83 @@
+import pytest
+import torch
+from app.tokenization import TokenEncoder, length_buckets
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "[CLS]": 2, "[SEP]": 3, "senate": 4, "passes": 5, "tax": 6, "bill": 7}
+
+
+@pytest.fixture
+def tokenizer():
+    """A word-level BERT-style fast tokenizer built in memory."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+
+    backend = Tokenizer(models.WordLevel(VOCAB, unk_token="[UNK]"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 2), ("[SEP]", 3)]
+    )
+    return PreTrainedTokenizerFast(
+        tokenizer_object=backend,
+        pad_token="[PAD]",
+        unk_token="[UNK]",
+        model_input_names=["input_ids", "token_type_ids", "attention_mask"],
+    )
+
+
+def test_length_buckets_cover_every_position_once():
+    lengths = [120, 5, 40, 7, 128, 33, 12]
+    buckets = length_buckets(lengths, max_bucket_size=64)
+    positions = sorted(position for bucket in buckets for position in bucket)
+    assert positions == list(range(len(lengths)))
+
+
+def test_length_buckets_do_not_straddle_boundaries():
+    """
+    Test that short headlines are not padded together with long article bodies.
+    """
+    lengths = [120, 5, 40, 7, 128, 33, 12]
+    buckets = length_buckets(lengths, max_bucket_size=64, boundaries=(16, 32, 64, 128))
+    assert buckets == [[1, 3, 6], [5, 2], [0, 4]]
+
+
+def test_length_buckets_respect_max_bucket_size():
+    buckets = length_buckets([10] * 5, max_bucket_size=2)
+    assert [len(bucket) for bucket in buckets] == [2, 2, 1]
+
+
+def test_length_buckets_empty_input():
+    assert length_buckets([], max_bucket_size=8) == []
+
+
+def test_encoder_matches_the_tokenizer(tokenizer):
+    texts = ["senate passes tax bill", "tax", "senate " * 200]
+    encoder = TokenEncoder(tokenizer, max_length=128)
+    ids = encoder.encode(texts)
+    assert [list(sequence) for sequence in ids] == tokenizer(texts, truncation=True, max_length=128)["input_ids"]
+
+
+def test_encoder_caches_repeated_texts(tokenizer):
+    encoder = TokenEncoder(tokenizer, cache_size=2)
+    encoder.encode(["senate passes", "tax bill"])
+    encoder.encode(["tax bill", "bill"])
+    assert (encoder.hits, encoder.misses) == (1, 3)
+    # The least recently used text was evicted
+    assert encoder.stats()["entries"] == 2
+    encoder.encode(["senate passes"])
+    assert encoder.misses == 4
+
+
+def test_encoder_passes_pre_tokenized_inputs_through(tokenizer):
+    encoder = TokenEncoder(tokenizer)
+    ids = encoder.encode([[2, 6, 3], "tax"])
+    assert ids[0] == [2, 6, 3]
+    assert list(ids[1]) == [2, 6, 3]
+    assert encoder.misses == 1
+
+
+def test_encoder_pads_to_the_longest_input(tokenizer):
+    encoder = TokenEncoder(tokenizer)
+    encodings = encoder.pad(encoder.encode(["senate passes tax bill", "tax"]))
+    assert encodings["input_ids"].tolist() == [[2, 4, 5, 6, 7, 3], [2, 6, 3, 0, 0, 0]]
+    assert encodings["attention_mask"].tolist() == [[1] * 6, [1, 1, 1, 0, 0, 0]]
+    assert torch.equal(encodings["token_type_ids"], torch.zeros(2, 6, dtype=torch.int64))
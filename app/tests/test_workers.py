@@ -0,0 +1,78 @@
+import pytest
+from app.workers import WorkerPool, split_cores
+
+
+def test_cores_are_split_into_contiguous_groups():
+    assert split_cores(list(range(8)), 3) == [[0, 1, 2], [3, 4, 5], [6, 7]]
+
+
+def test_workers_share_cores_when_there_are_too_few():
+    assert split_cores([0, 1], 3) == [[0], [1], [0]]
+
+
+def test_worker_pool_serves_the_models_and_restarts_a_dead_worker(tiny_models):
+    """
+    Test that a one-worker pool loads the models, answers calls, reports its memory and
+    restarts a dead worker in the background: the request it was serving fails at once, and the next one
+    is answered by the restarted worker.
+    """
+    pool = WorkerPool(
+        str(tiny_models / "base"),
+        [{"name": "model", "model_path": str(tiny_models / "model.pt")}],
+        num_workers=1,
+        threads_per_worker=1,
+        warmup_batch_size=2,
+    )
+    models = pool.start()
+    try:
+        model = pool.load("model")
+        assert models == {"model": model} and model.vocab_size == 24
+        with pytest.raises(RuntimeError):
+            pool.load("lora_model")
+
+        texts = ["the senate passes the budget bill", "news"]
+        results = model.predict_batch(texts, "cpu")
+        assert [len(result) for result in results] == [3, 3]
+        prediction, confidence, probabilities, windows = model.predict_long(" ".join(texts * 200), "cpu")
+        assert windows > 1 and confidence == max(probabilities)
+        report = pool.memory_report()
+        assert report["models"]["model"] > 0 and report["stored_bytes"] > 0
+
+        pool._processes[0].kill()
+        pool._processes[0].join()
+        with pytest.raises(RuntimeError, match="died"):
+            model.predict_batch(texts, "cpu")
+        assert pool._idle.empty()
+        restarted = model.predict_batch(texts, "cpu")
+        assert [result[2] for result in restarted] == [result[2] for result in results]
+    finally:
+        pool.stop()
+
+
+class FakeWorkers(WorkerPool):
+    """A pool whose workers report the given (versions, vocabulary size) without starting processes."""
+
+    def __init__(self, loaded: list):
+        super().__init__("base", [], num_workers=len(loaded))
+        self.loaded = loaded
+
+    def _launch(self, index: int):
+        return index
+
+    def _wait_ready(self, index: int, conn) -> tuple:
+        return self.loaded[index]
+
+    def stop(self):
+        pass
+
+
+def test_pool_serves_only_the_models_every_worker_loaded():
+    pool = FakeWorkers([({"model": "a", "lora_model": "b"}, 24), ({"model": "a"}, 24)])
+    assert list(pool.start()) == ["model"]
+    assert pool.load("model").weights_version == "a"
+
+
+def test_pool_fails_when_workers_loaded_different_weights():
+    pool = FakeWorkers([({"model": "a"}, 24), ({"model": "b"}, 24)])
+    with pytest.raises(RuntimeError, match="different weights"):
+        pool.start()
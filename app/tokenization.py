@@ -0,0 +1,131 @@
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Sequence, Union
+import numpy as np
+import torch
+
+
+def length_buckets(
+    lengths: Sequence[int], max_bucket_size: int, boundaries: Sequence[int] = (16, 32, 64, 128)
+) -> List[List[int]]:
+    """
+    Group input positions into buckets of similar token length.
+
+    Positions are sorted by length and split whenever a bucket is full or the
+    next length crosses one of `boundaries`, so each bucket can be padded to
+    its own longest item instead of the longest item of the whole batch.
+
+    Args:
+        lengths (Sequence[int]): Token length of each input.
+        max_bucket_size (int): Maximum number of inputs per bucket.
+        boundaries (Sequence[int]): Ascending length limits that a bucket may not straddle.
+
+    Returns:
+        List[List[int]]: Buckets of positions into `lengths`, shortest inputs first.
+    """
+    buckets = []
+    current, current_limit = [], None
+    for position in sorted(range(len(lengths)), key=lengths.__getitem__):
+        # The smallest boundary that holds this input; longer inputs share one open-ended bucket
+        limit = next((boundary for boundary in boundaries if lengths[position] <= boundary), None)
+        if current and (len(current) >= max_bucket_size or limit != current_limit):
+            buckets.append(current)
+            current = []
+        current.append(position)
+        current_limit = limit
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+def text_digest(text: str) -> bytes:
+    """Key of a text in the token cache."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class TokenEncoder:
+    """
+    Encodes texts to input ids with the Rust fast tokenizer and pads them into tensors.
+
+    The ids of the last `cache_size` distinct texts are kept, keyed by a hash of the
+    text, so that outlet articles and rescored texts are tokenized once. Misses are
+    encoded in one batched call to a private copy of the Rust tokenizer, configured
+    once for truncation: unlike calls through the transformers tokenizer, concurrent
+    calls from several inference threads never reconfigure shared state, and the
+    encoding runs without the GIL. Inputs may also be pre-tokenized id sequences,
+    which are used as they are.
+    """
+
+    def __init__(self, tokenizer, max_length: int = 128, cache_size: int = 10000):
+        if not getattr(tokenizer, "is_fast", False):
+            raise ValueError(f"{type(tokenizer).__name__} is not a fast tokenizer; install the tokenizers package.")
+        from tokenizers import Tokenizer
+
+        self.backend = Tokenizer.from_str(tokenizer.backend_tokenizer.to_str())
+        self.backend.enable_truncation(max_length)
+        self.backend.no_padding()
+        self.max_length = max_length
+        self.pad_token_id = tokenizer.pad_token_id or 0
+        self.input_names = tokenizer.model_input_names
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, inputs: Sequence[Union[str, Sequence[int]]]) -> List[Sequence[int]]:
+        """Return the input ids of each text, or the ids given for a pre-tokenized input."""
+        ids = [None if isinstance(item, str) else item for item in inputs]
+        keys = {}
+        with self._lock:
+            for position, item in enumerate(inputs):
+                if ids[position] is not None:
+                    continue
+                key = text_digest(item)
+                cached = self._cache.get(key)
+                if cached is None:
+                    keys.setdefault(key, (item, []))[1].append(position)
+                    self.misses += 1
+                else:
+                    self._cache.move_to_end(key)
+                    ids[position] = cached
+                    self.hits += 1
+        if not keys:
+            return ids
+
+        # One batched encode of the distinct missing texts
+        encoded = [array("i", encoding.ids) for encoding in self.backend.encode_batch([text for text, _ in keys.values()])]
+        with self._lock:
+            for (key, (_, positions)), sequence in zip(keys.items(), encoded):
+                for position in positions:
+                    ids[position] = sequence
+                if self.cache_size:
+                    self._cache[key] = sequence
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return ids
+
+    def pad(self, sequences: Sequence[Sequence[int]]) -> dict:
+        """Pad id sequences to the longest one and build the model input tensors."""
+        input_ids = np.full((len(sequences), max(len(sequence) for sequence in sequences)), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros_like(input_ids)
+        for row, sequence in enumerate(sequences):
+            input_ids[row, :len(sequence)] = sequence
+            attention_mask[row, :len(sequence)] = 1
+        encodings = {"input_ids": torch.from_numpy(input_ids), "attention_mask": torch.from_numpy(attention_mask)}
+        if "token_type_ids" in self.input_names:
+            # Single-sequence inputs are all segment 0
+            encodings["token_type_ids"] = torch.zeros_like(encodings["input_ids"])
+        return encodings
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "max_entries": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
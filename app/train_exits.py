@@ -0,0 +1,167 @@
+import argparse
+import json
+from typing import List, Optional
+import torch
+import torch.nn.functional as F
+from logger_config import logger
+from bulk_score import read_chunks
+from early_exit import EXIT_CRITERIA, ExitHeads, cls_states, exit_heads_path, should_exit
+from tune_cascade import label_index
+
+# Thresholds reported after training, per criterion
+REPORT_THRESHOLDS = {
+    "confidence": [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99],
+    "entropy": [0.5, 0.4, 0.3, 0.2, 0.15, 0.1, 0.05, 0.01],
+}
+
+
+def read_texts(path: str, text_columns: List[str], label_column: Optional[str]):
+    """Read the texts of a sample and, when a label column is given, their class indices."""
+    texts, labels = [], []
+    columns = text_columns + ([label_column] if label_column else [])
+    for chunk in read_chunks(path, columns):
+        for row in chunk:
+            texts.append(" ".join(str(row[column] or "") for column in text_columns))
+            if label_column:
+                labels.append(label_index(row[label_column]))
+    return texts, labels or None
+
+
+def extract_states(model_wrapper, texts: List[str], layers: List[int], batch_size: int):
+    """
+    Run the frozen model over the texts once and keep the [CLS] state after each exit
+    layer and the final logits, so that training never runs the encoder again.
+    """
+    states, logits = [], []
+    with torch.no_grad():
+        for start in range(0, len(texts), batch_size):
+            encodings = model_wrapper.encoder.pad(model_wrapper.encoder.encode(texts[start:start + batch_size]))
+            batch_states, batch_logits = cls_states(model_wrapper.model, encodings, layers)
+            states.append(batch_states)
+            logits.append(batch_logits)
+    return torch.cat(states), torch.cat(logits)
+
+
+def train_heads(heads: ExitHeads, states: torch.Tensor, targets: torch.Tensor, epochs: int, lr: float, batch_size: int) -> list:
+    """
+    Fit every head on the cached [CLS] states. Targets are class indices, or the final
+    classifier's probabilities to distill the heads from the model itself.
+    Returns the mean loss per epoch.
+    """
+    optimizer = torch.optim.AdamW(heads.parameters(), lr=lr)
+    heads.train()
+    losses = []
+    for epoch in range(epochs):
+        total = 0.0
+        for batch in torch.randperm(len(states)).split(batch_size):
+            logits = heads(states[batch])
+            loss = sum(F.cross_entropy(logits[:, i], targets[batch]) for i in range(logits.shape[1])) / logits.shape[1]
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(batch)
+        losses.append(total / len(states))
+        logger.info("Epoch {}: loss {:.4f}", epoch + 1, losses[-1])
+    heads.eval()
+    return losses
+
+
+def exit_report(
+    heads: ExitHeads,
+    states: torch.Tensor,
+    final_logits: torch.Tensor,
+    labels: Optional[List[int]],
+    criterion: str,
+    thresholds: List[float],
+    num_layers: int,
+) -> List[dict]:
+    """
+    Replay early exit over held-out states: the mean exit layer, the encoder layers
+    saved, and how often the early prediction agrees with the full model (and, with
+    labels, its accuracy) per threshold.
+    """
+    with torch.no_grad():
+        head_logits = heads(states)
+    final_predictions = final_logits.argmax(dim=-1)
+    rows = []
+    for threshold in thresholds:
+        predictions = final_predictions.clone()
+        exit_layers = torch.full((len(states),), num_layers)
+        pending = torch.ones(len(states), dtype=torch.bool)
+        for i, layer in enumerate(heads.layers):
+            done = pending & should_exit(head_logits[:, i], criterion, threshold)
+            predictions[done] = head_logits[done, i].argmax(dim=-1)
+            exit_layers[done] = layer
+            pending &= ~done
+        row = {
+            "threshold": threshold,
+            "mean_exit_layer": exit_layers.float().mean().item(),
+            "layers_saved": 1 - exit_layers.float().mean().item() / num_layers,
+            "agreement": (predictions == final_predictions).float().mean().item(),
+        }
+        if labels is not None:
+            label_tensor = torch.tensor(labels)
+            row["accuracy"] = (predictions == label_tensor).float().mean().item()
+            row["full_model_accuracy"] = (final_predictions == label_tensor).float().mean().item()
+        rows.append(row)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train early-exit heads on top of a frozen fine-tuned checkpoint.")
+    parser.add_argument("input", help="Training texts (.parquet, .jsonl or .csv)")
+    parser.add_argument("--model-path", required=True, help="Fine-tuned checkpoint (.pt or .safetensors)")
+    parser.add_argument("--base-model", default="bert-base-uncased", help="Base model configuration and tokenizer")
+    parser.add_argument("--lora", action="store_true", help="The checkpoint is a LoRA model")
+    parser.add_argument("--text-columns", default="title,content", help="Comma-separated columns forming the input")
+    parser.add_argument(
+        "--label-column", help="Column holding the class name or index; without it the heads learn the model's predictions"
+    )
+    parser.add_argument("--layers", help="Comma-separated encoder layers to attach heads to (default: every second one)")
+    parser.add_argument("--epochs", type=int, default=5, help="Passes over the training texts")
+    parser.add_argument("--lr", type=float, default=1e-3, help="AdamW learning rate")
+    parser.add_argument("--batch-size", type=int, default=32, help="Inputs per forward pass and per training step")
+    parser.add_argument("--validation-split", type=float, default=0.2, help="Share of the texts held out for the report")
+    parser.add_argument("--criterion", default="confidence", choices=EXIT_CRITERIA, help="Exit criterion reported")
+    parser.add_argument("--output", help="Exit heads file (default: next to the checkpoint, as the server expects)")
+    args = parser.parse_args()
+
+    from registry import ModelRegistry
+
+    torch.manual_seed(0)
+    lora_config = None
+    if args.lora:
+        from peft import LoraConfig
+        from constants import LORA_SETTINGS
+
+        lora_config = LoraConfig(**LORA_SETTINGS)
+    model_wrapper = ModelRegistry(args.base_model, token_cache_size=0).load("model", args.model_path, lora_config=lora_config)
+    num_layers = model_wrapper.model.config.num_hidden_layers
+    layers = [int(layer) for layer in args.layers.split(",")] if args.layers else list(range(2, num_layers, 2))
+
+    texts, labels = read_texts(args.input, args.text_columns.split(","), args.label_column)
+    states, final_logits = extract_states(model_wrapper, texts, layers, args.batch_size)
+    logger.info("Extracted [CLS] states of layers {} for {} texts", layers, len(texts))
+
+    order = torch.randperm(len(texts))
+    held_out = int(len(texts) * args.validation_split)
+    validation, training = order[:held_out], order[held_out:]
+    targets = torch.tensor(labels) if labels is not None else F.softmax(final_logits, dim=-1)
+
+    heads = ExitHeads.from_classifier(model_wrapper.model, layers)
+    losses = train_heads(heads, states[training], targets[training], args.epochs, args.lr, args.batch_size)
+    output = args.output or exit_heads_path(args.model_path)
+    heads.save(output)
+
+    report = {"layers": layers, "losses": losses, "output": output}
+    if held_out:
+        report["validation"] = exit_report(
+            heads,
+            states[validation],
+            final_logits[validation],
+            [labels[i] for i in validation] if labels is not None else None,
+            args.criterion,
+            REPORT_THRESHOLDS[args.criterion],
+            num_layers,
+        )
+    print(json.dumps(report, indent=4))
@@ -0,0 +1,163 @@
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+from logger_config import logger
+from constants import CLASSES
+from cascade import Cascade
+from bulk_score import read_chunks
+
+
+def parse_stage(value: str) -> dict:
+    """Parse NAME=PATH[:quantized][:lora], e.g. quantized_model=model_int8.pt:quantized."""
+    name, _, rest = value.partition("=")
+    path, *flags = rest.split(":")
+    return {"name": name, "model_path": path, "quantized": "quantized" in flags, "lora": "lora" in flags}
+
+
+def label_index(value) -> int:
+    """Class index of a label given as a class name (e.g. "Left") or an index."""
+    if isinstance(value, str) and value in CLASSES:
+        return CLASSES.index(value)
+    return int(value)
+
+
+def read_sample(path: str, text_columns: List[str], label_column: str):
+    """Read the texts and class indices of a labeled sample."""
+    texts, labels = [], []
+    for chunk in read_chunks(path, text_columns + [label_column]):
+        for row in chunk:
+            texts.append(" ".join(str(row[column] or "") for column in text_columns))
+            labels.append(label_index(row[label_column]))
+    return texts, labels
+
+
+def score_stages(texts: List[str], stages: List[dict], base_model: str, batch_size: int):
+    """
+    Score every text with every stage.
+
+    Returns the (prediction index, confidence) of each text per stage, and the
+    seconds per text each stage took at `batch_size`.
+    """
+    from registry import ModelRegistry
+
+    # No token cache, so that every stage pays for its own tokenization as a cold request would
+    registry = ModelRegistry(base_model, device="cpu", token_cache_size=0)
+    results, costs = {}, {}
+    for stage in stages:
+        lora_config = None
+        if stage["lora"]:
+            from peft import LoraConfig
+            from constants import LORA_SETTINGS
+
+            lora_config = LoraConfig(**LORA_SETTINGS)
+        model_wrapper = registry.load(
+            stage["name"], stage["model_path"], lora_config=lora_config, quantized=stage["quantized"]
+        )
+        model_wrapper.predict_batch(texts[:batch_size], "cpu", batch_size)
+        started = time.perf_counter()
+        predictions = model_wrapper.predict_batch(texts, "cpu", batch_size)
+        costs[stage["name"]] = (time.perf_counter() - started) / len(texts)
+        results[stage["name"]] = [(CLASSES.index(prediction), confidence) for prediction, confidence, *_ in predictions]
+        logger.info("Scored {} texts with {} in {:.1f} ms per text", len(texts), stage["name"], 1000 * costs[stage["name"]])
+    return results, costs
+
+
+def evaluate(
+    results: Dict[str, list], labels: List[int], costs: Dict[str, float], stages: List[str], thresholds: Sequence[float]
+) -> dict:
+    """
+    Replay the cascade over scored texts: its accuracy, the share of texts each stage
+    answered, and the expected inference time per text, counting every stage a text
+    went through.
+    """
+    cascade = Cascade(stages, thresholds)
+    correct, seconds = 0, 0.0
+    answered = dict.fromkeys(stages, 0)
+    for position, label in enumerate(labels):
+        for stage_index, stage in enumerate(stages):
+            prediction, confidence = results[stage][position]
+            seconds += costs[stage]
+            if cascade.accepts(stage_index, confidence):
+                correct += prediction == label
+                answered[stage] += 1
+                break
+    return {
+        "thresholds": list(cascade.thresholds),
+        "accuracy": correct / len(labels),
+        "ms_per_text": 1000 * seconds / len(labels),
+        "answered": {stage: count / len(labels) for stage, count in answered.items()},
+    }
+
+
+def choose_threshold(rows: List[dict], reference_accuracy: float, max_accuracy_drop: float) -> dict:
+    """The cheapest cascade whose accuracy is within `max_accuracy_drop` of the reference."""
+    eligible = [row for row in rows if row["accuracy"] >= reference_accuracy - max_accuracy_drop]
+    return min(eligible, key=lambda row: (row["ms_per_text"], -row["accuracy"]))
+
+
+def tune(
+    results: Dict[str, list],
+    labels: List[int],
+    costs: Dict[str, float],
+    stages: List[str],
+    candidates: Sequence[float],
+    max_accuracy_drop: float,
+) -> dict:
+    """
+    Sweep one threshold shared by all non-final stages and pick the cheapest that keeps
+    accuracy within `max_accuracy_drop` of the final stage answering every text.
+    """
+    final = stages[-1]
+    reference = {
+        "accuracy": sum(prediction == label for (prediction, _), label in zip(results[final], labels)) / len(labels),
+        "ms_per_text": 1000 * costs[final],
+    }
+    rows = [evaluate(results, labels, costs, stages, [threshold]) for threshold in candidates]
+    # A threshold above every confidence escalates everything, which always meets the accuracy target
+    rows.append(evaluate(results, labels, costs, stages, [float("inf")]))
+    best = choose_threshold(rows, reference["accuracy"], max_accuracy_drop)
+    return {"reference": {"stage": final, **reference}, "sweep": rows, "best": best}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Choose the cascade confidence threshold from a labeled sample.")
+    parser.add_argument("input", help="Labeled sample (.parquet, .jsonl or .csv)")
+    parser.add_argument(
+        "--stage",
+        action="append",
+        required=True,
+        help="NAME=PATH[:quantized][:lora], cheapest first, e.g. quantized_model=model_int8.pt:quantized",
+    )
+    parser.add_argument("--base-model", default="bert-base-uncased", help="Base model configuration and tokenizer")
+    parser.add_argument("--text-columns", default="title,content", help="Comma-separated columns forming the input")
+    parser.add_argument("--label-column", default="label", help="Column holding the class name or index")
+    parser.add_argument("--batch-size", type=int, default=32, help="Inputs per forward pass")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.005, help="Accuracy the cascade may lose")
+    parser.add_argument("--thresholds", default="0.5:1.0:0.01", help="Candidate thresholds as START:STOP:STEP")
+    parser.add_argument("--output", help="Write the sweep as JSON here")
+    args = parser.parse_args()
+
+    stages = [parse_stage(value) for value in args.stage]
+    if len(stages) < 2:
+        parser.error("A cascade needs at least two --stage options.")
+    start, stop, step = (float(value) for value in args.thresholds.split(":"))
+    candidates = [round(start + i * step, 6) for i in range(int(round((stop - start) / step)))]
+
+    texts, labels = read_sample(args.input, args.text_columns.split(","), args.label_column)
+    results, costs = score_stages(texts, stages, args.base_model, args.batch_size)
+    report = tune(results, labels, costs, [stage["name"] for stage in stages], candidates, args.max_accuracy_drop)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=4))
+
+    reference, best = report["reference"], report["best"]
+    print(f"{reference['stage']} alone: accuracy {reference['accuracy']:.4f}, {reference['ms_per_text']:.2f} ms per text")
+    if best["ms_per_text"] >= reference["ms_per_text"]:
+        print(f"No cascade within {args.max_accuracy_drop} accuracy is cheaper; serve {reference['stage']} directly.")
+        raise SystemExit(1)
+    print(
+        f"Cascade at {best['thresholds'][0]}: accuracy {best['accuracy']:.4f}, {best['ms_per_text']:.2f} ms per text, "
+        f"answered {json.dumps({stage: round(share, 3) for stage, share in best['answered'].items()})}"
+    )
+    print(f"CASCADE_MODELS={','.join(stage['name'] for stage in stages)} CASCADE_THRESHOLDS={best['thresholds'][0]}")
@@ -0,0 +1,278 @@
+import os
+import queue
+import threading
+import multiprocessing
+from logger_config import logger
+
+# Lines of /proc/self/smaps_rollup reported per worker, in kB
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Private_Clean", "Private_Dirty")
+
+
+def split_cores(cores: list, num_workers: int) -> list:
+    """Split the available cores into `num_workers` contiguous, near-equal groups."""
+    size, extra = divmod(len(cores), num_workers)
+    groups, start = [], 0
+    for index in range(num_workers):
+        end = start + size + (1 if index < extra else 0)
+        # With fewer cores than workers, workers share cores round-robin
+        groups.append(cores[start:end] or [cores[index % len(cores)]])
+        start = end
+    return groups
+
+
+def process_memory() -> dict:
+    """Resident and shared memory of the current process in bytes, on Linux."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return {}
+    memory = {}
+    for line in lines:
+        field, _, value = line.partition(":")
+        if field in MEMORY_FIELDS:
+            memory[field.lower()] = int(value.split()[0]) * 1024
+    return memory
+
+
+def _worker_main(
+    conn,
+    base_model_name: str,
+    device: str,
+    model_specs: list,
+    cores: list,
+    num_threads: int,
+    warmup_batch_size: int,
+    token_cache_size: int,
+):
+    """Entry point of a worker process: load and warm up the models, then serve calls from the API process."""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    import torch
+
+    torch.set_num_threads(num_threads or len(cores))
+    torch.set_num_interop_threads(1)
+
+    from registry import ModelRegistry
+    from loader import warmup_inputs
+
+    # Checkpoints are memory-mapped, so workers share the page-cache copy of the weights
+    registry = ModelRegistry(
+        base_model_name, device=device, token_cache_size=token_cache_size, num_threads=num_threads or len(cores)
+    )
+    versions = {}
+    for spec in model_specs:
+        try:
+            model_wrapper = registry.load(**spec)
+            if warmup_batch_size:
+                texts = warmup_inputs(spec.get("bucket_boundaries", ()), warmup_batch_size)
+                model_wrapper.predict_batch(texts, device)
+            versions[spec["name"]] = model_wrapper.weights_version
+        except Exception as e:
+            logger.exception("Worker {} failed to load {}: {}", os.getpid(), spec["name"], e)
+    conn.send((versions, len(registry.tokenizer)))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        command, *args = message
+        try:
+            if command == "memory_report":
+                result = {**registry.memory_report(), "process": process_memory()}
+            else:
+                model_name, method, call_args = args
+                result = getattr(registry.models[model_name], method)(*call_args)
+            conn.send(("ok", result))
+        except Exception as e:
+            try:
+                conn.send(("error", e))
+            except Exception:
+                # The exception itself could not be pickled
+                conn.send(("error", RuntimeError(repr(e))))
+
+
+class RemoteModel:
+    """
+    Stand-in for a Model wrapper whose forward passes run in the worker pool.
+    """
+
+    # No weights live in the API process
+    model = None
+
+    def __init__(self, pool, name: str, weights_version: str, vocab_size: int):
+        self.pool = pool
+        self.name = name
+        self.weights_version = weights_version
+        self.vocab_size = vocab_size
+
+    def predict(self, input_data, device):
+        return self.pool.call(self.name, "predict", input_data, device)
+
+    def predict_batch(self, input_data, device, chunk_size: int = 64):
+        return self.pool.call(self.name, "predict_batch", list(input_data), device, chunk_size)
+
+    def predict_long(self, text, device, *args):
+        return self.pool.call(self.name, "predict_long", text, device, *args)
+
+
+class WorkerPool:
+    """
+    Runs inference in `num_workers` processes, each pinned to its own group of cores.
+    Workers load and warm up all of the pool's models when they start.
+
+    Every worker loads the same memory-mapped checkpoints, so the float weights are
+    backed by one shared read-only copy in the page cache rather than one copy per
+    process. Calls are dispatched over a pipe to whichever worker is idle; only the
+    input texts and the small prediction tuples cross the process boundary.
+    """
+
+    def __init__(
+        self,
+        base_model_name: str,
+        model_specs: list,
+        device: str = "cpu",
+        num_workers: int = 2,
+        threads_per_worker: int = 0,
+        warmup_batch_size: int = 0,
+        token_cache_size: int = 10000,
+    ):
+        self.base_model_name = base_model_name
+        self.model_specs = model_specs
+        self.device = device
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.warmup_batch_size = warmup_batch_size
+        self.token_cache_size = token_cache_size
+        self.models = {}
+        self._context = multiprocessing.get_context("spawn")
+        self._core_groups = split_cores(sorted(self._available_cores()), num_workers)
+        self._processes = [None] * num_workers
+        self._idle = queue.Queue()
+
+    @staticmethod
+    def _available_cores():
+        if hasattr(os, "sched_getaffinity"):
+            return os.sched_getaffinity(0)
+        return range(os.cpu_count() or 1)
+
+    def _launch(self, index: int):
+        """Start worker `index` and return its connection without waiting for it."""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(
+                child_conn,
+                self.base_model_name,
+                self.device,
+                self.model_specs,
+                self._core_groups[index],
+                self.threads_per_worker,
+                self.warmup_batch_size,
+                self.token_cache_size,
+            ),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        self._processes[index] = process
+        return parent_conn
+
+    def _wait_ready(self, index: int, conn) -> tuple:
+        """Wait until worker `index` has loaded its models; return their weight versions and the vocabulary size."""
+        versions, vocab_size = conn.recv()
+        logger.info(
+            "Inference worker {} (pid {}) on cores {} loaded {}",
+            index,
+            self._processes[index].pid,
+            self._core_groups[index],
+            list(versions),
+        )
+        return versions, vocab_size
+
+    def start(self):
+        """
+        Start all workers, loading in parallel, and expose the models that every worker loaded.
+        Raises RuntimeError when workers loaded different weights for a model.
+        """
+        conns = [self._launch(index) for index in range(self.num_workers)]
+        loaded = []
+        for index, conn in enumerate(conns):
+            loaded.append(self._wait_ready(index, conn))
+            self._idle.put((index, conn))
+        # A call may go to any worker, so only models loaded by all of them are served
+        common = set.intersection(*(set(versions) for versions, _ in loaded))
+        for name in sorted(set().union(*(versions for versions, _ in loaded)) - common):
+            logger.error("{} failed to load in some inference workers; it is not served.", name)
+        for name in common:
+            if len({versions[name] for versions, _ in loaded}) > 1:
+                self.stop()
+                raise RuntimeError(f"Inference workers loaded different weights for {name}.")
+        vocab_size = loaded[0][1]
+        self.models = {name: RemoteModel(self, name, loaded[0][0][name], vocab_size) for name in common}
+        return self.models
+
+    def load(self, name: str, **spec):
+        """Return a model the workers loaded at start; the pool loads all of its models up front."""
+        if name not in self.models:
+            raise RuntimeError(f"{name} failed to load in the inference workers.")
+        return self.models[name]
+
+    def _restart(self, index: int):
+        """Replace dead worker `index` and return it to the idle workers once its models are loaded."""
+        self._processes[index].join(timeout=1)
+        try:
+            conn = self._launch(index)
+            versions, _ = self._wait_ready(index, conn)
+        except Exception as e:
+            logger.exception("Inference worker {} could not be restarted: {}", index, e)
+            return
+        for name, model in self.models.items():
+            if versions.get(name) != model.weights_version:
+                logger.error("Restarted inference worker {} did not load the served weights of {}.", index, name)
+        self._idle.put((index, conn))
+
+    def _request(self, message):
+        index, conn = self._idle.get()
+        try:
+            conn.send(message)
+            status, value = conn.recv()
+        except (EOFError, OSError) as e:
+            # The other workers keep serving while this one reloads its models
+            logger.error("Inference worker {} died; restarting it: {}", index, e)
+            threading.Thread(target=self._restart, args=(index,), name=f"restart-worker-{index}", daemon=True).start()
+            raise RuntimeError(f"Inference worker {index} died while serving the request.") from e
+        except BaseException:
+            # E.g. arguments that could not be pickled; the worker itself is fine
+            self._idle.put((index, conn))
+            raise
+        self._idle.put((index, conn))
+        if status == "error":
+            raise value
+        return value
+
+    def call(self, model_name: str, method: str, *args):
+        """Run `method(*args)` of a model on the next idle worker; blocks until it returns."""
+        return self._request(("call", model_name, method, args))
+
+    def memory_report(self) -> dict:
+        """Report one worker's model memory and the resident/shared memory of that process."""
+        return self._request(("memory_report",))
+
+    def stop(self):
+        """Ask every worker to exit."""
+        while not self._idle.empty():
+            _, conn = self._idle.get()
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout=5)
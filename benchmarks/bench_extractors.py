@@ -0,0 +1,61 @@
+"""
+Compare the paragraph extractors of app/extractors.py on the saved HTML fixtures.
+
+Usage:
+    python benchmarks/bench_extractors.py [--repeat 50] [--max-chars 2000]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# The app modules import each other by bare name
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+from extractors import EXTRACTORS, create_extractor
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+CHUNK_SIZE = 64 * 1024
+
+
+def extract(name: str, html: bytes, max_chars=None) -> str:
+    """Feed a page to an extractor in download-sized chunks, as scrape_website does."""
+    extractor = create_extractor(name, max_chars=max_chars, encoding="utf-8")
+    for start in range(0, len(html), CHUNK_SIZE):
+        if extractor.feed(html[start:start + CHUNK_SIZE]):
+            break
+    return extractor.close()
+
+
+def benchmark(repeat: int, max_chars=None) -> dict:
+    """Time every installed extractor on every fixture and check its output against html.parser."""
+    results = {}
+    for fixture in sorted(FIXTURES_DIR.glob("*.html")):
+        html = fixture.read_bytes()
+        reference = extract("html.parser", html, max_chars)
+        results[fixture.name] = {}
+        for name in EXTRACTORS:
+            try:
+                output = extract(name, html, max_chars)
+            except ImportError:
+                results[fixture.name][name] = {"available": False}
+                continue
+            started = time.perf_counter()
+            for _ in range(repeat):
+                extract(name, html, max_chars)
+            elapsed = (time.perf_counter() - started) / repeat
+            results[fixture.name][name] = {
+                "available": True,
+                "mean_ms": round(1000 * elapsed, 3),
+                "matches_html_parser": output == reference,
+            }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the HTML paragraph extractors.")
+    parser.add_argument("--repeat", type=int, default=50, help="Extractions per fixture and extractor")
+    parser.add_argument("--max-chars", type=int, default=None, help="Stop extracting after this much text")
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.repeat, args.max_chars), indent=4))
@@ -0,0 +1,170 @@
+"""
+Benchmark Model inference of each model variant and backend on CPU.
+
+Every variant runs in a fresh process, so that its startup time and peak RSS are
+measured in isolation. Reported per variant:
+    startup_s                  registry creation, checkpoint load and one warmup batch
+    latency_p50/p95/p99_ms     Model.predict of a single input
+    throughput_batch_<n>_per_s predict_batch items per second at batch size n
+    throughput_seq_<n>_per_s   predict_batch items per second at n tokens per input
+    peak_rss_mb                peak resident memory of the process
+
+Usage:
+    python benchmarks/bench_inference.py --base-model bert-base-uncased \\
+        --model model=model.pt --model quantized_model=model_int8.pt:quantized \\
+        --model lora_model=lora.pt:lora --model model=model.pt:onnx --output results/inference.json
+"""
+import argparse
+import json
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+# The app modules import each other by bare name
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.append(str(APP_DIR))
+
+DEVICE = "cpu"
+
+
+def make_text(tokens: int) -> str:
+    """An input of about `tokens` wordpiece tokens, including [CLS] and [SEP]."""
+    return " ".join(["news"] * max(tokens - 2, 1))
+
+
+def percentile(values: list, q: float) -> float:
+    """The q-th percentile (0-100) of a list, by linear interpolation."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def items_per_second(model_wrapper, texts: list, batch_size: int, repeat: int) -> float:
+    """Best-of-`repeat` throughput of predict_batch over `texts`."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        model_wrapper.predict_batch(texts, DEVICE, batch_size)
+        best = min(best, time.perf_counter() - started)
+    return len(texts) / best
+
+
+def bench_variant(spec: dict, options: dict) -> dict:
+    """Load one variant in this (fresh) process and measure it."""
+    sys.path.append(str(APP_DIR))
+    started = time.perf_counter()
+    import torch
+
+    if options["threads"]:
+        torch.set_num_threads(options["threads"])
+    from registry import ModelRegistry
+
+    lora_config = None
+    if spec["lora"]:
+        from peft import LoraConfig
+        from constants import LORA_SETTINGS
+
+        lora_config = LoraConfig(**LORA_SETTINGS)
+    # The inputs repeat one text, so a token cache would measure cache hits instead of tokenization
+    registry = ModelRegistry(options["base_model"], device=DEVICE, token_cache_size=0)
+    model_wrapper = registry.load(
+        spec["name"], spec["path"], lora_config=lora_config, quantized=spec["quantized"], backend=spec["backend"]
+    )
+    model_wrapper.predict_batch([make_text(64)] * 8, DEVICE)
+    result = {"startup_s": round(time.perf_counter() - started, 3)}
+
+    text = make_text(options["latency_tokens"])
+    latencies = []
+    for _ in range(options["latency_repeat"]):
+        call_started = time.perf_counter()
+        model_wrapper.predict(text, DEVICE)
+        latencies.append(1000 * (time.perf_counter() - call_started))
+    for q in (50, 95, 99):
+        result[f"latency_p{q}_ms"] = round(percentile(latencies, q), 3)
+    result["latency_mean_ms"] = round(statistics.fmean(latencies), 3)
+
+    for batch_size in options["batch_sizes"]:
+        texts = [make_text(options["latency_tokens"])] * batch_size * options["batches"]
+        result[f"throughput_batch_{batch_size}_per_s"] = round(
+            items_per_second(model_wrapper, texts, batch_size, options["repeat"]), 2
+        )
+    for tokens in options["seq_lengths"]:
+        texts = [make_text(tokens)] * options["seq_batch_size"] * options["batches"]
+        result[f"throughput_seq_{tokens}_per_s"] = round(
+            items_per_second(model_wrapper, texts, options["seq_batch_size"], options["repeat"]), 2
+        )
+
+    # ru_maxrss is in kB on Linux
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+def parse_model(value: str) -> dict:
+    """Parse NAME=PATH[:flag...] where the flags are quantized, lora, torchscript or onnx."""
+    name, _, rest = value.partition("=")
+    path, *flags = rest.split(":")
+    backend = next((flag for flag in flags if flag in ("torchscript", "onnx")), "eager")
+    return {
+        "name": name,
+        "path": path,
+        "quantized": "quantized" in flags,
+        "lora": "lora" in flags,
+        "backend": backend,
+        "key": f"{name}/{backend}",
+    }
+
+
+def benchmark(specs: list, options: dict) -> dict:
+    """Measure every variant, each in its own spawned process."""
+    results = {}
+    for spec in specs:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            try:
+                results[spec["key"]] = executor.submit(bench_variant, spec, options).result()
+            except Exception as e:
+                # A missing artifact or optional backend skips the variant instead of failing the run
+                results[spec["key"]] = {"error": str(e)}
+        print(f"{spec['key']}: {json.dumps(results[spec['key']])}", file=sys.stderr)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark model inference per variant and backend.")
+    parser.add_argument("--base-model", default="bert-base-uncased", help="Base model configuration and tokenizer")
+    parser.add_argument("--model", action="append", required=True, help="NAME=PATH[:quantized][:lora][:torchscript|:onnx]")
+    parser.add_argument("--latency-repeat", type=int, default=100, help="Single-input predictions timed")
+    parser.add_argument("--latency-tokens", type=int, default=64, help="Tokens per input for latency and batch sweeps")
+    parser.add_argument("--batch-sizes", default="1,8,32,64", help="Batch sizes of the throughput sweep")
+    parser.add_argument("--seq-lengths", default="16,32,64,128", help="Tokens per input of the sequence sweep")
+    parser.add_argument("--seq-batch-size", type=int, default=32, help="Batch size of the sequence sweep")
+    parser.add_argument("--batches", type=int, default=4, help="Batches per throughput measurement")
+    parser.add_argument("--repeat", type=int, default=3, help="Throughput measurements, best one kept")
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (0 = torch default)")
+    parser.add_argument("--output", help="Write the results JSON here as well as to stdout")
+    args = parser.parse_args()
+
+    results = benchmark(
+        [parse_model(value) for value in args.model],
+        {
+            "base_model": args.base_model,
+            "latency_repeat": args.latency_repeat,
+            "latency_tokens": args.latency_tokens,
+            "batch_sizes": [int(size) for size in args.batch_sizes.split(",")],
+            "seq_lengths": [int(length) for length in args.seq_lengths.split(",")],
+            "seq_batch_size": args.seq_batch_size,
+            "batches": args.batches,
+            "repeat": args.repeat,
+            "threads": args.threads,
+        },
+    )
+    report = json.dumps({"inference": results}, indent=4)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(report)
+    print(report)
@@ -0,0 +1,100 @@
+"""
+Compare benchmark results against a stored baseline and fail on regressions.
+
+Metrics are compared by name: *_ms, *_s and *_mb are lower-is-better, *_per_s is
+higher-is-better, and "errors" must not grow. Other values are not compared.
+A metric regresses when it is worse than the baseline by more than the threshold.
+
+Usage:
+    python benchmarks/compare.py results/inference.json results/load.json \\
+        --baseline benchmarks/baseline.json --threshold 0.15
+    python benchmarks/compare.py results/*.json --baseline benchmarks/baseline.json --update
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """Flatten nested results into {"inference.model/eager.latency_p50_ms": value}."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def direction(metric: str):
+    """+1 when higher is better, -1 when lower is better, None when the metric is not compared."""
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith(("_ms", "_s", "_mb", ".errors")):
+        return -1
+    return None
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.1, overrides: dict = None) -> list:
+    """
+    Return one row per compared metric: (metric, baseline, current, relative change, regressed).
+
+    Relative change is positive when the metric got worse. `overrides` maps a metric
+    name suffix to its own threshold, e.g. {"peak_rss_mb": 0.05}.
+    """
+    overrides = overrides or {}
+    current, reference = flatten(results), flatten(baseline)
+    rows = []
+    for metric in sorted(reference.keys() & current.keys()):
+        sign = direction(metric)
+        if sign is None:
+            continue
+        before, after = reference[metric], current[metric]
+        worsening = -sign * (after - before)
+        if before == 0:
+            # E.g. errors going from 0 to any number is an unbounded regression
+            change = 0.0 if worsening == 0 else float("inf") if worsening > 0 else float("-inf")
+        else:
+            change = worsening / abs(before)
+        limit = next((value for suffix, value in overrides.items() if metric.endswith(suffix)), threshold)
+        rows.append((metric, before, after, change, change > limit))
+    return rows
+
+
+def load_results(paths: list) -> dict:
+    merged = {}
+    for path in paths:
+        merged.update(json.loads(Path(path).read_text()))
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare benchmark results with a baseline.")
+    parser.add_argument("results", nargs="+", help="Results JSON files of bench_inference.py and loadtest.py")
+    parser.add_argument("--baseline", required=True, help="Baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed relative regression (0.1 = 10%%)")
+    parser.add_argument(
+        "--metric-threshold",
+        action="append",
+        default=[],
+        help="SUFFIX=THRESHOLD for metrics ending in SUFFIX, e.g. latency_p99_ms=0.25",
+    )
+    parser.add_argument("--update", action="store_true", help="Store the results as the new baseline")
+    args = parser.parse_args()
+
+    results = load_results(args.results)
+    if args.update:
+        Path(args.baseline).write_text(json.dumps(results, indent=4))
+        print(f"Baseline written to {args.baseline}")
+        sys.exit(0)
+
+    overrides = {suffix: float(value) for suffix, value in (entry.split("=", 1) for entry in args.metric_threshold)}
+    rows = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold, overrides)
+    for metric, before, after, change, regressed in rows:
+        flag = "REGRESSION" if regressed else "ok"
+        print(f"{flag:<10} {metric:<70} {before:>12g} -> {after:<12g} ({change:+.1%} worse)")
+    regressions = [row for row in rows if row[4]]
+    print(f"{len(rows)} metrics compared, {len(regressions)} regressions")
+    sys.exit(1 if regressions else 0)
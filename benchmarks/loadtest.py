@@ -0,0 +1,198 @@
+"""
+Load-test the FastAPI app end to end against a local stand-in for NewsAPI and the news sites.
+
+The app is started with uvicorn in a subprocess, using the model settings of the
+current environment (MODEL_PATH, BASE_MODEL_NAME, ...). NewsAPI and the article
+pages are served from benchmarks/fixtures by a local HTTP server, so the run needs
+no network. Reported per scenario: requests, errors, requests per second and
+latency percentiles, plus the time until /ready answered 200.
+
+Requires httpx (uv sync --extra async-http).
+
+Usage:
+    PYTHON_ENV=DEV MODEL_PATH=... python benchmarks/loadtest.py --duration 30 --concurrency 16 --output results/load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from bench_inference import percentile
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers NewsAPI "everything" queries and serves the article fixtures."""
+
+    def do_GET(self):
+        host = f"http://127.0.0.1:{self.server.server_port}"
+        if self.path.startswith("/v2/everything"):
+            fixtures = sorted(FIXTURES_DIR.glob("*.html"))
+            # Like NewsAPI, 20 articles unless pageSize asks for another number
+            page_size = int(parse_qs(urlparse(self.path).query).get("pageSize", ["20"])[0])
+            articles = [
+                {"title": f"Article {i}", "url": f"{host}/articles/{fixtures[i % len(fixtures)].name}?id={i}"}
+                for i in range(page_size)
+            ]
+            self._send(200, "application/json", json.dumps({"status": "ok", "articles": articles}).encode())
+        elif self.path.startswith("/articles/"):
+            fixture = FIXTURES_DIR / self.path.split("/")[-1].split("?")[0]
+            self._send(200, "text/html; charset=utf-8", fixture.read_bytes())
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stand_in() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_app(port: int, stand_in_port: int, extra_env: dict) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "NEWS_API_URL": f"http://127.0.0.1:{stand_in_port}/v2/everything",
+        "NEWS_API_KEY": os.environ.get("NEWS_API_KEY", "load-test"),
+        # Scored stand-in articles are not worth keeping, and would be written under the working directory
+        "ANALYTICS": "false",
+        **extra_env,
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client, timeout: float) -> float:
+    """Seconds until /ready answered 200."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return time.perf_counter() - started
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"The app was not ready within {timeout}s")
+
+
+def scenario_requests(name: str, model_name: str, batch_size: int):
+    """Return a function building the n-th request of a scenario."""
+    def article(n: int) -> dict:
+        # Distinct texts so that the prediction cache does not answer the requests
+        return {"title": f"Senate vote {n}", "content": f"The bill on taxes passed with {n} votes.", "model_name": model_name}
+
+    if name == "predict":
+        return lambda n: ("POST", "/predict", article(n))
+    if name == "predict_batch":
+        return lambda n: ("POST", "/predict/batch", [article(n * batch_size + i) for i in range(batch_size)])
+    if name == "outlets":
+        return lambda n: ("GET", "/outlets/CNN", None)
+    if name == "outlets_stream":
+        return lambda n: ("GET", "/outlets/CNN?stream=true&limit=20", None)
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+async def run_scenario(client, build_request, concurrency: int, duration: float) -> dict:
+    """Send requests from `concurrency` clients for `duration` seconds."""
+    latencies, errors, counter = [], 0, 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors, counter
+        while time.perf_counter() < deadline:
+            counter += 1
+            method, path, body = build_request(counter)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                # An outlet whose articles could not be fetched answers null, or an empty stream
+                if response.status_code != 200 or response.content in (b"null", b""):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(1000 * (time.perf_counter() - started))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    result = {"requests": len(latencies), "errors": errors, "requests_per_s": round(len(latencies) / elapsed, 2)}
+    for q in (50, 95, 99):
+        result[f"latency_p{q}_ms"] = round(percentile(latencies, q), 2)
+    return result
+
+
+async def load_test(args) -> dict:
+    import httpx
+
+    stand_in = start_stand_in()
+    port = free_port()
+    app = start_app(
+        port,
+        stand_in.server_port,
+        {"PREDICTION_CACHE": "none" if args.no_cache else os.environ.get("PREDICTION_CACHE", "memory"),
+         "FEED_STALE_AFTER": str(args.feed_stale_after)},
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            results = {"ready_s": round(await wait_ready(client, args.ready_timeout), 2)}
+            for name in args.scenarios.split(","):
+                build_request = scenario_requests(name, args.model_name, args.batch_size)
+                results[name] = await run_scenario(client, build_request, args.concurrency, args.duration)
+                print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+            return results
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        stand_in.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the API end to end on this machine.")
+    parser.add_argument(
+        "--scenarios", default="predict,predict_batch,outlets", help="Comma-separated scenarios, also outlets_stream"
+    )
+    parser.add_argument("--model-name", default="model", help="Model used by the predict scenarios")
+    parser.add_argument("--batch-size", type=int, default=16, help="Articles per /predict/batch request")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per scenario")
+    parser.add_argument("--feed-stale-after", type=float, default=5, help="FEED_STALE_AFTER of the app under test")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the prediction cache of the app under test")
+    parser.add_argument("--ready-timeout", type=float, default=300, help="Seconds to wait for /ready")
+    parser.add_argument("--output", help="Write the results JSON here as well as to stdout")
+    args = parser.parse_args()
+
+    report = json.dumps({"load": asyncio.run(load_test(args))}, indent=4)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(report)
+    print(report)
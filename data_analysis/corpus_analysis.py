@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import reduce
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+LABEL_COLUMN = "political_leaning"
+OUTLET_COLUMN = "outlet"
+# Rows with this label are dropped before the class statistics, like missing values
+UNDEFINED = "UNDEFINED"
+# Control bytes that are whitespace, and the UTF-8 encodings of the other whitespace characters of str.split()
+WHITESPACE = np.zeros(32, bool)
+WHITESPACE[[9, 10, 11, 12, 13, 28, 29, 30, 31]] = True
+UNICODE_SPACES = [chr(code).encode("utf-8") for code in range(0x80, 0x10000) if chr(code).isspace()]
+# Tokens are runs of letters and digits
+TOKEN_SEPARATOR = r"[^\p{L}\p{N}]+"
+SAMPLE_KEY = "_sample_key"
+
+
+def whitespace(data: np.ndarray) -> np.ndarray:
+    """Mask of the bytes of UTF-8 text that belong to a whitespace character."""
+    space = data == 32
+    control = np.flatnonzero(data < 32)
+    space[control] = WHITESPACE[data[control]]
+    # Only the positions of the lead bytes of multi-byte spaces, rare in news text, are compared
+    lead = np.flatnonzero(data >= min(code[0] for code in UNICODE_SPACES))
+    lead = lead[np.isin(data[lead], [code[0] for code in UNICODE_SPACES])]
+    for code in UNICODE_SPACES:
+        found = lead[lead + len(code) <= len(data)]
+        for i, byte in enumerate(code):
+            found = found[data[found + i] == byte]
+        for i in range(len(code)):
+            space[found + i] = True
+    return space
+
+
+def word_counts(texts: pa.ChunkedArray) -> np.ndarray:
+    """
+    Number of whitespace-separated words of each text, like len(text.split()), computed on the
+    UTF-8 bytes of the whole column at once: a word starts at every non-space byte that follows
+    a space or begins a text. Null texts have no words.
+    """
+    counts = [np.zeros(0, np.int64)]
+    for chunk in texts.chunks:
+        _, offsets, data = chunk.buffers()
+        offsets = np.frombuffer(offsets, np.int64 if pa.types.is_large_string(chunk.type) else np.int32)
+        offsets = offsets[chunk.offset : chunk.offset + len(chunk) + 1].astype(np.int64)
+        data = np.frombuffer(data, np.uint8)[offsets[0] : offsets[-1]] if data is not None else np.zeros(0, np.uint8)
+        offsets -= offsets[0]
+        space = whitespace(data)
+        starts = ~space
+        starts[1:] &= space[:-1]
+        text_starts = offsets[:-1][offsets[:-1] < len(data)]
+        starts[text_starts] = ~space[text_starts]
+        # Counting the word starts inside each text's byte range
+        positions = np.flatnonzero(starts)
+        counts.append(np.searchsorted(positions, offsets[1:]) - np.searchsorted(positions, offsets[:-1]))
+    return np.concatenate(counts)
+
+
+def token_counts(texts: pa.Array) -> Counter:
+    """Frequency of the lowercased letter-and-digit tokens of the texts."""
+    tokens = pc.list_flatten(pc.split_pattern_regex(pc.utf8_lower(texts.drop_null()), TOKEN_SEPARATOR))
+    counts = pc.value_counts(tokens.filter(pc.not_equal(tokens, "")))
+    return Counter(dict(zip(counts.field("values").to_pylist(), counts.field("counts").to_pylist())))
+
+
+def value_counts(values: pa.ChunkedArray) -> Dict[str, int]:
+    counts = pc.value_counts(values.drop_null())
+    return dict(zip(counts.field("values").to_pylist(), counts.field("counts").to_pylist()))
+
+
+def bottom_k(table: pa.Table, k: int) -> pa.Table:
+    """The `k` rows with the smallest sample keys: a uniform sample without replacement."""
+    if table.num_rows <= k:
+        return table
+    keys = table.column(SAMPLE_KEY).to_numpy()
+    return table.take(np.argpartition(keys, k)[:k])
+
+
+class CorpusStats:
+    """
+    Statistics of a corpus of labeled articles that can be computed chunk by chunk and merged.
+
+    `rows`, `nulls`, `leanings` and `outlets` describe every row, before cleaning. Rows with a
+    missing value or the UNDEFINED label are then dropped; `classes` counts the remaining rows
+    per outlet and leaning, `lengths` holds the word count histogram of each length column
+    (`lengths[column][n]` rows have n words) and `tokens` the token frequencies of each
+    leaning. `samples` keeps, per leaning, the rows with the `sample_size` smallest random
+    keys, so the merged samples are uniform samples of each class whatever the chunking.
+    """
+
+    def __init__(self, sample_size: int = 0):
+        self.sample_size = sample_size
+        self.rows = 0
+        self.nulls = Counter()
+        self.leanings = Counter()
+        self.outlets = Counter()
+        self.classes = Counter()
+        self.lengths: Dict[str, np.ndarray] = {}
+        self.tokens: Dict[str, Counter] = {}
+        self.samples: Dict[str, pa.Table] = {}
+        self.row_hashes: List[np.ndarray] = []
+
+    def merge(self, other: "CorpusStats") -> "CorpusStats":
+        """Add the statistics of another chunk to these."""
+        self.rows += other.rows
+        for name in ("nulls", "leanings", "outlets", "classes"):
+            getattr(self, name).update(getattr(other, name))
+        for column, histogram in other.lengths.items():
+            current = self.lengths.get(column, np.zeros(0, np.int64))
+            merged = np.zeros(max(len(current), len(histogram)), np.int64)
+            merged[: len(current)] += current
+            merged[: len(histogram)] += histogram
+            self.lengths[column] = merged
+        for leaning, counts in other.tokens.items():
+            self.tokens.setdefault(leaning, Counter()).update(counts)
+        for leaning, sample in other.samples.items():
+            if leaning in self.samples:
+                sample = bottom_k(pa.concat_tables([self.samples[leaning], sample]), self.sample_size)
+            self.samples[leaning] = sample
+        self.row_hashes.extend(other.row_hashes)
+        return self
+
+    @property
+    def duplicates(self) -> int:
+        """Rows identical to an earlier row in every column."""
+        if not self.row_hashes:
+            return 0
+        return self.rows - len(np.unique(np.concatenate(self.row_hashes)))
+
+    def balanced_sample(self, per_class: Optional[int] = None) -> pa.Table:
+        """
+        The same number of sampled rows from each leaning, in random order: `per_class`, or as
+        many as the smallest class allows (at most the sample size).
+        """
+        if not self.samples:
+            return pa.table({})
+        smallest = min(sample.num_rows for sample in self.samples.values())
+        per_class = smallest if per_class is None else min(per_class, smallest)
+        table = pa.concat_tables(bottom_k(sample, per_class) for sample in self.samples.values())
+        return table.take(pc.sort_indices(table, [(SAMPLE_KEY, "ascending")])).drop_columns([SAMPLE_KEY])
+
+    def summary(self, stop_words: Iterable[str] = (), top: int = 10) -> dict:
+        """The statistics as a JSON-serializable report, with the `top` tokens of each leaning with and without stop words."""
+        stop_words = set(stop_words)
+        classes = Counter()
+        outlets_by_leaning = {}
+        for (leaning, outlet), count in self.classes.most_common():
+            classes[leaning] += count
+            outlets_by_leaning.setdefault(leaning, {})[outlet] = count
+        lengths = {}
+        for column, histogram in self.lengths.items():
+            total = histogram.sum()
+            if not total:
+                continue
+            cumulative = np.cumsum(histogram)
+            lengths[column] = {
+                "min": int(np.flatnonzero(histogram)[0]),
+                "max": len(histogram) - 1,
+                "mean": float(np.arange(len(histogram)) @ histogram / total),
+                **{f"p{q}": int(np.searchsorted(cumulative, total * q / 100)) for q in (50, 90, 99)},
+            }
+        tokens = {
+            leaning: {
+                "all": counts.most_common(top),
+                "filtered": [(token, n) for token, n in counts.most_common() if token not in stop_words][:top],
+            }
+            for leaning, counts in sorted(self.tokens.items())
+        }
+        return {
+            "rows": self.rows,
+            "duplicates": self.duplicates,
+            "nulls": dict(self.nulls),
+            "leanings": dict(self.leanings.most_common()),
+            "outlets": dict(self.outlets.most_common()),
+            "classes": dict(classes.most_common()),
+            "outlets_by_leaning": outlets_by_leaning,
+            "lengths": lengths,
+            "tokens": tokens,
+            "sampled": {leaning: sample.num_rows for leaning, sample in sorted(self.samples.items())},
+        }
+
+
+def analyze_table(
+    table: pa.Table,
+    sample_size: int = 0,
+    seed: Union[int, Sequence[int]] = 0,
+    token_column: str = "headline",
+    length_columns: Iterable[str] = ("headline", "body"),
+) -> CorpusStats:
+    """
+    Statistics of one chunk of the corpus. Every column is processed whole with Arrow compute
+    kernels or NumPy; only the distinct tokens and the sampled rows become Python objects.
+    """
+    stats = CorpusStats(sample_size)
+    stats.rows = table.num_rows
+    stats.nulls.update({name: table.column(name).null_count for name in table.column_names})
+    stats.row_hashes.append(pd.util.hash_pandas_object(table.to_pandas(), index=False).to_numpy())
+    labels = table.column(LABEL_COLUMN)
+    stats.leanings.update(value_counts(labels))
+    stats.outlets.update(value_counts(table.column(OUTLET_COLUMN)))
+
+    complete = reduce(pc.and_, (pc.is_valid(column) for column in table.columns))
+    kept = table.filter(pc.and_(complete, pc.not_equal(labels, UNDEFINED)))
+    grouped = kept.group_by([LABEL_COLUMN, OUTLET_COLUMN]).aggregate([([], "count_all")])
+    keys = zip(grouped[LABEL_COLUMN].to_pylist(), grouped[OUTLET_COLUMN].to_pylist())
+    stats.classes.update(dict(zip(keys, grouped["count_all"].to_pylist())))
+    for column in length_columns:
+        stats.lengths[column] = np.bincount(word_counts(kept.column(column)))
+
+    if sample_size:
+        kept = kept.append_column(SAMPLE_KEY, pa.array(np.random.default_rng(seed).random(kept.num_rows)))
+    kept_labels = kept.column(LABEL_COLUMN)
+    for leaning in pc.unique(kept_labels).to_pylist():
+        rows = kept.filter(pc.equal(kept_labels, leaning))
+        stats.tokens[leaning] = token_counts(rows.column(token_column))
+        if sample_size:
+            stats.samples[leaning] = bottom_k(rows, sample_size)
+    return stats
+
+
+def analyze_corpus(
+    path: str,
+    columns: Optional[List[str]] = None,
+    sample_size: int = 0,
+    seed: int = 42,
+    workers: int = 0,
+    chunk_rows: int = 20000,
+    token_column: str = "headline",
+    length_columns: Iterable[str] = ("headline", "body"),
+) -> CorpusStats:
+    """
+    Analyze a Parquet corpus in chunks and merge the results.
+
+    Args:
+        path (str): Parquet file with at least the political_leaning and outlet columns.
+        columns (Optional[List[str]]): Columns to read (all by default); a row missing any of
+            them is dropped, like dropna().
+        sample_size (int): Rows kept per leaning for the balanced sample; 0 samples nothing.
+        seed (int): Seed of the sample.
+        workers (int): Worker processes analyzing chunks in parallel; 0 analyzes in this process.
+        chunk_rows (int): Rows analyzed together; the file is decoded row group by row group.
+        token_column (str): Column whose token frequencies are counted per leaning.
+        length_columns (Iterable[str]): Columns whose word count histograms are computed.
+
+    Returns:
+        CorpusStats: The merged statistics. Memory is bounded by the chunks in flight (two per
+        worker), the vocabulary, the samples and an 8-byte hash per row for the duplicates.
+    """
+    options = {"token_column": token_column, "length_columns": tuple(length_columns)}
+    batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns)
+    # A seed per chunk keeps the sample independent of the order in which the chunks finish
+    chunks = ((pa.Table.from_batches([batch]), [seed, index]) for index, batch in enumerate(batches))
+    stats = CorpusStats(sample_size)
+    if not workers:
+        for table, chunk_seed in chunks:
+            stats.merge(analyze_table(table, sample_size, chunk_seed, **options))
+        return stats
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for table, chunk_seed in chunks:
+            pending.add(executor.submit(analyze_table, table, sample_size, chunk_seed, **options))
+            if len(pending) >= 2 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stats.merge(future.result())
+        for future in pending:
+            stats.merge(future.result())
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze a Parquet corpus of labeled news articles.")
+    parser.add_argument("input", help="Parquet file, e.g. the POLUSA corpus")
+    parser.add_argument("--columns", help="Comma-separated columns to read (default: all)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (0 = this process)")
+    parser.add_argument("--chunk-rows", type=int, default=20000, help="Rows analyzed together")
+    parser.add_argument("--sample-size", type=int, default=0, help="Rows sampled per leaning")
+    parser.add_argument("--sample-output", help="Write the class-balanced sample to this Parquet file")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--top", type=int, default=10, help="Most frequent tokens reported per leaning")
+    parser.add_argument("--stop-words", action="store_true", help="Also report the top tokens without NLTK's English stop words")
+    args = parser.parse_args()
+
+    columns = args.columns.split(",") if args.columns else None
+    stats = analyze_corpus(args.input, columns, args.sample_size, args.seed, args.workers, args.chunk_rows)
+    stop_words = ()
+    if args.stop_words:
+        from nltk.corpus import stopwords
+
+        stop_words = stopwords.words("english")
+    print(json.dumps(stats.summary(stop_words, args.top), indent=4))
+    if args.sample_output:
+        pq.write_table(stats.balanced_sample(), args.sample_output)